@@ -1,11 +1,16 @@
 from flask import Flask, session
 from flask_cors import CORS
-from routes.chat import chat_bp
+from routes.chat import chat_bp, model_warmer, drug_retriever
 from routes.auth import auth_bp
 from routes.broadcast import broadcast_bp
 from routes.users import user_bp
 from routes.whatsapp import whatsapp_bp
+from routes.metrics import metrics_bp
+from routes.drugs import drugs_bp
+from models.drug import drug_index, render_cache
 from utils.db_init import initialize_drug_database as init_db
+from utils.retention import retention_job
+from config import Config
 
 app = Flask(__name__, template_folder='../frontend/templates')
 app.secret_key = "super-secret-key-change-in-production-please"
@@ -17,14 +22,48 @@ app.register_blueprint(auth_bp, url_prefix='/api')
 app.register_blueprint(broadcast_bp, url_prefix='/api')
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(whatsapp_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp, url_prefix='/api')
+app.register_blueprint(drugs_bp, url_prefix='/api')
 
 # Init DB on startup
 with app.app_context():
     init_db()
 
+# Serve drug lookups from memory; refreshed when the catalog version moves
+drug_index.start()
+
+# Render a bounded set of drug cards and API payloads up front; the rest
+# are rendered on their first request
+if Config.RENDER_CACHE_PRERENDER_DRUGS > 0 and drug_index.ready:
+    with app.app_context():
+        rendered = render_cache.prerender(drug_index.iter_documents(Config.RENDER_CACHE_PRERENDER_DRUGS))
+    print(f"✅ Pre-rendered {rendered} drug answers ({render_cache.stats()['bytes'] // 1024} KB)")
+
+# Embed the catalog for AI-context retrieval and keep it in sync
+if drug_retriever:
+    drug_retriever.start()
+
+# Move chats and logs past their hot window to the cold archive
+if Config.RETENTION_ARCHIVE_INTERVAL > 0:
+    retention_job.start()
+
+# Pull/load the Ollama models in the background and keep them resident
+if model_warmer:
+    model_warmer.start()
+
 @app.route('/health')
 def health():
-    return {"status": "ok"}, 200
+    # Liveness stays 200; "status" says whether the AI model is resident yet
+    if model_warmer:
+        return {"status": model_warmer.state(), "llm": model_warmer.stats()}, 200
+    return {"status": "ready"}, 200
+
+@app.route('/health/ready')
+def ready():
+    """Readiness probe: 503 until the AI model is resident"""
+    if model_warmer and not model_warmer.ready:
+        return {"status": "warming"}, 503
+    return {"status": "ready"}, 200
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -17,13 +17,155 @@ class Config:
 
     # Ollama AI Configuration
     OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://ollama:11434")
+    # Comma-separated list of Ollama servers to balance across (defaults to OLLAMA_HOST)
+    OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if h.strip()]
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+    # Intent routing: short general/medical questions use the fast model
+    OLLAMA_FAST_MODEL = os.getenv("OLLAMA_FAST_MODEL", OLLAMA_MODEL)
+    # Optional explicit routes, e.g. "general=qwen2.5:0.5b,drug_info=llama3.2"
+    OLLAMA_INTENT_MODELS = dict(
+        pair.split("=", 1) for pair in os.getenv("OLLAMA_INTENT_MODELS", "").split(",") if "=" in pair
+    )
+    LLM_MAIN_DEADLINE = float(os.getenv("LLM_MAIN_DEADLINE", "60"))
+    LLM_FAST_DEADLINE = float(os.getenv("LLM_FAST_DEADLINE", "20"))
+    LLM_SHORT_MESSAGE_WORDS = int(os.getenv("LLM_SHORT_MESSAGE_WORDS", "12"))
+    # How long Ollama keeps the model loaded after a request
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # Pull/load models at startup and ping them so Ollama never unloads them
+    OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+    OLLAMA_PULL_MISSING = os.getenv("OLLAMA_PULL_MISSING", "true").lower() == "true"
+    OLLAMA_PULL_TIMEOUT = float(os.getenv("OLLAMA_PULL_TIMEOUT", "1800"))
+    OLLAMA_PING_INTERVAL = float(os.getenv("OLLAMA_PING_INTERVAL", "240"))
+    # Residency file written by the one worker per host that pulls and pings
+    # (empty: every worker warms the models itself)
+    OLLAMA_WARMUP_STATE_PATH = os.getenv("OLLAMA_WARMUP_STATE_PATH", "data/model_warmup.json")
+    # How long a chat waits for warm-up before getting a 503
+    LLM_WARMUP_WAIT = float(os.getenv("LLM_WARMUP_WAIT", "10"))
+    # Token budget for earlier conversation turns replayed to the model
+    OLLAMA_HISTORY_TOKENS = int(os.getenv("OLLAMA_HISTORY_TOKENS", "1024"))
+    OLLAMA_HISTORY_TURNS = int(os.getenv("OLLAMA_HISTORY_TURNS", "10"))
+    # Whole prompt (system prompt, context, history, question); the context is
+    # clipped and the history shrunk to stay under it
+    LLM_PROMPT_TOKENS = int(os.getenv("LLM_PROMPT_TOKENS", "3072"))
+    # Rolling conversation summaries: the last CONVERSATION_RECENT_TURNS turns
+    # go to the model verbatim, older ones are folded (CONVERSATION_FOLD_EVERY
+    # at a time, at most CONVERSATION_FOLD_BATCH per pass) into a per-user
+    # summary of about CONVERSATION_SUMMARY_TOKENS by the fast model, giving
+    # up after CONVERSATION_FOLD_TIMEOUT seconds so it never holds a slot long.
+    # Off: the last OLLAMA_HISTORY_TURNS turns are replayed instead
+    CONVERSATION_SUMMARIES = os.getenv("CONVERSATION_SUMMARIES", "true").lower() == "true"
+    CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "4"))
+    CONVERSATION_FOLD_EVERY = int(os.getenv("CONVERSATION_FOLD_EVERY", "4"))
+    CONVERSATION_FOLD_BATCH = int(os.getenv("CONVERSATION_FOLD_BATCH", "12"))
+    CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "256"))
+    CONVERSATION_FOLD_TIMEOUT = float(os.getenv("CONVERSATION_FOLD_TIMEOUT", "20"))
+
+    # Ollama HTTP transport (pooled keep-alive session per worker)
+    OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+    OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3.05"))
+    OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "60"))
+    OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "2"))
+    OLLAMA_RETRY_BACKOFF = float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.3"))
+    OLLAMA_BREAKER_THRESHOLD = int(os.getenv("OLLAMA_BREAKER_THRESHOLD", "5"))
+    OLLAMA_BREAKER_RESET = float(os.getenv("OLLAMA_BREAKER_RESET", "30"))
+    # Seconds between /api/tags probes that reinstate ejected hosts
+    OLLAMA_PROBE_INTERVAL = float(os.getenv("OLLAMA_PROBE_INTERVAL", "10"))
+    # Send a backup request to a second host after this many seconds (0 = off)
+    OLLAMA_HEDGE_AFTER = float(os.getenv("OLLAMA_HEDGE_AFTER", "0"))
+
+    # LLM response cache
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(6 * 3600)))
+    LLM_CACHE_PERSIST = os.getenv("LLM_CACHE_PERSIST", "false").lower() == "true"
+
+    # Coalesce identical in-flight generations (SHARED also dedupes across workers via MongoDB)
+    LLM_SINGLE_FLIGHT_TIMEOUT = float(os.getenv("LLM_SINGLE_FLIGHT_TIMEOUT", "75"))
+    LLM_SINGLE_FLIGHT_SHARED = os.getenv("LLM_SINGLE_FLIGHT_SHARED", "false").lower() == "true"
+
+    # Admission control for Ollama (per worker)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+    LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "50"))
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+    # In-memory drug catalog index (seconds between catalog version checks)
+    DRUG_INDEX_REFRESH = float(os.getenv("DRUG_INDEX_REFRESH", "10"))
+    # Seconds of updated_at re-read before the last sync, for writer clock skew
+    DRUG_INDEX_SYNC_OVERLAP = float(os.getenv("DRUG_INDEX_SYNC_OVERLAP", "60"))
+    # Memory-mapped catalog snapshot shared by all workers on a host (empty: each worker keeps its own copy)
+    DRUG_SNAPSHOT_PATH = os.getenv("DRUG_SNAPSHOT_PATH", "data/catalog.snapshot")
+    # Answer a misspelled drug name directly at or above this similarity (0-1)
+    DRUG_FUZZY_MIN_SCORE = float(os.getenv("DRUG_FUZZY_MIN_SCORE", "0.8"))
+    # Largest medication list accepted by /api/interactions
+    INTERACTION_MAX_MEDICATIONS = int(os.getenv("INTERACTION_MAX_MEDICATIONS", "100"))
+    # Memory for rendered drug cards/API payloads, and how many drugs (banned
+    # ones first) each worker renders at startup; 0 renders on first request
+    RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    RENDER_CACHE_PRERENDER_DRUGS = int(os.getenv("RENDER_CACHE_PRERENDER_DRUGS", "200"))
+
+    # Drug record retrieval for AI context
+    RAG_ENABLED = os.getenv("RAG_ENABLED", "true").lower() == "true"
+    # Ollama embeddings model (e.g. nomic-embed-text); empty uses local hashed embeddings
+    RAG_EMBED_MODEL = os.getenv("RAG_EMBED_MODEL", "")
+    RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", "data/rag")
+    RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+    RAG_MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", "0.15"))
+    RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "600"))
+    RAG_REFRESH = float(os.getenv("RAG_REFRESH", "30"))
+
+    # Write-behind for chat turns, login and WhatsApp logs: flushed every
+    # WRITE_BEHIND_BATCH_SIZE records or WRITE_BEHIND_FLUSH_INTERVAL seconds;
+    # a full queue falls back to synchronous writes. Batches MongoDB rejects,
+    # and the queue at shutdown if MongoDB is down, go to WRITE_BEHIND_SPILL_DIR
+    WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+    WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+    WRITE_BEHIND_SPILL_DIR = os.getenv("WRITE_BEHIND_SPILL_DIR", "data/spill")
+
+    # Retention: days each collection stays in MongoDB (0 = forever). Older
+    # records are moved to gzipped JSONL under RETENTION_ARCHIVE_DIR every
+    # RETENTION_ARCHIVE_INTERVAL seconds (0 = only via `python -m
+    # utils.retention archive`); a TTL index deletes anything the archiver
+    # missed RETENTION_TTL_GRACE_DAYS after its window
+    RETENTION_CHATS_DAYS = int(os.getenv("RETENTION_CHATS_DAYS", "365"))
+    RETENTION_WHATSAPP_LOGS_DAYS = int(os.getenv("RETENTION_WHATSAPP_LOGS_DAYS", "90"))
+    RETENTION_LOGIN_LOGS_DAYS = int(os.getenv("RETENTION_LOGIN_LOGS_DAYS", "180"))
+    RETENTION_TTL_GRACE_DAYS = int(os.getenv("RETENTION_TTL_GRACE_DAYS", "7"))
+    RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "data/archive")
+    RETENTION_ARCHIVE_INTERVAL = float(os.getenv("RETENTION_ARCHIVE_INTERVAL", str(6 * 3600)))
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+
+    # Chat history pages (/api/history?before=&after=&limit=); the full
+    # history is streamed by /api/history/export
+    HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
 
     # Twilio WhatsApp Configuration
     TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
     TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
     TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER", "whatsapp:+14155238886")
     TWILIO_WHATSAPP_FROM = TWILIO_WHATSAPP_NUMBER  # Alias for backward compatibility
+    # Broadcast throughput: sends per second for our Twilio tier (and burst),
+    # concurrent sends, and retries with exponential backoff for 429s, 5xx
+    # and timeouts
+    TWILIO_SEND_RATE = float(os.getenv("TWILIO_SEND_RATE", "20"))
+    TWILIO_SEND_BURST = int(os.getenv("TWILIO_SEND_BURST", "20"))
+    TWILIO_SEND_WORKERS = int(os.getenv("TWILIO_SEND_WORKERS", "16"))
+    TWILIO_SEND_RETRIES = int(os.getenv("TWILIO_SEND_RETRIES", "4"))
+    TWILIO_RETRY_BACKOFF = float(os.getenv("TWILIO_RETRY_BACKOFF", "1.0"))
+    TWILIO_RETRY_BACKOFF_MAX = float(os.getenv("TWILIO_RETRY_BACKOFF_MAX", "30"))
+    TWILIO_TIMEOUT = float(os.getenv("TWILIO_TIMEOUT", "15"))
+    # Point the Twilio client at a local fake API (fake_twilio.py)
+    TWILIO_API_URL = os.getenv("TWILIO_API_URL", "")
+    # Answer incoming WhatsApp messages with the assistant, ahead of web chats
+    # in the AI queue; only requests signed with TWILIO_AUTH_TOKEN are answered.
+    # Answers are sent through the REST API by a small pool of reply threads
+    WHATSAPP_AI_REPLIES = os.getenv("WHATSAPP_AI_REPLIES", "false").lower() == "true"
+    WHATSAPP_REPLY_WORKERS = int(os.getenv("WHATSAPP_REPLY_WORKERS", "4"))
+    # Webhook URL exactly as configured in Twilio, for the signature check
+    # behind a proxy (defaults to the URL the request arrived on)
+    TWILIO_WEBHOOK_URL = os.getenv("TWILIO_WEBHOOK_URL", "")
     TEST_WHATSAPP_TO = os.getenv("TEST_WHATSAPP_TO")
 
     # Google OAuth Configuration
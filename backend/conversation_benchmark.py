@@ -0,0 +1,104 @@
+"""Prompt size per turn over a long conversation, by history strategy.
+
+    python conversation_benchmark.py --turns 100
+    python fake_ollama.py --delay 0 &
+    python conversation_benchmark.py --turns 60 --ollama http://localhost:11434
+
+Plays one synthetic conversation and, at every turn, builds the prompt
+three ways: replaying every earlier turn, the old window (the last
+OLLAMA_HISTORY_TURNS turns within OLLAMA_HISTORY_TOKENS), and the
+conversation memory (a rolling summary plus the last
+CONVERSATION_RECENT_TURNS turns within LLM_PROMPT_TOKENS). The summary is
+a stand-in of the size the real one is clipped to, so this measures prompt
+cost, not summary quality. With ``--ollama`` each prompt is also sent to
+that server's /api/chat and the evaluated prompt tokens and latency are
+reported.
+"""
+import argparse
+import random
+import time
+import requests
+from config import Config
+from utils.conversation_memory import assemble, turn_messages
+from utils.ollama_client import estimate_tokens, trim_history
+
+SYSTEM_PROMPT = "You are a careful pharmacy assistant. " * 20
+WORDS = ("dose tablet fever pain morning night food allergy blood pressure sugar doctor "
+         "week twice daily symptoms rash cough stomach kidney liver pregnancy").split()
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_turns(count, seed=7):
+    rng = random.Random(seed)
+    return [{"message": sentence(rng, rng.randint(10, 40)), "response": sentence(rng, rng.randint(80, 200))}
+            for _ in range(count)]
+
+
+def full_replay(chats):
+    return turn_messages(chats)
+
+
+def old_window(chats):
+    return trim_history(turn_messages(chats[-Config.OLLAMA_HISTORY_TURNS:]), Config.OLLAMA_HISTORY_TOKENS)
+
+
+def memory(chats, summarized):
+    recent = Config.CONVERSATION_RECENT_TURNS
+    summary = "summary " * min(Config.CONVERSATION_SUMMARY_TOKENS, 20 * summarized) if summarized else None
+    budget = min(Config.OLLAMA_HISTORY_TOKENS, Config.LLM_PROMPT_TOKENS - estimate_tokens(SYSTEM_PROMPT) - 60)
+    return assemble(summary, chats[-recent:], budget)
+
+
+def prompt_tokens(history, question):
+    return estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(question) + \
+        sum(estimate_tokens(turn["content"]) for turn in history)
+
+
+def ask(url, history, question):
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, *history, {"role": "user", "content": question}]
+    started = time.perf_counter()
+    body = requests.post(f"{url}/api/chat", json={
+        "model": Config.OLLAMA_MODEL, "messages": messages, "stream": False, "options": {"num_predict": 1}
+    }, timeout=600).json()
+    return body.get("prompt_eval_count", 0), (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt size per turn by history strategy")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--ollama", help="also send every prompt to this Ollama URL")
+    args = parser.parse_args()
+
+    turns = synthetic_turns(args.turns)
+    fold_every = Config.CONVERSATION_FOLD_EVERY
+    report = sorted({1, 2, 5, 10, 20, 50, 100, 200, args.turns} & set(range(1, args.turns + 1)))
+    strategies = ("full replay", "old window", "memory")
+
+    header = f"{'turn':>5}" + "".join(f" {name + ' tokens':>20}" for name in strategies)
+    if args.ollama:
+        header += "".join(f" {name + ' eval/ms':>22}" for name in strategies)
+    print(header)
+
+    summarized = 0
+    for turn in range(1, args.turns + 1):
+        earlier = turns[:turn - 1]
+        # The background fold catches up once fold_every turns leave the verbatim window
+        while len(earlier) - Config.CONVERSATION_RECENT_TURNS - summarized >= fold_every:
+            summarized += fold_every
+        question = turns[turn - 1]["message"]
+        histories = (full_replay(earlier), old_window(earlier), memory(earlier[summarized:], summarized))
+        if turn not in report:
+            continue
+        row = f"{turn:>5}" + "".join(f" {prompt_tokens(history, question):>20}" for history in histories)
+        if args.ollama:
+            for history in histories:
+                evaluated, ms = ask(args.ollama, history, question)
+                row += f" {f'{evaluated}/{ms:.0f}':>22}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
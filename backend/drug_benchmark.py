@@ -0,0 +1,317 @@
+"""Drug lookup benchmark: in-memory index vs the old $regex query path.
+
+    python drug_benchmark.py --drugs 50000
+    python drug_benchmark.py --drugs 50000 --mongo-uri mongodb://localhost:27017/bench
+    python drug_benchmark.py --drugs 15000 --fuzzy   # ~50k names
+    python drug_benchmark.py --drugs 50000 --interactions 4   # ~200k edges
+    python drug_benchmark.py --drugs 50000 --workers 4
+
+Builds a synthetic catalog (names, generic names and brand names) and times
+exact, prefix and substring lookups through DrugIndex. The old path - an
+unanchored case-insensitive $regex on ``name`` and then ``generic_name`` -
+is timed against a scratch MongoDB collection when ``--mongo-uri`` is
+given, and otherwise emulated in-process (a regex scan over every
+document, which is a lower bound for a real collection scan).
+
+``--fuzzy`` times typo-tolerant lookups (misspelled names) through
+DrugIndex.fuzzy_search against scanning every name with a textbook
+Levenshtein, and reports how often the intended drug is suggested.
+
+``--workers N`` starts N fresh processes that each load the catalog,
+either as their own copy of every document or from the shared
+memory-mapped snapshot file, and reports per-worker RSS and PSS (shared
+pages divided among the processes mapping them).
+
+``--interactions N`` gives every drug N interaction listings (by name,
+generic or brand name) and reports the interaction graph's size and memory
+and the time to check a patient's medication list for conflicts, against
+looking up each drug and scanning its interaction list per pair.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import string
+import tempfile
+import time
+import bson
+from utils.catalog_snapshot import CatalogSnapshot, write_snapshot
+from utils.drug_index import DrugIndex, normalize_name
+from utils.process_memory import process_memory
+
+ONSETS = ["b", "c", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "v", "z",
+          "br", "cl", "dr", "fl", "gl", "pr", "st", "tr", "ph", "th", "x", "qu"]
+VOWELS = ["a", "e", "i", "o", "u", "y", "ea", "io", "ou"]
+CODAS = ["", "", "", "n", "l", "r", "s", "x", "m", "t"]
+STEMS = ["statin", "pril", "sartan", "olol", "azole", "dipine", "formin", "tidine", "mycin",
+         "cillin", "oxacin", "profen", "zepam", "tinib", "mab", "vir", "setron", "lukast"]
+SALTS = ["Hydrochloride", "Sodium", "Calcium", "Besylate", "Maleate", "Sulfate", ""]
+
+
+def synthetic_name(rng):
+    """A pronounceable made-up drug name, often with a real class stem"""
+    name = "".join(
+        rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS) for _ in range(rng.randint(2, 3))
+    )
+    if rng.random() < 0.4:
+        name += rng.choice(STEMS)
+    return name.capitalize()
+
+
+def synthetic_catalog(count, seed=42, interactions=0):
+    """``count`` drug documents with unique names, a generic name and brands.
+
+    With ``interactions``, each drug lists that many other drugs it
+    interacts with, named the way real labels do (name, generic or brand).
+    """
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        names.add(synthetic_name(rng))
+    drugs = []
+    for i, name in enumerate(sorted(names)):
+        drugs.append({
+            "_id": f"drug-{i}",
+            "name": name,
+            "generic_name": f"{name} {rng.choice(SALTS)}".strip(),
+            "brand_names": [synthetic_name(rng) + rng.choice(string.ascii_uppercase) for _ in range(rng.randint(0, 3))],
+            "interactions": [],
+            "government_status": {"status": "Approved"}
+        })
+    for drug in drugs:
+        for other in rng.sample(drugs, interactions):
+            if other is not drug:
+                drug["interactions"].append(rng.choice(
+                    [other["name"], other["generic_name"]] + other["brand_names"]
+                ))
+    return drugs
+
+
+def misspell(name, rng):
+    """``name`` with one typo: a dropped, swapped, replaced or extra letter"""
+    i = rng.randrange(1, len(name) - 1)
+    typo = rng.choice("dsri")
+    if typo == "d":
+        return name[:i] + name[i + 1:]
+    if typo == "s":
+        return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+    if typo == "r":
+        return name[:i] + rng.choice("aeiouy") + name[i + 1:]
+    return name[:i] + rng.choice("aeiouy") + name[i:]
+
+
+def levenshtein(a, b):
+    """Textbook dynamic-programming edit distance"""
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        previous = current
+    return previous[-1]
+
+
+def levenshtein_scan(names, max_distance=2):
+    """The naive fuzzy path: edit distance to every name in the catalog"""
+    def lookup(query):
+        query = query.lower()
+        scored = sorted((levenshtein(query, name), name) for name in names)
+        return [name for distance, name in scored[:5] if distance <= max_distance]
+    return lookup
+
+
+def time_calls(fn, queries):
+    started = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - started) / len(queries)
+
+
+def regex_scan(drugs):
+    """The old query path, emulated: $regex on name, then generic_name"""
+    def lookup(query):
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        for field in ("name", "generic_name"):
+            for drug in drugs:
+                if pattern.search(drug.get(field, "")):
+                    return drug
+        return None
+    return lookup
+
+
+def mongo_regex(uri, drugs):
+    from pymongo import MongoClient
+    collection = MongoClient(uri).get_default_database().drug_benchmark
+    collection.drop()
+    collection.insert_many([dict(drug) for drug in drugs])
+
+    def lookup(query):
+        pattern = {"$regex": re.escape(query), "$options": "i"}
+        return collection.find_one({"name": pattern}) or collection.find_one({"generic_name": pattern})
+    return lookup, collection
+
+
+def fuzzy_benchmark(index, sample, scan_queries):
+    rng = random.Random(11)
+    queries = [(misspell(drug["name"].lower(), rng), drug) for drug in sample]
+
+    started = time.perf_counter()
+    found = sum(any(match[2] is drug for match in index.fuzzy_search(query)) for query, drug in queries)
+    fast = (time.perf_counter() - started) / len(queries)
+
+    names = index._snapshot.keys
+    baseline = time_calls(levenshtein_scan(names), [query for query, _ in queries[:scan_queries]])
+
+    print(f"{'fuzzy lookup':<22} {'µs/query':>12}")
+    print(f"{'index (trigram + OSA)':<22} {fast * 1e6:>12.1f}   intended drug in top 5: {found / len(queries):.1%}")
+    print(f"{'Levenshtein scan':<22} {baseline * 1e6:>12.0f}   ({baseline / fast:.0f}x slower)")
+
+
+def pairwise_scan(index):
+    """The naive check: look up both drugs of every pair and scan their lists"""
+    def check(medications):
+        drugs = [index.lookup(name) for name in medications]
+        conflicts = []
+        for i, a in enumerate(drugs):
+            for b in drugs[i + 1:]:
+                if a is None or b is None:
+                    continue
+                names_b = {normalize_name(n) for n in [b["name"], b.get("generic_name", "")] + b.get("brand_names", [])}
+                names_a = {normalize_name(n) for n in [a["name"], a.get("generic_name", "")] + a.get("brand_names", [])}
+                if any(normalize_name(n) in names_b for n in a.get("interactions", [])) or \
+                        any(normalize_name(n) in names_a for n in b.get("interactions", [])):
+                    conflicts.append((a["name"], b["name"]))
+        return conflicts
+    return check
+
+
+def interaction_benchmark(index, drugs, queries, medications):
+    rng = random.Random(13)
+    graph = index._snapshot.interactions
+
+    stats = graph.stats()
+
+    # Random drugs, with a few named next to something they interact with
+    lists = []
+    for _ in range(queries):
+        meds = []
+        while len(meds) < medications:
+            drug = rng.choice(drugs)
+            meds.append(drug["name"])
+            if drug["interactions"] and rng.random() < 0.2:
+                meds.append(rng.choice(drug["interactions"]))
+        rng.shuffle(meds)
+        lists.append(meds[:medications])
+    fast = time_calls(index.check_interactions, lists)
+    found = sum(len(index.check_interactions(meds)["interactions"]) for meds in lists) / len(lists)
+    baseline = time_calls(pairwise_scan(index), lists[:max(1, queries // 20)])
+
+    print(f"Interaction graph: {stats['nodes']} nodes, {stats['edges']} edges "
+          f"({stats['bytes'] / 2**20:.1f} MB of adjacency arrays)")
+    print(f"{medications} medications per check, {found:.1f} conflicts found on average\n")
+    print(f"{'interaction check':<22} {'µs/list':>12}")
+    print(f"{'graph':<22} {fast * 1e6:>12.1f}")
+    print(f"{'pairwise scan':<22} {baseline * 1e6:>12.0f}   ({baseline / fast:.0f}x slower)")
+
+
+def worker_memory(path, mode, loaded, measure, results):
+    """One fresh worker: load the catalog, then report its memory"""
+    before = process_memory()
+    index = DrugIndex(collection=None, refresh_interval=0)
+    if mode == "copy":
+        index.load_documents(list(CatalogSnapshot(path, cache_size=0).values()))
+    else:
+        index.snapshot_path = path
+        index._open_snapshot()
+    # Serve every drug once, as traffic would over time
+    for drug_id in list(index._snapshot.drugs):
+        index.get(drug_id)
+    loaded.release()
+    measure.wait()
+    results.put((mode, before, process_memory()))
+
+
+def memory_benchmark(drugs, workers):
+    path = os.path.join(tempfile.mkdtemp(), "catalog.snapshot")
+    write_snapshot(path, {drug["_id"]: bson.encode(drug) for drug in drugs})
+    print(f"Snapshot file: {os.path.getsize(path) / 2**20:.1f} MB\n")
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'catalog per worker':<20} {'RSS before':>11} {'RSS after':>11} {'PSS after':>11}   ({workers} workers, MB)")
+    for mode in ("copy", "snapshot"):
+        loaded, measure, results = context.Semaphore(0), context.Event(), context.Queue()
+        processes = [context.Process(target=worker_memory, args=(path, mode, loaded, measure, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            loaded.acquire()
+        measure.set()  # every worker is loaded, so PSS splits the shared pages between all of them
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        mb = lambda key, when: sum(report[when][key] for report in reports) / len(reports) / 2**20
+        label = "own copy" if mode == "copy" else "mmap snapshot"
+        print(f"{label:<20} {mb('rss', 1):>11.0f} {mb('rss', 2):>11.0f} {mb('pss', 2):>11.0f}")
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lifexia drug lookup benchmark")
+    parser.add_argument("--drugs", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--slow-queries", type=int, default=50, help="queries for the regex path")
+    parser.add_argument("--mongo-uri", help="time the real $regex path against this database")
+    parser.add_argument("--fuzzy", action="store_true", help="benchmark typo-tolerant lookups instead")
+    parser.add_argument("--scan-queries", type=int, default=5, help="queries for the Levenshtein scan")
+    parser.add_argument("--interactions", type=int, default=0, metavar="N",
+                        help="benchmark interaction checks with N interaction listings per drug")
+    parser.add_argument("--medications", type=int, default=20, help="medications per interaction check")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="measure per-worker memory with N processes, own copy vs shared snapshot")
+    args = parser.parse_args()
+
+    drugs = synthetic_catalog(args.drugs, interactions=args.interactions)
+    if args.workers:
+        return memory_benchmark(drugs, args.workers)
+    rng = random.Random(7)
+    sample = [rng.choice(drugs) for _ in range(args.queries)]
+    workloads = {
+        "exact": [d["name"].lower() for d in sample],
+        "prefix": [d["name"][:-2] for d in sample],
+        "substring": [d["generic_name"][2:8] for d in sample],
+        "miss": [f"zzq{i}" for i in range(args.queries)]
+    }
+
+    index = DrugIndex(collection=None, refresh_interval=0)
+    started = time.perf_counter()
+    index.load_documents(drugs)
+    build = time.perf_counter() - started
+    print(f"Catalog: {len(drugs)} drugs, {index.stats()['names']} names, index built in {build * 1000:.0f} ms\n")
+
+    if args.fuzzy:
+        return fuzzy_benchmark(index, sample, args.scan_queries)
+    if args.interactions:
+        return interaction_benchmark(index, drugs, args.queries, args.medications)
+
+    collection = None
+    if args.mongo_uri:
+        slow, collection = mongo_regex(args.mongo_uri, drugs)
+        slow_label = "mongo $regex"
+    else:
+        slow, slow_label = regex_scan(drugs), "regex scan"
+
+    print(f"{'workload':<10} {'index (µs)':>12} {slow_label + ' (µs)':>18} {'speed-up':>10}")
+    for name, queries in workloads.items():
+        fast = time_calls(index.lookup, queries)
+        baseline = time_calls(slow, queries[:args.slow_queries])
+        print(f"{name:<10} {fast * 1e6:>12.1f} {baseline * 1e6:>18.0f} {baseline / fast:>9.0f}x")
+
+    if collection is not None:
+        collection.drop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Minimal stand-in for the Ollama HTTP API, for load tests and local runs.
+
+    python fake_ollama.py --port 11434 --delay 5
+
+Answers /api/tags, /api/ps, /api/pull, /api/generate and /api/chat (streaming and
+non-streaming) after ``--delay`` seconds, so the backend can be exercised
+without a model. /api/chat reports a ``prompt_eval_count`` that, like the
+real server, only counts messages past the prefix seen on the last call.
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(delay, model):
+    last_messages = []
+
+    def prompt_eval_count(messages):
+        # Simulate KV-cache reuse: only messages past the shared prefix are evaluated
+        shared = 0
+        while shared < min(len(messages), len(last_messages)) and messages[shared] == last_messages[shared]:
+            shared += 1
+        last_messages[:] = messages
+        return sum(len(m.get("content", "")) // 4 + 1 for m in messages[shared:])
+
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path in ("/api/tags", "/api/ps"):
+                self._send_json({"models": [{"name": model}]})
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            if self.path == "/api/pull":
+                self._send_json({"status": "success"})
+                return
+            if self.path == "/api/generate" and "prompt" not in body:
+                # Load-only request (model warm-up / keep-alive ping)
+                self._send_json({"model": body.get("model"), "response": "", "done": True})
+                return
+            if self.path not in ("/api/generate", "/api/chat"):
+                self._send_json({"error": "not found"}, 404)
+                return
+
+            is_chat = self.path == "/api/chat"
+            words = ["This", " is", " a", " simulated", " answer."]
+            final = {"done": True, "eval_count": len(words)}
+            if is_chat:
+                final["prompt_eval_count"] = prompt_eval_count(body.get("messages", []))
+
+            def chunk(text):
+                if is_chat:
+                    return {"message": {"role": "assistant", "content": text}}
+                return {"response": text}
+
+            if not body.get("stream", True):
+                time.sleep(delay)
+                self._send_json({"model": body.get("model"), **chunk("".join(words)), **final})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in words + [""]:
+                time.sleep(delay / len(words))
+                payload = {**chunk(word), **final} if word == "" else {**chunk(word), "done": False}
+                line = json.dumps(payload) + "\n"
+                self.wfile.write(f"{len(line.encode()):x}\r\n{line}\r\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+    return FakeOllamaHandler
+
+
+def serve(port=11434, delay=1.0, model="llama3.2"):
+    server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(delay, model))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds per generation")
+    parser.add_argument("--model", default="llama3.2")
+    args = parser.parse_args()
+
+    print(f"✅ Fake Ollama listening on :{args.port} (delay {args.delay}s)")
+    serve(args.port, args.delay, args.model).serve_forever()
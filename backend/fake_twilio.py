@@ -0,0 +1,106 @@
+"""Minimal stand-in for Twilio's Messages API, for broadcast tests and benchmarks.
+
+    python fake_twilio.py --port 8899 --delay 0.2 --rate 50
+    TWILIO_API_URL=http://localhost:8899 TWILIO_ACCOUNT_SID=ACfake TWILIO_AUTH_TOKEN=x ...
+
+Accepts POST /2010-04-01/Accounts/<sid>/Messages.json like the real API and
+answers 201 with a queued message after ``--delay`` seconds. More than
+``--rate`` messages per second get Twilio's 429 (error 20429),
+``--fail-rate`` of the requests fail with a 500, and numbers ending in 000
+are rejected with a 400 (error 21211, invalid 'To' number).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+def make_handler(delay, rate, fail_rate):
+    lock = threading.Lock()
+    window = {"second": 0, "count": 0}
+    counters = {"accepted": 0, "throttled": 0, "failed": 0, "rejected": 0}
+
+    def count(key):
+        with lock:
+            counters[key] += 1
+
+    def over_rate():
+        with lock:
+            second = int(time.monotonic())
+            if window["second"] != second:
+                window.update(second=second, count=0)
+            window["count"] += 1
+            return rate and window["count"] > rate
+
+    class FakeTwilioHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        stats = counters
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status, code, message):
+            self._reply(status, {"code": code, "message": message, "status": status,
+                                 "more_info": f"https://www.twilio.com/docs/errors/{code}"})
+
+        def do_POST(self):
+            form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+            if not self.path.endswith("/Messages.json"):
+                return self._error(404, 20404, "The requested resource was not found")
+            if over_rate():
+                count("throttled")
+                return self._error(429, 20429, "Too Many Requests")
+            time.sleep(delay)
+            to = form.get("To", [""])[0]
+            if to.endswith("000"):
+                count("rejected")
+                return self._error(400, 21211, f"The 'To' number {to} is not a valid phone number.")
+            if random.random() < fail_rate:
+                count("failed")
+                return self._error(500, 20500, "Internal Server Error")
+            count("accepted")
+            self._reply(201, {
+                "sid": f"SM{uuid.uuid4().hex}",
+                "status": "queued",
+                "to": to,
+                "from": form.get("From", [""])[0],
+                "body": form.get("Body", [""])[0]
+            })
+
+    return FakeTwilioHandler
+
+
+def serve(port, delay=0.2, rate=0, fail_rate=0.0):
+    """Start the fake API on a background thread; returns the server"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay, rate, fail_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Twilio Messages API")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--delay", type=float, default=0.2, help="seconds per accepted request")
+    parser.add_argument("--rate", type=int, default=0, help="messages per second before 429s (0 = unlimited)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), make_handler(args.delay, args.rate, args.fail_rate))
+    print(f"Fake Twilio API on :{args.port} (delay {args.delay}s, rate {args.rate or 'unlimited'}/s)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
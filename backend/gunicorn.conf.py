@@ -0,0 +1,24 @@
+import os
+
+# Gunicorn settings for the Lifexia backend.
+#
+# Chat requests spend most of their time waiting on Ollama. With the default
+# sync workers each of those waits pins a whole worker process, so a few slow
+# generations starve /health, /api/login and the Twilio webhook. The gevent
+# worker monkey-patches sockets before the app is imported, which makes
+# requests, pymongo and threading cooperative: one worker process can then
+# hold `worker_connections` pending chats while other routes keep responding.
+# Greenlets only switch on I/O, so CPU-heavy background work (drug index
+# rebuilds, hashing embeddings) goes through utils.offload.cpu_bound(),
+# which runs it on gevent's native thread pool instead of the hub.
+# Set GUNICORN_WORKER_CLASS=sync to get the old behaviour back.
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+# Must outlast the slowest Ollama call (OLLAMA_READ_TIMEOUT) for sync workers
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "90"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
@@ -0,0 +1,123 @@
+"""Concurrent-chat load test for a running backend.
+
+    python fake_ollama.py --delay 5 &
+    OLLAMA_HOST=http://localhost:11434 gunicorn -c gunicorn.conf.py app:app &
+    python loadtest.py --url http://localhost:5000 --chats 200
+
+Fires ``--chats`` concurrent /api/chat requests (each with a unique message,
+so the response cache and single-flight do not hide the load) while probing
+/health in the background. Run it once with GUNICORN_WORKER_CLASS=sync and
+once with the default gevent workers to compare capacity.
+
+With ``--email``/``--password`` every chat is sent as that logged-in user,
+so each turn is also persisted; ``--endpoint login`` hammers /api/login
+instead. Compare those runs with WRITE_BEHIND_ENABLED=false and true to
+see what the synchronous log writes cost each request.
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def logged_in_session(url, email, password, timeout):
+    client = requests.Session()
+    if email:
+        client.post(f"{url}/api/login", json={"email": email, "password": password},
+                    timeout=timeout).raise_for_status()
+    return client
+
+
+def run_request(url, endpoint, credentials, timeout):
+    email, password = credentials
+    try:
+        client = logged_in_session(url, email, password, timeout) if endpoint == "chat" else requests
+    except requests.RequestException:
+        return False, None, 0.0
+    started = time.perf_counter()
+    try:
+        if endpoint == "login":
+            response = client.post(f"{url}/api/login", json={"email": email, "password": password},
+                                   timeout=timeout)
+        else:
+            response = client.post(
+                f"{url}/api/chat",
+                json={"message": f"Load test question {uuid.uuid4().hex}"},
+                timeout=timeout
+            )
+        ok = response.status_code == 200 and response.json().get("success")
+        return ok, response.status_code, time.perf_counter() - started
+    except requests.RequestException:
+        return False, None, time.perf_counter() - started
+
+
+def probe_health(url, stop, latencies, failures):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            requests.get(f"{url}/health", timeout=5).raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except requests.RequestException:
+            failures.append(time.perf_counter() - started)
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lifexia concurrent chat load test")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--chats", type=int, default=100, help="concurrent requests")
+    parser.add_argument("--endpoint", choices=["chat", "login"], default="chat")
+    parser.add_argument("--email", help="log in as this user (required for --endpoint login)")
+    parser.add_argument("--password")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+    if args.endpoint == "login" and not args.email:
+        parser.error("--endpoint login needs --email and --password")
+    credentials = (args.email, args.password)
+
+    stop = threading.Event()
+    health_latencies, health_failures = [], []
+    prober = threading.Thread(target=probe_health, args=(args.url, stop, health_latencies, health_failures))
+    prober.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.chats) as pool:
+        results = list(pool.map(lambda _: run_request(args.url, args.endpoint, credentials, args.timeout),
+                                range(args.chats)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    prober.join()
+
+    ok = [r for r in results if r[0]]
+    statuses = {}
+    for _, status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    chat_latencies = [r[2] for r in ok]
+
+    print(f"{args.endpoint.title()} requests: {len(ok)}/{args.chats} succeeded in {elapsed:.1f}s "
+          f"({len(ok) / elapsed:.1f}/s), statuses {statuses}")
+    if chat_latencies:
+        print(f"  latency       p50 {percentile(chat_latencies, 50) * 1000:.0f}ms  "
+              f"p95 {percentile(chat_latencies, 95) * 1000:.0f}ms  max {max(chat_latencies) * 1000:.0f}ms")
+    if health_latencies:
+        print(f"  /health       p50 {percentile(health_latencies, 50) * 1000:.0f}ms  "
+              f"p95 {percentile(health_latencies, 95) * 1000:.0f}ms  "
+              f"mean {statistics.mean(health_latencies) * 1000:.0f}ms  "
+              f"failures {len(health_failures)}")
+    else:
+        print(f"  /health       no successful probes, failures {len(health_failures)}")
+
+
+if __name__ == "__main__":
+    main()
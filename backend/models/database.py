@@ -1,10 +1,15 @@
 from pymongo import MongoClient
+from pymongo.collation import Collation
 from config import Config
+from utils.write_behind import WriteBehind
 
 client = MongoClient(Config.MONGO_URI)
 # This will get the database named in the connection string (pharma_chatbot)
 db = client.get_default_database()
 
+# Case-insensitive comparison; drug name and status queries use it to hit their indexes
+CASE_INSENSITIVE = Collation(locale="en", strength=2)
+
 # Export common collections for easy access
 drugs_collection = db.drugs
 users_collection = db.users
@@ -12,3 +17,13 @@ chat_history = db.chat_history
 whatsapp_logs = db.whatsapp_logs
 login_logs = db.login_logs
 broadcast_history = db.broadcast_history
+
+# Chat turns, login and WhatsApp logs are queued and written in batches
+write_behind = WriteBehind(
+    db,
+    batch_size=Config.WRITE_BEHIND_BATCH_SIZE,
+    flush_interval=Config.WRITE_BEHIND_FLUSH_INTERVAL,
+    max_queue=Config.WRITE_BEHIND_MAX_QUEUE,
+    spill_dir=Config.WRITE_BEHIND_SPILL_DIR or None,
+    enabled=Config.WRITE_BEHIND_ENABLED
+)
@@ -0,0 +1,69 @@
+from datetime import datetime
+from pymongo import UpdateOne
+from models.database import db, drugs_collection, CASE_INSENSITIVE
+from utils.drug_index import DrugIndex
+from utils.render_cache import RenderCache
+from config import Config
+
+# One document ({"_id": "drugs", "version": n}) bumped on every catalog write
+catalog_meta = db.catalog_meta
+
+# Per-process index of the catalog, loaded by app.py at startup
+drug_index = DrugIndex(
+    drugs_collection,
+    catalog_meta,
+    refresh_interval=Config.DRUG_INDEX_REFRESH,
+    snapshot_path=Config.DRUG_SNAPSHOT_PATH or None,
+    sync_overlap=Config.DRUG_INDEX_SYNC_OVERLAP
+)
+
+# Rendered drug cards and API payloads, dropped when a drug's revision changes
+render_cache = RenderCache(max_bytes=Config.RENDER_CACHE_MAX_BYTES)
+drug_index.listeners.append(render_cache.retain)
+
+
+def get_catalog_version():
+    """Current catalog version stamp (0 if never bumped)"""
+    meta = catalog_meta.find_one({"_id": "drugs"})
+    return meta.get("version", 0) if meta else 0
+
+
+def bump_catalog_version():
+    """Tell every worker's drug index that the catalog changed"""
+    catalog_meta.update_one(
+        {"_id": "drugs"},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def save_drug(drug):
+    """Insert or update a drug by name (any case), bump its revision and publish the change"""
+    save_drugs([drug])
+
+
+def save_drugs(drugs):
+    """save_drug() for many drugs in one bulk write and one version bump"""
+    now = datetime.utcnow()
+    writes = []
+    for drug in drugs:
+        # The server owns these; a new drug starts at revision 1
+        fields = {key: value for key, value in drug.items() if key not in ("_id", "revision", "created_at")}
+        fields["updated_at"] = now
+        writes.append(UpdateOne(
+            {"name": fields["name"]},
+            {"$set": fields, "$setOnInsert": {"created_at": now}, "$inc": {"revision": 1}},
+            upsert=True,
+            collation=CASE_INSENSITIVE
+        ))
+    if writes:
+        drugs_collection.bulk_write(writes, ordered=False)
+        bump_catalog_version()
+
+
+def delete_drug(name):
+    """Remove a drug by name and publish the change"""
+    result = drugs_collection.delete_one({"name": name}, collation=CASE_INSENSITIVE)
+    if result.deleted_count:
+        bump_catalog_version()
+    return result.deleted_count > 0
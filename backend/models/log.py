@@ -1,10 +1,10 @@
-from models.database import db
+from models.database import db, write_behind
 from datetime import datetime
 from bson.objectid import ObjectId
 
 def log_login(user_id, ip_address="Unknown"):
     """Log a user login event"""
-    db.login_logs.insert_one({
+    write_behind.insert("login_logs", {
         "user_id": ObjectId(user_id),
         "ip_address": ip_address,
         "timestamp": datetime.utcnow()
@@ -24,14 +24,16 @@ def get_login_history(user_id):
 
 def log_whatsapp_message(sender, message, source="User"):
     """Log an incoming WhatsApp message and subscribe the user"""
-    db.whatsapp_logs.insert_one({
+    write_behind.insert("whatsapp_logs", {
         "sender": sender,
         "message": message,
         "source": source,
         "timestamp": datetime.utcnow()
     })
     # Auto-subscribe users who message the bot
-    subscribe_user(sender)
+    subscription = subscriber_upsert(sender)
+    if subscription:
+        write_behind.upsert("subscribers", *subscription, key=subscription[0]["phone"])
 
 def get_whatsapp_messages():
     """Get all WhatsApp messages (for admin)"""
@@ -46,26 +48,35 @@ def get_whatsapp_messages():
         for log in logs
     ]
 
-def subscribe_user(phone):
-    """Add a phone number to the subscribers list if not already present"""
+def subscriber_upsert(phone):
+    """(filter, update) that subscribes a phone number, or None"""
     if not phone:
-        return
+        return None
     
     # Ensure phone starts with whatsapp: for Twilio consistency if it looks like a number
     if not phone.startswith("whatsapp:") and (phone.startswith("+") or phone.isdigit()):
         phone = f"whatsapp:{phone}"
         
-    db.subscribers.update_one(
+    return (
         {"phone": phone},
-        {"$set": {"last_seen": datetime.utcnow()}, "$setOnInsert": {"subscribed_at": datetime.utcnow()}},
-        upsert=True
+        {"$set": {"last_seen": datetime.utcnow()}, "$setOnInsert": {"subscribed_at": datetime.utcnow()}}
     )
 
+def subscribe_user(phone):
+    """Add a phone number to the subscribers list if not already present"""
+    subscription = subscriber_upsert(phone)
+    if subscription:
+        db.subscribers.update_one(*subscription, upsert=True)
+
 def get_subscribers():
     """Get all subscribed WhatsApp numbers"""
     subscribers = db.subscribers.find()
     return [s for s in subscribers]
 
+def iter_subscribers(batch_size=1000):
+    """Every subscriber's phone, streamed from a cursor"""
+    return db.subscribers.find({}, {"phone": 1}).batch_size(batch_size)
+
 def get_unique_senders_count():
     """Get total count of unique WhatsApp members"""
     return db.subscribers.count_documents({})
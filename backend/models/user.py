@@ -1,7 +1,7 @@
-from models.database import db
+from models.database import db, write_behind
 from bson.objectid import ObjectId
 import bcrypt
-from datetime import datetime
+from datetime import datetime, timedelta
 
 def create_user(email, password, is_admin=False):
     if db.users.find_one({"email": email}):
@@ -48,14 +48,99 @@ def create_or_get_google_user(email, google_id):
     
     return db.users.find_one({"_id": result.inserted_id})
 
-def save_chat(user_id, message, response):
-    db.chats.insert_one({
+def save_chat(user_id, message, response, metrics=None):
+    chat = {
         "user_id": ObjectId(user_id),
         "message": message,
         "response": response,
         "timestamp": datetime.utcnow()
-    })
+    }
+    if metrics:
+        # Ollama token counts for this turn (prompt_eval_count etc.)
+        chat["metrics"] = metrics
+    write_behind.insert("chats", chat)
+
+def get_recent_chats(user_id, limit=10):
+    """Get the user's last `limit` chat turns, oldest first"""
+    chats = db.chats.find(
+        {"user_id": ObjectId(user_id)},
+        {"message": 1, "response": 1}
+    ).sort("timestamp", -1).limit(limit)
+    return list(chats)[::-1]
+
+HISTORY_FIELDS = {"message": 1, "response": 1, "timestamp": 1}
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(chat):
+    """Opaque position of a chat turn: "<timestamp in ms>-<_id>" """
+    return f"{(chat['timestamp'] - EPOCH) // timedelta(milliseconds=1)}-{chat['_id']}"
+
+
+def decode_cursor(cursor):
+    """(timestamp, _id) from encode_cursor(); ValueError if malformed"""
+    millis, _, chat_id = cursor.partition("-")
+    try:
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(chat_id)
+    except Exception:
+        raise ValueError(f"Invalid history cursor: {cursor}")
+
+
+def history_entry(chat):
+    return {
+        "id": str(chat["_id"]),
+        "message": chat["message"],
+        "response": chat["response"],
+        "timestamp": chat["timestamp"].isoformat()
+    }
+
+
+def cursor_range(op, cursor):
+    """Filter for the turns before ("$lt") or after ("$gt") a cursor"""
+    timestamp, chat_id = decode_cursor(cursor)
+    return {"$or": [
+        {"timestamp": {op: timestamp}},
+        {"timestamp": timestamp, "_id": {op: chat_id}}
+    ]}
+
+
+def get_user_chats(user_id, before=None, after=None, limit=50):
+    """One page of a user's chat turns, oldest first.
+
+    Pages are keyed on (timestamp, _id), so each one is a range scan of the
+    chats index however deep into the history it is. With no cursor the
+    latest ``limit`` turns are returned; ``before`` gives the turns just
+    older than that cursor and ``after`` the turns just newer. Returns
+    ``(chats, more)``, ``more`` telling whether the scan stopped at
+    ``limit`` (older turns remain for ``before`` or no cursor, newer ones
+    for ``after``).
+    """
+    query = {"user_id": ObjectId(user_id)}
+    newest_first = after is None
+    cursor = before if newest_first else after
+    if cursor:
+        query.update(cursor_range("$lt" if newest_first else "$gt", cursor))
+    direction = -1 if newest_first else 1
+    chats = list(db.chats.find(query, HISTORY_FIELDS)
+                 .sort([("timestamp", direction), ("_id", direction)])
+                 .limit(limit + 1))
+    more = len(chats) > limit
+    chats = chats[:limit]
+    if newest_first:
+        chats.reverse()
+    return chats, more
+
+
+def count_user_chats(user_id, after=None, before=None, limit=0):
+    """Turns strictly between two cursors (either may be None), counting at most ``limit``"""
+    ranges = [cursor_range(op, cursor) for op, cursor in (("$gt", after), ("$lt", before)) if cursor]
+    query = {"user_id": ObjectId(user_id)}
+    if ranges:
+        query["$and"] = ranges
+    return db.chats.count_documents(query, limit=limit)
+
 
-def get_user_chats(user_id):
-    chats = db.chats.find({"user_id": ObjectId(user_id)}).sort("timestamp", 1)
-    return [{"message": c["message"], "response": c["response"], "timestamp": c["timestamp"].isoformat()} for c in chats]
\ No newline at end of file
+def iter_user_chats(user_id, batch_size=500):
+    """Every chat turn of a user, oldest first, fetched ``batch_size`` at a time"""
+    return db.chats.find({"user_id": ObjectId(user_id)}, HISTORY_FIELDS) \
+        .sort([("timestamp", 1), ("_id", 1)]).batch_size(batch_size)
\ No newline at end of file
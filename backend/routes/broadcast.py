@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, json, request, jsonify, session
 from utils.whatsapp_service import WhatsAppService
-from models.log import get_subscribers, get_unique_senders_count
+from models.log import iter_subscribers, get_unique_senders_count
+from models.drug import drug_index
 from config import Config
 
 broadcast_bp = Blueprint('broadcast', __name__)
@@ -12,25 +13,34 @@ def get_broadcast_stats():
         return jsonify({"success": False, "error": "Unauthorized"}), 403
     
     count = get_unique_senders_count()
-    return jsonify({"success": True, "subscriber_count": count})
+    # Drugs a recall notice can be sent for, straight from the in-memory registry
+    recall_alerts = [drug.get("name") for drug in drug_index.banned_drugs()]
+    return jsonify({"success": True, "subscriber_count": count, "recall_alerts": recall_alerts})
 
 @broadcast_bp.route("/broadcast", methods=["POST"])
 def send_broadcast():
-    return jsonify({"success": False, "error": "LIFEXIA_VERSION_2_ACTIVE"}), 500
     if not session.get("is_admin"):
         return jsonify({"success": False, "error": "Admins only"}), 403
 
-    data = request.json
+    data = request.get_json(silent=True) or {}
     message = data.get("message")
     source = data.get("source", "Lifexia Safety Team")
+    drug_name = data.get("drug")
 
-    if not message:
+    # A recall notice for a drug in the banned/recalled registry
+    recalled = None
+    if drug_name:
+        recalled = drug_index.banned_status(drug_name)
+        if recalled is None:
+            return jsonify({"success": False, "error": f"'{drug_name}' is not a banned or recalled drug"}), 400
+
+    if not message and not recalled:
         return jsonify({"success": False, "error": "Message required"}), 400
 
     whatsapp = WhatsAppService()
-    subscribers = get_subscribers()
-    
-    if not subscribers:
+    if not whatsapp.client:
+        return jsonify({"success": False, "error": "Twilio not configured"}), 503
+    if get_unique_senders_count() == 0:
         return jsonify({"success": False, "error": "No subscribers found"}), 404
 
     # Format the message for better readability on WhatsApp
@@ -43,9 +53,18 @@ Source: *{source}*
 ⚠️ *Note:* Do NOT take action without consulting a doctor.
     """.strip()
 
+    if recalled:
+        status = recalled.get("government_status", {})
+        reason = message or status.get("notes") or status.get("status")
+        text = whatsapp.recall_message(recalled.get("name"), reason)
+    else:
+        text = formatted_message
+
+    if request.accept_mimetypes.best == "application/x-ndjson":
+        return stream_broadcast(whatsapp, text)
+
     try:
-        # Use simple list for broadcast_alert which expects list of dicts with 'phone'
-        results = whatsapp.broadcast_alert(subscribers, formatted_message)
+        results = whatsapp.broadcast_alert(iter_subscribers(), text)
         return jsonify({
             "success": True, 
             "sent_count": results.get("sent", 0),
@@ -53,4 +72,15 @@ Source: *{source}*
             "details": results.get("results", [])
         })
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def stream_broadcast(whatsapp, text):
+    """One NDJSON line per recipient as each send finishes, then a summary line"""
+    def generate():
+        counts = {"sent": 0, "failed": 0}
+        for outcome in whatsapp.broadcast_stream(iter_subscribers(), text):
+            counts["sent" if outcome["result"]["success"] else "failed"] += 1
+            yield json.dumps(outcome) + "\n"
+        yield json.dumps({"done": True, "sent_count": counts["sent"], "failed_count": counts["failed"]}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
@@ -1,43 +1,89 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session
 from datetime import datetime
+import json
+import time
 import requests
 import re
-from utils.ollama_client import OllamaClient
-from models.database import drugs_collection, db
-from models.user import save_chat
+from utils.ollama_client import OllamaClient, StreamError, clip_to_tokens, estimate_tokens, trim_history
+from utils.model_router import ModelRouter
+from utils.model_warmup import ModelWarmer, ModelWarmingError
+from utils.intent_classifier import IntentClassifier
+from utils.drug_retriever import DrugRetriever, HashingEmbedder, OllamaEmbedder
+from utils.conversation_memory import ConversationMemory, turn_messages
+from config import Config
+from utils.llm_scheduler import (
+    QueueFullError, DeadlineExceeded, PRIORITY_ADMIN, PRIORITY_DEFAULT
+)
+from models.database import drugs_collection, db, CASE_INSENSITIVE
+from models.drug import drug_index, render_cache
+from utils.drug_index import BANNED_STATUSES
+from models.user import save_chat, get_recent_chats
 
 chat_bp = Blueprint('chat', __name__)
 
 ollama_client = OllamaClient()
+model_router = ModelRouter(
+    main_model=Config.OLLAMA_MODEL,
+    fast_model=Config.OLLAMA_FAST_MODEL,
+    main_deadline=Config.LLM_MAIN_DEADLINE,
+    fast_deadline=Config.LLM_FAST_DEADLINE,
+    short_message_words=Config.LLM_SHORT_MESSAGE_WORDS,
+    intent_models=Config.OLLAMA_INTENT_MODELS
+)
+model_warmer = None
+if Config.OLLAMA_WARMUP:
+    model_warmer = ModelWarmer(
+        ollama_client,
+        model_router.models(),
+        ping_interval=Config.OLLAMA_PING_INTERVAL,
+        pull_missing=Config.OLLAMA_PULL_MISSING,
+        state_path=Config.OLLAMA_WARMUP_STATE_PATH or None
+    )
+    ollama_client.warmer = model_warmer
 
-# Enhanced keyword detection
+# Catalog records most similar to the question, for the AI context
+drug_retriever = None
+if Config.RAG_ENABLED:
+    drug_retriever = DrugRetriever(
+        drug_index,
+        OllamaEmbedder(ollama_client, Config.RAG_EMBED_MODEL) if Config.RAG_EMBED_MODEL else HashingEmbedder(),
+        Config.RAG_INDEX_DIR,
+        refresh_interval=Config.RAG_REFRESH,
+        top_k=Config.RAG_TOP_K,
+        min_score=Config.RAG_MIN_SCORE,
+        max_tokens=Config.RAG_CONTEXT_TOKENS
+    )
+
+# Last turns verbatim plus a rolling summary of the rest, for long conversations
+conversation_memory = None
+if Config.CONVERSATION_SUMMARIES:
+    conversation_memory = ConversationMemory(
+        ollama_client,
+        db.conversation_summaries,
+        recent_turns=Config.CONVERSATION_RECENT_TURNS,
+        fold_every=Config.CONVERSATION_FOLD_EVERY,
+        fold_batch=Config.CONVERSATION_FOLD_BATCH,
+        summary_tokens=Config.CONVERSATION_SUMMARY_TOKENS,
+        model=Config.OLLAMA_FAST_MODEL,
+        timeout=Config.CONVERSATION_FOLD_TIMEOUT
+    )
+
+# Enhanced keyword detection (whole words; a trailing * marks a word stem)
 DRUG_KEYWORDS = ["drug", "medicine", "medication", "pill", "tablet", "capsule", "prescription", "dosage", "side effect", "interaction"]
 HOSPITAL_KEYWORDS = ["hospital", "clinic", "doctor", "emergency", "medical center", "near me", "nearby", "find", "locate"]
+CONDITION_KEYWORDS = ["diabetes", "asthma", "hypertension", "fever", "cold", "cough", "headache", "pain"]
 SPECIALTY_KEYWORDS = {
     "orthopaedic": ["bone", "fracture", "joint", "orthopedic", "orthopaedic"],
-    "gynaecology": ["pregnancy", "gynae", "women", "maternity", "obstetr"],
+    "gynaecology": ["pregnancy", "gynae*", "women", "maternity", "obstetr*"],
     "cardiology": ["heart", "cardiac", "chest pain", "blood pressure"],
-    "dermatology": ["skin", "rash", "acne", "derma"],
+    "dermatology": ["skin", "rash", "acne", "derma*"],
 }
 
+intent_classifier = IntentClassifier(DRUG_KEYWORDS, HOSPITAL_KEYWORDS, CONDITION_KEYWORDS, SPECIALTY_KEYWORDS)
+
 def detect_intent(message):
     """Detect what the user is asking for"""
-    msg_lower = message.lower()
-    
-    # Check for drug/medication queries
-    if any(keyword in msg_lower for keyword in DRUG_KEYWORDS):
-        return "drug_info"
-    
-    # Check for hospital/location queries
-    if any(keyword in msg_lower for keyword in HOSPITAL_KEYWORDS):
-        return "hospital_search"
-    
-    # Check for specific medical conditions
-    conditions = ["diabetes", "asthma", "hypertension", "fever", "cold", "cough", "headache", "pain"]
-    if any(condition in msg_lower for condition in conditions):
-        return "medical_advice"
-    
-    return "general"
+    return intent_classifier.classify(message)["intent"]
 
 def extract_drug_name(message):
     """Try to extract drug name from message"""
@@ -58,64 +104,88 @@ def extract_drug_name(message):
     return None
 
 def search_drug_database(query):
-    """Search our drug database"""
+    """Search our drug database (in-memory index, MongoDB until it has loaded)"""
+    if drug_index.ready:
+        return drug_index.lookup(query)
     try:
-        # Search by name (case-insensitive)
-        drug = drugs_collection.find_one(
-            {"name": {"$regex": query, "$options": "i"}}
-        )
-        
-        if drug:
-            return drug
-        
-        # Try searching by generic name
-        drug = drugs_collection.find_one(
-            {"generic_name": {"$regex": query, "$options": "i"}}
-        )
-        
-        return drug
+        # Exact name or generic name first (indexed), then a case-insensitive literal match
+        exact = (drugs_collection.find_one({"name": query}, collation=CASE_INSENSITIVE)
+                 or drugs_collection.find_one({"generic_name": query}, collation=CASE_INSENSITIVE))
+        if exact:
+            return exact
+        pattern = {"$regex": re.escape(query), "$options": "i"}
+        return (drugs_collection.find_one({"name": pattern})
+                or drugs_collection.find_one({"generic_name": pattern}))
     except Exception as e:
         print(f"Database search error: {e}")
         return None
 
-def format_drug_info(drug):
-    """Format drug information for display"""
-    response = f"**{drug.get('name')}** ({drug.get('generic_name', 'N/A')})\n\n"
+def render_drug_info(drug):
+    """Drug information formatted for display"""
+    parts = [f"**{drug.get('name')}** ({drug.get('generic_name', 'N/A')})\n\n"]
     
     # Government status
     status = drug.get('government_status', {})
-    if status.get('status') in ['BANNED', 'RECALLED', 'BANNED/RECALLED']:
-        response += f"⚠️ **WARNING: This drug is {status.get('status')}**\n"
-        response += f"Reason: {status.get('notes', 'Contact authorities')}\n\n"
+    if status.get('status') in BANNED_STATUSES:
+        parts.append(f"⚠️ **WARNING: This drug is {status.get('status')}**\n")
+        parts.append(f"Reason: {status.get('notes', 'Contact authorities')}\n\n")
     else:
-        response += f"✅ Status: {status.get('status', 'Approved')}\n\n"
+        parts.append(f"✅ Status: {status.get('status', 'Approved')}\n\n")
     
     # Safety alerts
     if drug.get('safety_alerts'):
-        response += "**Safety Alerts:**\n"
-        for alert in drug.get('safety_alerts', []):
-            response += f"- {alert}\n"
-        response += "\n"
+        parts.append("**Safety Alerts:**\n")
+        parts.extend(f"- {alert}\n" for alert in drug.get('safety_alerts', []))
+        parts.append("\n")
     
     # ADR (Adverse Drug Reactions)
     if drug.get('adr_alerts'):
-        response += "**Possible Side Effects:**\n"
-        for adr in drug.get('adr_alerts', []):
-            response += f"- {adr}\n"
-        response += "\n"
+        parts.append("**Possible Side Effects:**\n")
+        parts.extend(f"- {adr}\n" for adr in drug.get('adr_alerts', []))
+        parts.append("\n")
     
     # Timing
     if drug.get('timing'):
-        response += f"**When to Take:** {', '.join(drug.get('timing', []))}\n\n"
+        parts.append(f"**When to Take:** {', '.join(drug.get('timing', []))}\n\n")
     
     # Interactions
     if drug.get('interactions'):
-        response += f"**Drug Interactions:** Avoid taking with {', '.join(drug.get('interactions', []))}\n\n"
+        parts.append(f"**Drug Interactions:** Avoid taking with {', '.join(drug.get('interactions', []))}\n\n")
     
-    response += "⚠️ **Always consult your doctor before taking any medication.**"
+    parts.append("⚠️ **Always consult your doctor before taking any medication.**")
     
+    return "".join(parts)
+
+render_cache.register("markdown", render_drug_info)
+
+def format_drug_info(drug):
+    """Format drug information for display (rendered once per drug revision)"""
+    return render_cache.get("markdown", drug)
+
+def format_drugs_info(drugs):
+    """Drug cards for every drug a message mentions"""
+    return "\n\n---\n\n".join(format_drug_info(drug) for drug in drugs)
+
+def format_banned_warning(drugs):
+    """Warning line for banned or recalled drugs a message mentions"""
+    names = ", ".join(f"**{drug.get('name')}**" for drug in drugs)
+    return f"🚫 **Banned/recalled:** {names}. Do not use; ask your doctor or pharmacist for an alternative.\n\n"
+
+def with_safety_warnings(response, user_message):
+    """Put banned-drug and interaction warnings for the message above ``response``"""
+    pairs = drug_index.mentioned_interactions(user_message)
+    if pairs:
+        response = format_interaction_warning(pairs) + response
+    banned = drug_index.mentioned_banned(user_message)
+    if banned:
+        response = format_banned_warning(banned) + response
     return response
 
+def format_interaction_warning(pairs):
+    """Warning line for interacting drugs mentioned together"""
+    combinations = ", ".join(f"**{a}** + **{b}**" for a, b in pairs)
+    return f"⚠️ **Interaction warning:** {combinations} can interact. Do not take them together without your doctor's advice.\n\n"
+
 def get_nearby_hospitals_info(lat, lon, specialty=None):
     """Get formatted hospital information"""
     response = f"🏥 **Finding hospitals near you...**\n\n"
@@ -133,83 +203,7 @@ def get_nearby_hospitals_info(lat, lon, specialty=None):
     
     return response
 
-@chat_bp.route("/chat", methods=["POST"])
-def process_chat():
-    try:
-        data = request.json
-        user_message = data.get("message", "").strip()
-        user_id = data.get("user_id", session.get("user_id", "default_user"))
-
-        if not user_message:
-            return jsonify({"success": False, "error": "No message provided"}), 400
-
-        # Detect user intent
-        intent = detect_intent(user_message)
-        
-        # Location (default Anand)
-        lat = data.get("lat", 22.55)
-        lon = data.get("lon", 72.95)
-
-        # Handle different intents
-        if intent == "drug_info":
-            # Try to find drug in our database
-            drug_name = extract_drug_name(user_message)
-            
-            if drug_name:
-                drug_info = search_drug_database(drug_name)
-                
-                if drug_info:
-                    # We have the drug in our database!
-                    response_text = format_drug_info(drug_info)
-                    
-                    # Save chat
-                    if user_id and user_id != "default_user":
-                        try:
-                            save_chat(user_id, user_message, response_text)
-                        except Exception as e:
-                            print(f"Failed to save chat: {e}")
-                    
-                    return jsonify({
-                        "success": True,
-                        "response": response_text,
-                        "source": "database",
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-        
-        elif intent == "hospital_search":
-            # User is looking for hospitals
-            response_text = get_nearby_hospitals_info(lat, lon)
-            
-            if user_id and user_id != "default_user":
-                try:
-                    save_chat(user_id, user_message, response_text)
-                except Exception as e:
-                    print(f"Failed to save chat: {e}")
-            
-            return jsonify({
-                "success": True,
-                "response": response_text,
-                "source": "location_service",
-                "timestamp": datetime.utcnow().isoformat()
-            })
-        
-        # For general medical questions, use AI with enhanced context
-        # Build context from our database
-        context = ""
-        
-        # Add drug database context if relevant
-        if any(keyword in user_message.lower() for keyword in DRUG_KEYWORDS):
-            banned_drugs = list(drugs_collection.find(
-                {"government_status.status": {"$in": ["BANNED", "RECALLED", "BANNED/RECALLED"]}},
-                {"name": 1, "government_status": 1}
-            ).limit(5))
-            
-            if banned_drugs:
-                context += "\n\nImportant: These drugs are currently banned/recalled: "
-                context += ", ".join([d.get("name") for d in banned_drugs])
-        
-        # Enhanced system prompt
-        system_prompt = """You are Lifexia, an intelligent AI health assistant with access to a comprehensive drug database.
+SYSTEM_PROMPT = """You are Lifexia, an intelligent AI health assistant with access to a comprehensive drug database.
 
 Your capabilities:
 1. Provide accurate information about medications, their uses, side effects, and interactions
@@ -225,31 +219,417 @@ Guidelines:
 - For emergencies, emphasize calling emergency services (108 in India)
 - Never diagnose or prescribe medications"""
 
-        # Generate AI response
-        response_text = ollama_client.generate(
+FALLBACK_MESSAGE = """⚠️ Our AI assistant is taking longer than usual to answer, so here is some general guidance instead:
+
+- For emergencies, call emergency services (108 in India) right away
+- Do not start, stop or change any medication without medical advice
+- For information on a specific medicine, ask about it by name (e.g. "What is Paracetamol?")
+
+Consult a healthcare professional."""
+
+def answer_locally(user_message, classification, lat, lon):
+    """Answer from the database or location service without calling the AI.
+
+    ``classification`` is intent_classifier.classify(user_message). Returns
+    a (response_text, source) tuple, or (None, None) when the message has
+    to go to the AI model.
+    """
+    intent = classification["intent"]
+    if intent == "hospital_search":
+        # User is looking for hospitals
+        return get_nearby_hospitals_info(lat, lon, classification["specialty"]), "location_service"
+
+    # Every catalog drug the message names ("aspirin with warfarin and ibuprofen")
+    drugs = drug_index.mentioned_drugs(user_message)
+    if drugs:
+        return with_safety_warnings(format_drugs_info(drugs), user_message), "database"
+
+    if intent == "drug_info":
+        # Try to find drug in our database
+        drug_name = extract_drug_name(user_message)
+
+        if drug_name:
+            drug_info = search_drug_database(drug_name)
+
+            if drug_info:
+                # We have the drug in our database!
+                return format_drug_info(drug_info), "database"
+
+            # Maybe a typo ("paracetmol"): answer or ask before paying for the AI
+            return did_you_mean(drug_name)
+
+    return None, None
+
+def did_you_mean(drug_name):
+    """Typo-tolerant lookup for a drug name the index does not know.
+
+    One clearly best close match is answered directly; several are offered
+    back as a "did you mean" question. Returns (None, None) if nothing is close.
+    """
+    matches = drug_index.fuzzy_search(drug_name, limit=3)
+    if not matches:
+        # "paracetmol tablet": try the words of the phrase on their own
+        for word in drug_name.split():
+            if len(word) > 3 and word not in DRUG_KEYWORDS:
+                matches = drug_index.fuzzy_search(word, limit=3)
+                if matches:
+                    break
+    if not matches:
+        return None, None
+
+    score, _, drug = matches[0]
+    if score >= Config.DRUG_FUZZY_MIN_SCORE and (len(matches) == 1 or matches[1][0] < score):
+        return f"_Showing results for **{drug.get('name')}**_\n\n" + format_drug_info(drug), "database-fuzzy"
+
+    suggestions = [f"**{match[2].get('name')}**" for match in matches]
+    if len(suggestions) > 1:
+        suggestions = f"{', '.join(suggestions[:-1])} or {suggestions[-1]}"
+    else:
+        suggestions = suggestions[0]
+    return f"I couldn't find \"{drug_name}\". Did you mean {suggestions}?", "did_you_mean"
+
+def fallback_answer(user_message, context, history):
+    """Best non-LLM answer for when the AI misses its deadline"""
+    drugs = drug_index.mentioned_drugs(user_message)
+    if drugs:
+        return with_safety_warnings(format_drugs_info(drugs), user_message), "fallback-database"
+
+    drug_name = extract_drug_name(user_message)
+    if drug_name:
+        drug_info = search_drug_database(drug_name)
+        if drug_info:
+            return format_drug_info(drug_info), "fallback-database"
+
+    # An answer another route's model gave to the same question
+    for model in model_router.models():
+        for turns in (history, None):
+            cached = ollama_client.lookup_cache(user_message, SYSTEM_PROMPT, context, turns, model)
+            if cached:
+                return cached, "fallback-cache"
+
+    return FALLBACK_MESSAGE, "fallback"
+
+def build_ai_context(user_message, classification):
+    """Build the AI context from our database"""
+    context = ""
+
+    # Add drug database context if relevant
+    if classification["drug_related"]:
+        if drug_index.ready:
+            banned_drugs = drug_index.banned_drugs()[:5]
+        else:
+            banned_drugs = list(drugs_collection.find(
+                {"government_status.status": {"$in": list(BANNED_STATUSES)}},
+                {"name": 1, "government_status": 1},
+                collation=CASE_INSENSITIVE
+            ).limit(5))
+
+        if banned_drugs:
+            context += "\n\nImportant: These drugs are currently banned/recalled: "
+            context += ", ".join([d.get("name") for d in banned_drugs])
+
+    mentioned = drug_index.mentioned_banned(user_message)
+    if mentioned:
+        context += "\n\nImportant: The user mentioned banned/recalled drugs: "
+        context += ", ".join(
+            f"{d.get('name')} ({d['government_status'].get('notes') or d['government_status']['status']})"
+            for d in mentioned
+        )
+
+    pairs = drug_index.mentioned_interactions(user_message)
+    if pairs:
+        context += "\n\nImportant: These drugs mentioned by the user interact: "
+        context += ", ".join(f"{a} + {b}" for a, b in pairs)
+
+    # The catalog records closest to the question, so answers use our data
+    if drug_retriever and drug_retriever.ready:
+        records = drug_retriever.context(user_message)
+        if records:
+            context += "\n\nRelevant drug records from our database:\n" + records
+
+    return context
+
+def is_logged_in_user(user_id):
+    return bool(user_id) and user_id != "default_user"
+
+def save_chat_for_user(user_id, user_message, response_text, metrics=None):
+    """Persist a chat turn for logged-in users"""
+    if is_logged_in_user(user_id):
+        try:
+            save_chat(user_id, user_message, response_text, metrics)
+        except Exception as e:
+            print(f"Failed to save chat: {e}")
+
+def fit_prompt(user_message, context):
+    """Clip the AI context to LLM_PROMPT_TOKENS; returns (context, tokens left for history)"""
+    fixed = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(user_message)
+    if context:
+        context = clip_to_tokens(context, max(0, Config.LLM_PROMPT_TOKENS - fixed))
+        fixed += estimate_tokens(context)
+    return context, max(0, min(Config.OLLAMA_HISTORY_TOKENS, Config.LLM_PROMPT_TOKENS - fixed))
+
+def conversation_history(user_id, max_tokens):
+    """Earlier turns for the AI within ``max_tokens``; returns (history, memory info or None)"""
+    if not is_logged_in_user(user_id):
+        return [], None
+    try:
+        if conversation_memory:
+            return conversation_memory.history(user_id, max_tokens)
+        chats = get_recent_chats(user_id, Config.OLLAMA_HISTORY_TURNS)
+    except Exception as e:
+        print(f"Failed to load chat history: {e}")
+        return [], None
+    return trim_history(turn_messages(chats), max_tokens), None
+
+def record_prompt(memory_info, user_message, context, history, metrics, latency):
+    """Add the prompt size to this turn's metrics and the per-length report"""
+    tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(user_message) + \
+        (estimate_tokens(context) if context else 0) + sum(estimate_tokens(turn["content"]) for turn in history)
+    if memory_info and metrics:
+        conversation_memory.record(memory_info, tokens, metrics, latency)
+    if metrics is not None:
+        metrics["prompt_tokens"] = tokens
+        if memory_info:
+            metrics["conversation_turn"] = memory_info["turn"]
+            metrics["summarized_turns"] = memory_info["summarized_turns"]
+    return metrics
+
+def request_priority():
+    """Scheduler priority class for a web chat request.
+
+    Decided from the session only; nothing in the request body can raise
+    it. WhatsApp messages get PRIORITY_WHATSAPP from the Twilio webhook,
+    which calls answer_chat() itself.
+    """
+    if session.get("is_admin"):
+        return PRIORITY_ADMIN
+    return PRIORITY_DEFAULT
+
+def answer_chat(user_message, user_id, lat, lon, priority):
+    """Answer one message from the database, the location service or the AI.
+
+    Saves the turn for logged-in users and returns (response_text, source).
+    ``priority`` is the scheduler class, decided by the caller from who is
+    asking. Raises QueueFullError or ModelWarmingError when the AI cannot
+    take the request.
+    """
+    # Detect user intent
+    classification = intent_classifier.classify(user_message)
+    intent = classification["intent"]
+    response_text, source = answer_locally(user_message, classification, lat, lon)
+    metrics = None
+
+    if response_text is None:
+        # For general medical questions, use AI with enhanced context
+        context, history_tokens = fit_prompt(user_message, build_ai_context(user_message, classification))
+        history, memory_info = conversation_history(user_id, history_tokens)
+        route = model_router.route(intent, user_message)
+        started = time.monotonic()
+
+        # Generate AI response (repeated questions are served from the cache)
+        result = ollama_client.generate_response(
             prompt=user_message,
-            system_prompt=system_prompt,
-            context=context
+            system_prompt=SYSTEM_PROMPT,
+            context=context,
+            history=history,
+            priority=priority,
+            model=route.model,
+            deadline=started + route.deadline
         )
+        response_text = result["response"]
+        source = result["source"]
+        metrics = record_prompt(memory_info, user_message, context, history,
+                                result.get("metrics"), time.monotonic() - started)
+
+        # Missed the deadline: degrade to the best answer we have without the AI
+        fell_back = not result["success"] and result.get("error") in ("timeout", "busy")
+        if fell_back:
+            response_text, source = fallback_answer(user_message, context, history)
+        model_router.record(route, time.monotonic() - started, fell_back)
+
+    # Save chat
+    save_chat_for_user(user_id, user_message, response_text, metrics)
+    return response_text, source
+
+def busy_response(error):
+    """429 with Retry-After when the AI queue is full"""
+    response = jsonify({
+        "success": False,
+        "error": "The AI assistant is handling too many requests. Please try again shortly.",
+        "retry_after": error.retry_after
+    })
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
+
+def warming_response(error):
+    """503 with Retry-After while the AI model is still loading"""
+    response = jsonify({
+        "success": False,
+        "error": "The AI assistant is starting up. Please try again in a few seconds.",
+        "retry_after": error.retry_after
+    })
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 503
+
+def sse_event(data, event=None):
+    """Encode one Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+@chat_bp.route("/chat", methods=["POST"])
+def process_chat():
+    if request.accept_mimetypes.best == "text/event-stream":
+        return process_chat_stream()
+
+    try:
+        data = request.json
+        user_message = data.get("message", "").strip()
+        user_id = data.get("user_id", session.get("user_id", "default_user"))
 
-        # Save chat
-        if user_id and user_id != "default_user":
-            try:
-                save_chat(user_id, user_message, response_text)
-            except Exception as e:
-                print(f"Failed to save chat: {e}")
+        if not user_message:
+            return jsonify({"success": False, "error": "No message provided"}), 400
+
+        # Location (default Anand)
+        lat = data.get("lat", 22.55)
+        lon = data.get("lon", 72.95)
+
+        response_text, source = answer_chat(user_message, user_id, lat, lon, request_priority())
 
         return jsonify({
             "success": True,
             "response": response_text,
-            "source": "ai",
+            "source": source,
             "timestamp": datetime.utcnow().isoformat()
         })
 
+    except QueueFullError as e:
+        return busy_response(e)
+    except ModelWarmingError as e:
+        return warming_response(e)
     except Exception as e:
         print(f"Chat error: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@chat_bp.route("/chat/stream", methods=["POST"])
+def process_chat_stream():
+    """Same as /chat, but relays the answer as Server-Sent Events.
+
+    Each chunk is sent as a ``data: {"token": ...}`` frame the moment Ollama
+    produces it, followed by a ``done`` event carrying the source and
+    timestamp. The assembled answer is saved once the stream completes; if
+    the client disconnects first, the upstream Ollama request is cancelled
+    and nothing is saved. If Ollama fails part-way, the stream ends with an
+    ``error`` event (``success: false``) and the partial answer is dropped.
+    When the route's deadline passes first (queued or mid-answer), the
+    fallback answer is streamed as the final tokens instead.
+    """
+    data = request.json or {}
+    user_message = data.get("message", "").strip()
+    user_id = data.get("user_id", session.get("user_id", "default_user"))
+
+    if not user_message:
+        return jsonify({"success": False, "error": "No message provided"}), 400
+
+    # Location (default Anand)
+    lat = data.get("lat", 22.55)
+    lon = data.get("lon", 72.95)
+
+    try:
+        classification = intent_classifier.classify(user_message)
+        intent = classification["intent"]
+        response_text, source = answer_locally(user_message, classification, lat, lon)
+        route = model_router.route(intent, user_message)
+        context = ""
+        history = []
+        memory_info = None
+        stream = None
+
+        if response_text is None:
+            context, history_tokens = fit_prompt(user_message, build_ai_context(user_message, classification))
+            history, memory_info = conversation_history(user_id, history_tokens)
+            response_text = ollama_client.lookup_cache(user_message, SYSTEM_PROMPT, context, history, route.model)
+            source = "ai-cache" if response_text is not None else "ai"
+
+        if response_text is None:
+            # Takes a scheduler slot before the stream starts so we can still answer 429;
+            # identical questions already being answered share that stream instead
+            stream = ollama_client.stream_response(
+                prompt=user_message,
+                system_prompt=SYSTEM_PROMPT,
+                context=context,
+                history=history,
+                priority=request_priority(),
+                deadline=route.start(),
+                model=route.model
+            )
+
+    except QueueFullError as e:
+        return busy_response(e)
+    except ModelWarmingError as e:
+        return warming_response(e)
+    except DeadlineExceeded:
+        # No AI slot freed up before the deadline: answer without the AI, as /chat does
+        response_text, source = fallback_answer(user_message, context, history)
+        model_router.record(route, route.deadline, fell_back=True)
+    except Exception as e:
+        print(f"Chat stream error: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    def generate():
+        nonlocal response_text, source
+        metrics = None
+        try:
+            if stream is None:
+                yield sse_event({"token": response_text})
+            else:
+                started = time.monotonic()
+                streamed = []
+                try:
+                    try:
+                        for chunk in stream:
+                            streamed.append(chunk)
+                            yield sse_event({"token": chunk})
+                    finally:
+                        # Runs on client disconnect too, cancelling the upstream call
+                        stream.close()
+                    response_text = stream.result["response"]
+                    metrics = record_prompt(memory_info, user_message, context, history,
+                                            stream.result.get("metrics"), time.monotonic() - started)
+                    model_router.record(route, time.monotonic() - started)
+                except StreamError as e:
+                    if e.error not in ("timeout", "busy"):
+                        raise
+                    # Missed the deadline: finish with the best answer we have without the AI
+                    fallback, source = fallback_answer(user_message, context, history)
+                    if streamed:
+                        fallback = "\n\n" + fallback
+                    yield sse_event({"token": fallback})
+                    response_text = "".join(streamed) + fallback
+                    model_router.record(route, time.monotonic() - started, fell_back=True)
+
+            save_chat_for_user(user_id, user_message, response_text, metrics or None)
+            yield sse_event({
+                "success": True,
+                "source": source,
+                "timestamp": datetime.utcnow().isoformat()
+            }, event="done")
+
+        except StreamError as e:
+            print(f"Chat stream error: {str(e)}")
+            yield sse_event({"success": False, "error": str(e), "code": e.error}, event="error")
+        except Exception as e:
+            print(f"Chat stream error: {str(e)}")
+            yield sse_event({"success": False, "error": str(e)}, event="error")
+
+    response = Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    if stream is not None:
+        # The generator never runs if the client is gone before the first read
+        response.call_on_close(stream.close)
+    return response
+
 @chat_bp.route("/history", methods=["GET"])
 def get_history():
     user_id = session.get("user_id")
@@ -257,8 +637,7 @@ def get_history():
         return jsonify({"success": False, "error": "Not logged in"}), 401
     
     try:
-        from models.user import get_user_chats
-        chats = get_user_chats(user_id)
-        return jsonify({"success": True, "chats": chats})
+        from routes.users import history_page
+        return history_page(user_id)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
\ No newline at end of file
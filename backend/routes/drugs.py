@@ -1,9 +1,21 @@
-from flask import Blueprint, jsonify
-from models.database import drugs_collection
+import re
+from flask import Blueprint, Response, json, jsonify, request, session
+from config import Config
+from models.database import drugs_collection, CASE_INSENSITIVE
+from models.drug import delete_drug, drug_index, render_cache, save_drug
+from utils.drug_index import BANNED_STATUSES, public_drug
 
 drugs_bp = Blueprint("drugs", __name__)
 
 
+def render_drug_payload(drug):
+    """The /drug/<name> response body for a drug"""
+    return json.dumps({"success": True, "drug": public_drug(drug)})
+
+
+render_cache.register("json", render_drug_payload)
+
+
 @drugs_bp.route("/drugs", methods=["GET"])
 def get_all_drugs():
     """Get all drugs"""
@@ -18,9 +30,17 @@ def get_all_drugs():
 def get_drug_info(drug_name):
     """Get specific drug info"""
     try:
-        drug = drugs_collection.find_one(
-            {"name": {"$regex": drug_name, "$options": "i"}}, {"_id": 0}
-        )
+        if drug_index.ready:
+            drug = drug_index.lookup(drug_name)
+            if drug:
+                # Serialized once per drug revision
+                return Response(render_cache.get("json", drug), status=200, mimetype="application/json")
+        else:
+            drug = drugs_collection.find_one(
+                {"name": drug_name}, {"_id": 0}, collation=CASE_INSENSITIVE
+            ) or drugs_collection.find_one(
+                {"name": {"$regex": re.escape(drug_name), "$options": "i"}}, {"_id": 0}
+            )
 
         if drug:
             return jsonify({"success": True, "drug": drug}), 200
@@ -33,20 +53,88 @@ def get_drug_info(drug_name):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+def refresh_index():
+    """Show a catalog write in this worker now; the others pick it up on their next poll"""
+    try:
+        drug_index.refresh()
+    except Exception as e:
+        print(f"Drug index refresh error: {e}")
+
+
+@drugs_bp.route("/drugs", methods=["POST"])
+def add_or_update_drug():
+    """Add a drug, or update the one with the same name (Admin only)"""
+    if not session.get("is_admin"):
+        return jsonify({"success": False, "error": "Unauthorized"}), 403
+    try:
+        drug = request.get_json(silent=True)
+        name = drug.get("name") if isinstance(drug, dict) else None
+        if not isinstance(name, str) or not name.strip():
+            return jsonify({"success": False, "error": "A drug with a name is required"}), 400
+
+        save_drug({**drug, "name": name.strip()})
+        refresh_index()
+        return jsonify({"success": True, "name": name.strip()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@drugs_bp.route("/drug/<drug_name>", methods=["DELETE"])
+def remove_drug(drug_name):
+    """Delete a drug (Admin only)"""
+    if not session.get("is_admin"):
+        return jsonify({"success": False, "error": "Unauthorized"}), 403
+    try:
+        if not delete_drug(drug_name):
+            return jsonify({"success": False, "message": f"Drug '{drug_name}' not found"}), 404
+        refresh_index()
+        return jsonify({"success": True, "name": drug_name}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@drugs_bp.route("/interactions", methods=["POST"])
+def check_interactions():
+    """Check a medication list for interacting pairs"""
+    try:
+        data = request.get_json(silent=True) or {}
+        medications = data.get("medications")
+        if not isinstance(medications, list) or not all(isinstance(m, str) for m in medications):
+            return jsonify({"success": False, "error": "medications must be a list of names"}), 400
+        if len(medications) > Config.INTERACTION_MAX_MEDICATIONS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {Config.INTERACTION_MAX_MEDICATIONS} medications per request"
+            }), 400
+        if not drug_index.ready:
+            return jsonify({"success": False, "error": "Drug catalog is still loading"}), 503
+
+        result = drug_index.check_interactions(medications)
+        return jsonify({
+            "success": True,
+            "medications": result["medications"],
+            "interactions": result["interactions"],
+            "count": len(result["interactions"])
+        }), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @drugs_bp.route("/banned-drugs", methods=["GET"])
 def get_banned_drugs():
     """Get banned/recalled drugs"""
     try:
-        banned_drugs = list(
-            drugs_collection.find(
-                {
-                    "government_status.status": {
-                        "$in": ["BANNED", "RECALLED", "BANNED/RECALLED"]
-                    }
-                },
-                {"_id": 0},
+        if drug_index.ready:
+            banned_drugs = [public_drug(drug) for drug in drug_index.banned_drugs()]
+        else:
+            banned_drugs = list(
+                drugs_collection.find(
+                    {"government_status.status": {"$in": list(BANNED_STATUSES)}},
+                    {"_id": 0},
+                    collation=CASE_INSENSITIVE,
+                )
             )
-        )
 
         return jsonify(
             {"success": True, "banned_drugs": banned_drugs, "count": len(banned_drugs)}
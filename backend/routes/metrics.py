@@ -0,0 +1,28 @@
+from flask import Blueprint, jsonify, session
+from routes.chat import ollama_client, model_router, model_warmer, drug_retriever, conversation_memory
+from models.database import write_behind
+from models.drug import drug_index, render_cache
+from utils.process_memory import process_memory
+from utils.retention import retention_job
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Runtime metrics for this worker (Admin only)"""
+    if not session.get("is_admin"):
+        return jsonify({"success": False, "error": "Unauthorized"}), 403
+
+    return jsonify({
+        "success": True,
+        "ollama": ollama_client.stats(),
+        "routing": model_router.stats(),
+        "warmup": model_warmer.stats() if model_warmer else None,
+        "drug_index": drug_index.stats(),
+        "retrieval": drug_retriever.stats() if drug_retriever else None,
+        "conversation_memory": conversation_memory.stats() if conversation_memory else None,
+        "render_cache": render_cache.stats(),
+        "write_behind": write_behind.stats(),
+        "retention": retention_job.stats(),
+        "process": process_memory()
+    })
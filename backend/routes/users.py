@@ -1,15 +1,59 @@
-from flask import Blueprint, jsonify, session
-from models.user import get_user_chats  # <-- FIXED
+from flask import Blueprint, Response, json, jsonify, request, session
+from config import Config
+from models.user import encode_cursor, get_user_chats, history_entry, iter_user_chats
 
 user_bp = Blueprint('user', __name__)
 
+def history_page(user_id):
+    """One page of chat history; ``?before=``/``?after=`` cursors, ``?limit=``"""
+    try:
+        limit = int(request.args.get("limit", Config.HISTORY_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be a number"}), 400
+    limit = max(1, min(limit, Config.HISTORY_MAX_PAGE_SIZE))
+    before, after = request.args.get("before"), request.args.get("after")
+    if before and after:
+        return jsonify({"success": False, "error": "Use either before or after, not both"}), 400
+
+    try:
+        chats, more = get_user_chats(user_id, before=before, after=after, limit=limit)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    older = more if not after else True
+    return jsonify({
+        "success": True,
+        "chats": [history_entry(chat) for chat in chats],
+        # Pass back as ?before= for older turns, ?after= for newer ones
+        "before": encode_cursor(chats[0]) if chats and older else None,
+        "after": encode_cursor(chats[-1]) if chats else after,
+        "has_more": more
+    })
+
+def history_export(user_id):
+    """The whole chat history as NDJSON, streamed one turn per line"""
+    def generate():
+        for chat in iter_user_chats(user_id):
+            yield json.dumps(history_entry(chat)) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={
+        "Content-Disposition": "attachment; filename=chat-history.ndjson",
+        "X-Accel-Buffering": "no"
+    })
+
 @user_bp.route("/history", methods=["GET"])
 def history():
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"success": False, "error": "Not logged in"}), 401
-    chats = get_user_chats(user_id)
-    return jsonify({"success": True, "chats": chats})
+    return history_page(user_id)
+
+@user_bp.route("/history/export", methods=["GET"])
+def export_history():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"success": False, "error": "Not logged in"}), 401
+    return history_export(user_id)
 
 @user_bp.route("/login-history", methods=["GET"])
 def login_history():
@@ -27,4 +71,4 @@ def current_user():
         "success": True,
         "logged_in": "user_id" in session,
         "is_admin": session.get("is_admin", False)
-    })
\ No newline at end of file
+    })
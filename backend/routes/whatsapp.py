@@ -1,25 +1,95 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from flask import Blueprint, request, jsonify, session
+from twilio.request_validator import RequestValidator
+from twilio.twiml.messaging_response import MessagingResponse
 from models.log import log_whatsapp_message, get_whatsapp_messages
+from routes.chat import answer_chat
+from utils.llm_scheduler import QueueFullError, PRIORITY_WHATSAPP
+from utils.model_warmup import ModelWarmingError
+from utils.whatsapp_service import WhatsAppService
 from config import Config
 
 whatsapp_bp = Blueprint('whatsapp', __name__)
 
+# WhatsApp rejects longer message bodies
+MAX_REPLY_CHARS = 1600
+
+BUSY_REPLY = "Lifexia is answering a lot of questions right now. Please send your message again in a minute."
+
+# MessageSids already queued for an answer; Twilio may deliver a message twice
+MAX_SEEN_MESSAGES = 1024
+
+_reply_executor = ThreadPoolExecutor(max_workers=Config.WHATSAPP_REPLY_WORKERS, thread_name_prefix="whatsapp-reply")
+_seen_messages = OrderedDict()
+_seen_lock = threading.Lock()
+_whatsapp = None
+
+def from_twilio():
+    """True if the request carries a valid X-Twilio-Signature for our auth token"""
+    if not Config.TWILIO_AUTH_TOKEN:
+        return False
+    url = Config.TWILIO_WEBHOOK_URL or request.url
+    validator = RequestValidator(Config.TWILIO_AUTH_TOKEN)
+    return validator.validate(url, request.form, request.headers.get("X-Twilio-Signature", ""))
+
+def first_delivery(message_sid):
+    """False if this MessageSid was seen recently (a Twilio redelivery)"""
+    if not message_sid:
+        return True
+    with _seen_lock:
+        if message_sid in _seen_messages:
+            return False
+        _seen_messages[message_sid] = True
+        if len(_seen_messages) > MAX_SEEN_MESSAGES:
+            _seen_messages.popitem(last=False)
+    return True
+
+def empty_reply():
+    """TwiML acknowledging the message without answering it"""
+    return str(MessagingResponse()), 200, {"Content-Type": "application/xml"}
+
+def send_reply(sender, body):
+    """Answer ``body`` like a chat, ahead of web chats in the AI queue, and send it to ``sender``"""
+    global _whatsapp
+    try:
+        response_text, _ = answer_chat(body, "default_user", 22.55, 72.95, PRIORITY_WHATSAPP)
+    except (QueueFullError, ModelWarmingError):
+        response_text = BUSY_REPLY
+    except Exception as e:
+        print(f"WhatsApp reply failed: {e}")
+        return
+    if len(response_text) > MAX_REPLY_CHARS:
+        response_text = response_text[:MAX_REPLY_CHARS - 1] + "…"
+    if _whatsapp is None:
+        _whatsapp = WhatsAppService()
+    _whatsapp.send_message(sender, response_text)
+
 @whatsapp_bp.route("/whatsapp/webhook", methods=["POST"])
 def whatsapp_webhook():
     """Handle incoming WhatsApp messages from Twilio"""
     try:
         # Twilio sends form-encoded data
-        print(f"DEBUG: Webhook hit! Values: {request.values}")
         sender = request.values.get('From', 'Unknown')
         body = request.values.get('Body', '')
         
-        print(f"DEBUG: Processing message from {sender}: {body}")
         if body:
+            # Only Twilio-signed requests get an answer (and WhatsApp priority).
+            # Twilio gives up on slow webhooks, so acknowledge now and send
+            # the answer through the REST API once it is ready.
+            if Config.WHATSAPP_AI_REPLIES and from_twilio():
+                if not first_delivery(request.values.get('MessageSid')):
+                    return empty_reply()
+                log_whatsapp_message(sender, body, source="Twilio")
+                print(f"📩 WhatsApp received from {sender}")
+                _reply_executor.submit(send_reply, sender, body)
+                return empty_reply()
+
             log_whatsapp_message(sender, body, source="Twilio")
-            print(f"📩 WhatsApp received from {sender}: {body}")
-            
-            # Here you would typically reply using Twilio Client
-            # For now, we just acknowledge receipt
+            print(f"📩 WhatsApp received from {sender}")
+
+            # Otherwise we just acknowledge receipt
             return str("PONG")
             
     except Exception as e:
@@ -0,0 +1,75 @@
+import re
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lower-case word tokens of ``text``"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class TokenAutomaton:
+    """Aho-Corasick automaton over word tokens.
+
+    Phrases are added as token sequences and all occurrences in a text are
+    found in one left-to-right pass, however many phrases there are.
+    Working on whole words (rather than characters) keeps the automaton
+    small and means "find" never matches inside "findings".
+    """
+
+    def __init__(self):
+        self.goto = {}       # (state, token) -> state
+        self.fail = [0]
+        self.depth = [0]
+        self.output = {}     # state -> value of the phrase ending there
+        self.out_link = [0]  # state -> nearest shorter phrase ending at the same token
+        self._children = [[]]
+        self.phrases = 0
+
+    def add(self, tokens, value):
+        """Register a phrase; the first value added for a phrase wins"""
+        if not tokens:
+            return
+        state = 0
+        for token in tokens:
+            child = self.goto.get((state, token))
+            if child is None:
+                child = len(self.fail)
+                self.goto[(state, token)] = child
+                self.fail.append(0)
+                self.depth.append(self.depth[state] + 1)
+                self.out_link.append(0)
+                self._children.append([])
+                self._children[state].append((token, child))
+            state = child
+        if state not in self.output:
+            self.output[state] = value
+            self.phrases += 1
+
+    def build(self):
+        """Compute failure links (breadth-first); call once after the last add()"""
+        queue = [child for _, child in self._children[0]]
+        for state in queue:
+            for token, child in self._children[state]:
+                fallback = self.fail[state]
+                while fallback and (fallback, token) not in self.goto:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto.get((fallback, token), 0)
+                suffix = self.fail[child]
+                self.out_link[child] = suffix if suffix in self.output else self.out_link[suffix]
+                queue.append(child)
+        self._children = None
+        return self
+
+    def iter_matches(self, tokens):
+        """Yield (first token, end token, value) for every phrase occurrence"""
+        goto, fail, output, out_link, depth = self.goto, self.fail, self.output, self.out_link, self.depth
+        state = 0
+        for i, token in enumerate(tokens):
+            while state and (state, token) not in goto:
+                state = fail[state]
+            state = goto.get((state, token), 0)
+            match = state if state in output else out_link[state]
+            while match:
+                yield i + 1 - depth[match], i + 1, output[match]
+                match = out_link[match]
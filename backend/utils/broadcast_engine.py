@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class TokenBucket:
+    """Blocking rate limiter: ``rate`` sends per second, bursts of up to ``burst``.
+
+    penalize() empties the bucket and holds every caller back for a while,
+    which is what a 429 calls for: Twilio's limit is per account, so one
+    throttled send means all of them are going too fast.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+    def penalize(self, seconds):
+        with self._lock:
+            now = time.monotonic()
+            # Negative tokens: the bucket refills past zero before anyone sends
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+            self._updated = now
+
+
+def is_retryable(result):
+    """Throttled (429), a Twilio-side failure (5xx) or no response at all"""
+    status = result.get("status_code")
+    return status == 429 or (status is not None and status >= 500) or bool(result.get("retryable"))
+
+
+class BroadcastEngine:
+    """Fans a message out to many recipients over a worker pool.
+
+    Every attempt takes a token from the shared bucket first, so the pool
+    never exceeds the Twilio throughput tier however many workers it has.
+    A failed send that is worth retrying is retried up to ``max_retries``
+    times with exponential backoff and jitter; a 429 also penalizes the
+    bucket for every worker. Recipients are read lazily and only
+    ``workers * 2`` sends are in flight at once, and results are yielded as
+    each recipient finishes, so a 20k-subscriber broadcast never holds a
+    list of 20k futures or results.
+    """
+
+    def __init__(self, send, rate=20, burst=None, workers=16, max_retries=4, backoff=1.0, max_backoff=30):
+        self.send = send  # send(phone, message) -> {"success", "status_code", "error", ...}
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.counters = {"sent": 0, "failed": 0, "retries": 0, "throttled": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.counters[key] += value
+
+    def _deliver(self, recipient, message):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            result = self.send(recipient["phone"], message)
+            attempt += 1
+            if result["success"] or attempt > self.max_retries or not is_retryable(result):
+                break
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            if result.get("status_code") == 429:
+                self._count(throttled=1)
+                self.bucket.penalize(delay)
+            self._count(retries=1)
+            time.sleep(delay)
+        self._count(**{"sent" if result["success"] else "failed": 1})
+        return {"user": recipient.get("email", "unknown"), "phone": recipient["phone"],
+                "attempts": attempt, "result": result}
+
+    def run(self, recipients, message):
+        """Yield one result per recipient (with a phone), in completion order"""
+        recipients = (recipient for recipient in recipients if recipient.get("phone"))
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="broadcast") as pool:
+            pending = set()
+            for recipient in recipients:
+                pending.add(pool.submit(self._deliver, recipient, message))
+                if len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def stats(self):
+        return {**self.counters, "rate": self.bucket.rate, "workers": self.workers}
@@ -0,0 +1,106 @@
+import calendar
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from functools import lru_cache
+import bson
+
+MAGIC = b"LXCAT\x00\x00\x01"
+# magic, catalog version (-1: none), synced_until in ms (-1: none), drug count, id table bytes
+HEADER = struct.Struct("<8sqqII")
+EPOCH = datetime(1970, 1, 1)
+
+
+def write_snapshot(path, records, version=None, synced_until=None):
+    """Publish a catalog snapshot file atomically.
+
+    ``records`` maps drug id -> BSON-encoded document (bytes). The file is
+    a fixed header, a JSON list of drug ids, an offset table (one uint64
+    per record, plus the end) and the BSON records back to back. It is
+    written beside ``path`` and moved into place with os.replace, so
+    readers see either the old file or the new one, never a partial one.
+    """
+    ids = list(records)
+    id_table = json.dumps(ids).encode()
+    start = HEADER.size + len(id_table) + 8 * (len(ids) + 1)
+    offsets = array("Q", [start])
+    for drug_id in ids:
+        offsets.append(offsets[-1] + len(records[drug_id]))
+
+    # Naive datetimes from MongoDB are UTC; timegm reads them that way
+    stamp = -1
+    if synced_until:
+        stamp = calendar.timegm(synced_until.utctimetuple()) * 1000 + synced_until.microsecond // 1000
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, -1 if version is None else version, stamp, len(ids), len(id_table)))
+        f.write(id_table)
+        f.write(offsets.tobytes())
+        for drug_id in ids:
+            f.write(records[drug_id])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def snapshot_version(path):
+    """Catalog version recorded in a snapshot file, or None (no file, or no version)"""
+    try:
+        with open(path, "rb") as f:
+            magic, version, *_ = HEADER.unpack(f.read(HEADER.size))
+    except (FileNotFoundError, struct.error):
+        return None
+    return version if magic == MAGIC and version >= 0 else None
+
+
+class CatalogSnapshot(Mapping):
+    """Read-only view of a snapshot file: drug id -> document.
+
+    The file is memory-mapped, so every worker that opens the same file
+    shares one copy of it in the page cache. Documents are decoded from
+    their BSON bytes on access, with the most recently used ones kept
+    decoded (``cache_size``).
+    """
+
+    def __init__(self, path, cache_size=1024):
+        self.path = path
+        with open(path, "rb") as f:
+            self.identity = os.fstat(f.fileno()).st_ino
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, stamp, count, id_bytes = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        self.version = None if version < 0 else version
+        self.synced_until = EPOCH + timedelta(milliseconds=stamp) if stamp >= 0 else None
+        ids = json.loads(self._map[HEADER.size:HEADER.size + id_bytes])
+        self.rows = {drug_id: row for row, drug_id in enumerate(ids)}
+        self.ids = ids
+        self.offsets = array("Q")
+        start = HEADER.size + id_bytes
+        self.offsets.frombytes(self._map[start:start + 8 * (count + 1)])
+        self.size = len(self._map)
+        self._document = lru_cache(maxsize=cache_size)(self._decode)
+
+    def raw(self, drug_id):
+        """The BSON bytes of one document, without decoding it"""
+        row = self.rows[drug_id]
+        return self._map[self.offsets[row]:self.offsets[row + 1]]
+
+    def _decode(self, row):
+        return bson.decode(memoryview(self._map)[self.offsets[row]:self.offsets[row + 1]])
+
+    def __getitem__(self, drug_id):
+        return self._document(self.rows[drug_id])
+
+    def __contains__(self, drug_id):
+        return drug_id in self.rows
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,214 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+from models.user import count_user_chats, encode_cursor, get_user_chats, iter_user_chats
+from utils.llm_scheduler import PRIORITY_BACKGROUND
+from utils.ollama_client import clip_to_tokens, estimate_tokens, trim_history
+
+SUMMARY_PROMPT = (
+    "You keep a running summary of a pharmacy assistant's conversation with one user. "
+    "Rewrite the summary so it also covers the new turns. Keep medicines, conditions, "
+    "allergies, doses, symptoms and unanswered questions; drop greetings and small talk. "
+    "Reply with the summary only, in at most {words} words."
+)
+
+# Conversation length buckets (turns so far) for the per-turn prompt size report
+LENGTH_BUCKETS = ((1, 5), (6, 10), (11, 20), (21, 50), (51, None))
+
+
+def length_bucket(turns):
+    for low, high in LENGTH_BUCKETS:
+        if high is None or turns <= high:
+            return f"{low}+" if high is None else f"{low}-{high}"
+
+
+def turn_messages(chats):
+    messages = []
+    for chat in chats:
+        messages.append({"role": "user", "content": chat["message"]})
+        messages.append({"role": "assistant", "content": chat["response"]})
+    return messages
+
+
+def assemble(summary, chats, max_tokens):
+    """Prompt history from a summary and the latest turns, within ``max_tokens``.
+
+    The summary goes first, as a system message, and is kept whole when it
+    fits; the verbatim turns get what is left, dropped oldest-first.
+    """
+    history = []
+    if summary:
+        message = {"role": "system", "content": f"Summary of the earlier conversation with this user:\n{summary}"}
+        if estimate_tokens(message["content"]) <= max_tokens:
+            history.append(message)
+            max_tokens -= estimate_tokens(message["content"])
+    return history + trim_history(turn_messages(chats), max_tokens)
+
+
+class ConversationMemory:
+    """Bounded AI history for long conversations.
+
+    The prompt gets the last ``recent_turns`` turns verbatim plus a running
+    summary of everything before them, so its size stays flat however long
+    the conversation gets. Summaries live in ``summaries`` (one document
+    per user with the summary text and the cursor of the last turn folded
+    into it). Once ``fold_every`` turns have slipped out of the verbatim
+    window, a background job asks the model to fold them into the summary
+    (at most ``fold_batch`` per pass, at the scheduler's background
+    priority, within ``timeout`` seconds). The job steps aside while any
+    request is queued for the model and is retried on a later turn. Until
+    it does, those turns are simply left out. Writes are
+    conditional on the cursor, so two workers folding the same user cannot
+    both win.
+
+    record() tallies estimated prompt tokens, Ollama's evaluated tokens and
+    latency per conversation-length bucket, which is what shows whether the
+    curve is flat.
+    """
+
+    def __init__(self, client, summaries, recent_turns=4, fold_every=4, fold_batch=12,
+                 summary_tokens=256, model=None, timeout=20):
+        self.client = client
+        self.summaries = summaries
+        self.recent_turns = recent_turns
+        self.fold_every = fold_every
+        self.fold_batch = fold_batch
+        self.summary_tokens = summary_tokens
+        self.model = model
+        self.timeout = timeout
+        self.last_error = None
+        self.counters = {"folds": 0, "turns_folded": 0, "fold_failures": 0, "fold_conflicts": 0, "folds_deferred": 0}
+        self.by_length = {}  # bucket -> {"turns", "prompt_tokens", "prompt_eval_tokens", "latency_ms"}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-memory")
+
+    def history(self, user_id, max_tokens):
+        """``(messages, info)``: the prompt history for this user and what went into it"""
+        summary = self.summaries.find_one({"user_id": ObjectId(user_id)}) or {}
+        chats, older = get_user_chats(user_id, limit=self.recent_turns)
+        backlog = 0
+        if older and chats:
+            backlog = count_user_chats(user_id, after=summary.get("covered_until"),
+                                       before=encode_cursor(chats[0]), limit=self.fold_every)
+            if backlog >= self.fold_every:
+                self.schedule(user_id)
+        messages = assemble(summary.get("text"), chats, max_tokens)
+        return messages, {
+            "turn": summary.get("turns", 0) + backlog + len(chats) + 1,
+            "summarized_turns": summary.get("turns", 0),
+            "verbatim_turns": sum(1 for message in messages if message["role"] == "user"),
+            "history_tokens": sum(estimate_tokens(message["content"]) for message in messages)
+        }
+
+    def schedule(self, user_id):
+        """Queue a fold for this user unless one is already pending"""
+        with self._lock:
+            if user_id in self._pending:
+                return
+            self._pending.add(user_id)
+        self._executor.submit(self._fold_job, user_id)
+
+    def _fold_job(self, user_id):
+        try:
+            self.fold(user_id)
+        except Exception as e:
+            self.counters["fold_failures"] += 1
+            self.last_error = str(e)
+            print(f"Conversation summary failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(user_id)
+
+    def fold(self, user_id):
+        """Fold the oldest unsummarized turns outside the verbatim window into the summary"""
+        owner = ObjectId(user_id)
+        summary = self.summaries.find_one({"user_id": owner}) or {}
+        covered = summary.get("covered_until")
+        recent, _ = get_user_chats(user_id, limit=self.recent_turns)
+        if not recent:
+            return False
+        if covered:
+            chats, _ = get_user_chats(user_id, after=covered, limit=self.fold_batch)
+        else:
+            # First summary: from the user's oldest turn, so every turn that
+            # has left the window gets folded in, a batch per pass
+            chats = list(iter_user_chats(user_id, batch_size=self.fold_batch).limit(self.fold_batch))
+        window_start = (recent[0]["timestamp"], recent[0]["_id"])
+        chats = [chat for chat in chats if (chat["timestamp"], chat["_id"]) < window_start]
+        if not chats:
+            return False
+
+        if self.client.scheduler.queued:
+            # Users are waiting for a slot; the next history() call reschedules this
+            self.counters["folds_deferred"] += 1
+            return False
+
+        turns = "\n".join(
+            f"User: {clip_to_tokens(chat['message'], 150)}\nAssistant: {clip_to_tokens(chat['response'], 150)}"
+            for chat in chats
+        )
+        result = self.client.generate_response(
+            prompt=f"Current summary:\n{summary.get('text') or '(none yet)'}\n\nNew turns:\n{turns}",
+            system_prompt=SUMMARY_PROMPT.format(words=self.summary_tokens * 3 // 4),
+            priority=PRIORITY_BACKGROUND,
+            model=self.model,
+            deadline=time.monotonic() + self.timeout
+        )
+        if not result["success"]:
+            self.counters["fold_failures"] += 1
+            self.last_error = result.get("error")
+            return False
+
+        update = {
+            "$set": {
+                "text": clip_to_tokens(result["response"].strip(), self.summary_tokens),
+                "covered_until": encode_cursor(chats[-1]),
+                "updated_at": datetime.utcnow()
+            },
+            "$inc": {"turns": len(chats)}
+        }
+        try:
+            written = self.summaries.update_one({"user_id": owner, "covered_until": covered}, update, upsert=True)
+        except DuplicateKeyError:
+            written = None  # another worker folded these turns first
+        if written is None or not (written.modified_count or written.upserted_id):
+            self.counters["fold_conflicts"] += 1
+            return False
+        self.counters["folds"] += 1
+        self.counters["turns_folded"] += len(chats)
+        return True
+
+    def record(self, info, prompt_tokens, metrics=None, latency=None):
+        """Tally one AI turn under its conversation-length bucket"""
+        bucket = length_bucket(info["turn"])
+        with self._lock:
+            totals = self.by_length.setdefault(bucket, {
+                "turns": 0, "prompt_tokens": 0, "prompt_eval_tokens": 0, "latency_ms": 0.0
+            })
+            totals["turns"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["prompt_eval_tokens"] += (metrics or {}).get("prompt_eval_count", 0)
+            totals["latency_ms"] += (latency or 0) * 1000
+
+    def stats(self):
+        with self._lock:
+            by_length = {
+                bucket: {
+                    "turns": totals["turns"],
+                    "avg_prompt_tokens": round(totals["prompt_tokens"] / totals["turns"]),
+                    "avg_prompt_eval_tokens": round(totals["prompt_eval_tokens"] / totals["turns"]),
+                    "avg_latency_ms": round(totals["latency_ms"] / totals["turns"])
+                }
+                for bucket, totals in self.by_length.items()
+            }
+        return {
+            **self.counters,
+            "pending": len(self._pending),
+            "recent_turns": self.recent_turns,
+            "by_conversation_length": by_length,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,143 @@
+"""Index bootstrap and query-plan check for every MongoDB collection.
+
+    python -m utils.db_indexes           # create any missing indexes
+    python -m utils.db_indexes --check   # ...then explain() every hot query
+
+ensure_indexes() is idempotent (create_indexes skips indexes that already
+exist) and runs on every startup from utils/db_init.py. The check exits
+non-zero if any hot query's winning plan still contains a COLLSCAN.
+"""
+import argparse
+import sys
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from models.database import db, CASE_INSENSITIVE
+from utils.drug_index import BANNED_STATUSES
+from utils.retention import ensure_ttl_indexes
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("is_admin", ASCENDING)]),
+    ],
+    "chats": [
+        # _id breaks timestamp ties for history page cursors
+        IndexModel([("user_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "login_logs": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", ASCENDING)]),
+    ],
+    "conversation_summaries": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "subscribers": [
+        IndexModel([("phone", ASCENDING)], unique=True),
+    ],
+    "whatsapp_logs": [
+        IndexModel([("timestamp", DESCENDING)]),
+    ],
+    "drugs": [
+        IndexModel([("name", ASCENDING)], collation=CASE_INSENSITIVE),
+        IndexModel([("generic_name", ASCENDING)], collation=CASE_INSENSITIVE),
+        IndexModel([("government_status.status", ASCENDING)], collation=CASE_INSENSITIVE),
+        # Incremental reads by the drug index poller
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    # Shared LLM answer cache and single-flight leases: Mongo expires them
+    "llm_cache": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "llm_inflight": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+def ensure_indexes():
+    """Create every declared index; returns the collections that failed"""
+    failed = []
+    for name, indexes in INDEXES.items():
+        try:
+            db[name].create_indexes(indexes)
+        except OperationFailure as e:
+            # Usually existing duplicates blocking a unique index
+            print(f"⚠️ Index setup for {name} failed: {e}")
+            failed.append(name)
+    try:
+        # Retention backstops; their expiry follows the RETENTION_* settings
+        ensure_ttl_indexes()
+    except OperationFailure as e:
+        print(f"⚠️ TTL index setup failed: {e}")
+        failed.append("ttl")
+    return failed
+
+
+def hot_queries():
+    """(label, cursor) for every query on a request path"""
+    user_id = ObjectId()
+    return [
+        ("login: user by email", db.users.find({"email": "probe@example.com"}).limit(1)),
+        ("startup: admin user", db.users.find({"is_admin": True}).limit(1)),
+        ("chat history for the AI", db.chats.find({"user_id": user_id}).sort("timestamp", -1).limit(10)),
+        ("chat history page", db.chats.find({"user_id": user_id, "$or": [
+            {"timestamp": {"$lt": datetime.utcnow()}}, {"timestamp": datetime.utcnow(), "_id": {"$lt": user_id}}
+        ]}).sort([("timestamp", -1), ("_id", -1)]).limit(51)),
+        ("chat history export", db.chats.find({"user_id": user_id}).sort([("timestamp", 1), ("_id", 1)])),
+        ("conversation summary", db.conversation_summaries.find({"user_id": user_id}).limit(1)),
+        ("login history", db.login_logs.find({"user_id": user_id}).sort("timestamp", -1).limit(10)),
+        ("webhook: subscriber upsert", db.subscribers.find({"phone": "whatsapp:+10000000000"}).limit(1)),
+        ("admin: latest WhatsApp messages", db.whatsapp_logs.find().sort("timestamp", -1).limit(50)),
+        ("drug by name", db.drugs.find({"name": "probe"}).collation(CASE_INSENSITIVE).limit(1)),
+        ("drug by generic name", db.drugs.find({"generic_name": "probe"}).collation(CASE_INSENSITIVE).limit(1)),
+        ("banned/recalled drugs", db.drugs.find(
+            {"government_status.status": {"$in": list(BANNED_STATUSES)}}
+        ).collation(CASE_INSENSITIVE)),
+        ("retention: records past the hot window", db.chats.find(
+            {"timestamp": {"$lt": datetime.utcnow()}}
+        ).sort("timestamp", 1).limit(1000)),
+        ("drug index refresh", db.drugs.find({"updated_at": {"$gte": datetime.utcnow()}})),
+    ]
+
+
+def plan_stages(plan):
+    """Every stage name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+def check_query_plans():
+    """explain() each hot query; returns the labels of those that scan the collection"""
+    scans = []
+    for label, cursor in hot_queries():
+        stages = list(plan_stages(cursor.explain()["queryPlanner"]["winningPlan"]))
+        if "COLLSCAN" in stages:
+            scans.append(label)
+        print(f"{'❌' if 'COLLSCAN' in stages else '✅'} {label}: {' <- '.join(stages)}")
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and verify query plans")
+    parser.add_argument("--check", action="store_true", help="fail if a hot query does a COLLSCAN")
+    args = parser.parse_args()
+
+    failed = ensure_indexes()
+    print(f"✅ Indexes ensured on {len(INDEXES) - len(failed)}/{len(INDEXES)} collections")
+    if args.check:
+        scans = check_query_plans()
+        if scans:
+            print(f"❌ {len(scans)} hot queries still scan the collection: {', '.join(scans)}")
+        failed += scans
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
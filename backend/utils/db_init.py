@@ -2,17 +2,23 @@ from datetime import datetime
 from models.database import drugs_collection, db
 from models.user import create_user
 from models.log import subscribe_user
+from models.drug import bump_catalog_version, save_drugs
+from utils.db_indexes import ensure_indexes
 from config import Config
 
 
 def initialize_drug_database():
     """Initialize database with comprehensive drug data"""
+    # Idempotent; a failure (e.g. duplicate emails) is reported but not fatal
+    ensure_indexes()
+
     if drugs_collection.count_documents({}) == 0:
         sample_drugs = [
             # Common Pain Relievers
             {
                 "name": "Aspirin",
                 "generic_name": "Acetylsalicylic Acid",
+                "brand_names": ["Disprin", "Ecosprin"],
                 "category": "Pain Reliever / Antiplatelet",
                 "uses": "Pain relief, fever reduction, heart attack prevention",
                 "withdrawal_alerts": [
@@ -37,10 +43,12 @@ def initialize_drug_database():
                 "interactions": ["Warfarin", "Ibuprofen", "Alcohol"],
                 "dosage": "Adults: 325-650mg every 4-6 hours",
                 "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
             },
             {
                 "name": "Paracetamol",
                 "generic_name": "Acetaminophen",
+                "brand_names": ["Crocin", "Dolo", "Calpol", "Tylenol"],
                 "category": "Pain Reliever / Fever Reducer",
                 "uses": "Mild to moderate pain, fever reduction",
                 "withdrawal_alerts": [
@@ -65,12 +73,14 @@ def initialize_drug_database():
                 "interactions": ["Warfarin", "Alcohol", "Other acetaminophen products"],
                 "dosage": "Adults: 500-1000mg every 4-6 hours (max 4000mg/day)",
                 "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
             },
             
             # Diabetes Medications
             {
                 "name": "Metformin",
                 "generic_name": "Metformin Hydrochloride",
+                "brand_names": ["Glucophage", "Glycomet"],
                 "category": "Antidiabetic",
                 "uses": "Type 2 diabetes management",
                 "withdrawal_alerts": [
@@ -95,12 +105,14 @@ def initialize_drug_database():
                 "interactions": ["Contrast dye", "Alcohol", "Cimetidine"],
                 "dosage": "Starting: 500mg twice daily, Max: 2000-2500mg/day",
                 "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
             },
             
             # Antibiotics
             {
                 "name": "Amoxicillin",
                 "generic_name": "Amoxicillin",
+                "brand_names": ["Amoxil", "Mox"],
                 "category": "Antibiotic (Penicillin)",
                 "uses": "Bacterial infections (respiratory, ear, skin, UTI)",
                 "withdrawal_alerts": [
@@ -125,12 +137,14 @@ def initialize_drug_database():
                 "interactions": ["Birth control pills", "Warfarin", "Methotrexate"],
                 "dosage": "Adults: 250-500mg every 8 hours OR 500-875mg every 12 hours",
                 "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
             },
             
             # Blood Pressure
             {
                 "name": "Amlodipine",
                 "generic_name": "Amlodipine Besylate",
+                "brand_names": ["Norvasc", "Amlong"],
                 "category": "Calcium Channel Blocker",
                 "uses": "High blood pressure, chest pain (angina)",
                 "withdrawal_alerts": [
@@ -156,12 +170,14 @@ def initialize_drug_database():
                 "interactions": ["Grapefruit juice", "Simvastatin", "Sildenafil"],
                 "dosage": "Starting: 5mg once daily, Max: 10mg once daily",
                 "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
             },
             
             # BANNED DRUG
             {
                 "name": "Ranitidine",
                 "generic_name": "Ranitidine Hydrochloride",
+                "brand_names": ["Zantac", "Aciloc"],
                 "category": "H2 Blocker (Antacid)",
                 "uses": "Heartburn, acid reflux, ulcers (DISCONTINUED)",
                 "withdrawal_alerts": [
@@ -188,12 +204,14 @@ def initialize_drug_database():
                 "interactions": ["Ketoconazole", "Warfarin"],
                 "dosage": "NOT APPLICABLE - BANNED",
                 "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
             },
             
             # Antihistamine
             {
                 "name": "Cetirizine",
                 "generic_name": "Cetirizine Hydrochloride",
+                "brand_names": ["Zyrtec", "Cetzine"],
                 "category": "Antihistamine",
                 "uses": "Allergies, hay fever, hives, itching",
                 "withdrawal_alerts": [
@@ -218,12 +236,14 @@ def initialize_drug_database():
                 "interactions": ["Alcohol", "CNS depressants"],
                 "dosage": "Adults: 10mg once daily",
                 "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
             },
             
             # Cholesterol
             {
                 "name": "Atorvastatin",
                 "generic_name": "Atorvastatin Calcium",
+                "brand_names": ["Lipitor", "Atorva"],
                 "category": "Statin (Cholesterol)",
                 "uses": "High cholesterol, cardiovascular disease prevention",
                 "withdrawal_alerts": [
@@ -248,14 +268,26 @@ def initialize_drug_database():
                 "interactions": ["Grapefruit juice", "Gemfibrozil", "Cyclosporine"],
                 "dosage": "Starting: 10-20mg once daily, Max: 80mg once daily",
                 "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
             },
         ]
         
-        drugs_collection.insert_many(sample_drugs)
+        save_drugs(sample_drugs)
         print(f"✅ {len(sample_drugs)} drugs inserted into database!")
     else:
         print("ℹ️  Drug database already initialized")
 
+    # Drugs stored before revisions existed start at revision 1 like new
+    # ones, so save_drug's $inc and the render cache see one numbering.
+    # updated_at moves too, so running indexes pick the change up incrementally
+    backfilled = drugs_collection.update_many(
+        {"revision": {"$exists": False}},
+        {"$set": {"revision": 1, "updated_at": datetime.utcnow()}}
+    )
+    if backfilled.modified_count:
+        bump_catalog_version()
+        print(f"✅ Revision 1 set on {backfilled.modified_count} existing drugs")
+
     # Initialize Admin User
     if not db.users.find_one({"is_admin": True}):
         create_user("admin@lifexia.local", "admin123", is_admin=True)
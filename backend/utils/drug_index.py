@@ -0,0 +1,670 @@
+import fcntl
+import heapq
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import timedelta
+from itertools import chain, islice
+import bson
+from utils.aho_corasick import TOKEN_RE, TokenAutomaton, tokenize
+from utils.catalog_snapshot import CatalogSnapshot, snapshot_version, write_snapshot
+from utils.interaction_graph import InteractionGraph
+from utils.offload import cpu_bound
+
+# Which field a name came from; lower wins when several drugs match
+FIELD_PRIORITY = {"name": 0, "brand_names": 1, "generic_name": 2}
+
+# government_status.status values that take a drug off the market
+BANNED_STATUSES = ("BANNED", "RECALLED", "BANNED/RECALLED")
+
+# Fuzzy matching skips trigrams this common ("ine", "in ") once it has
+# counted the rarer half of the query's trigrams
+COMMON_GRAM_POSTINGS = 300
+
+
+def normalize_name(text):
+    """Lower-case and collapse whitespace so lookups ignore formatting"""
+    return re.sub(r"\s+", " ", str(text).lower()).strip()
+
+
+def drug_names(drug):
+    """(field, name) pairs a drug can be looked up by"""
+    names = []
+    if drug.get("name"):
+        names.append(("name", drug["name"]))
+    for brand in drug.get("brand_names") or []:
+        names.append(("brand_names", brand))
+    if drug.get("generic_name"):
+        names.append(("generic_name", drug["generic_name"]))
+    return names
+
+
+def trigrams(text):
+    """Distinct 3-character slices of ``text``"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def padded_trigrams(text):
+    """Trigrams of `` text ``, so the first and last letters weigh more in fuzzy matches"""
+    return trigrams(f"  {text} ")
+
+
+def pattern_masks(text):
+    """Character -> bitmask of its positions in ``text``, for edit_distance()"""
+    masks = {}
+    for i, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def edit_distance(a, b, masks=None):
+    """Edit distance between ``a`` and ``b``, an adjacent transposition counting as one typo.
+
+    Bit-parallel (Hyyrö's variant of Myers' algorithm): one pass over
+    ``b`` with a few integer operations per character. Pass
+    ``pattern_masks(a)`` when comparing one query against many names.
+    """
+    if not a:
+        return len(b)
+    if masks is None:
+        masks = pattern_masks(a)
+    full = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    vp, vn, d0, previous_match = full, 0, 0, 0
+    distance = len(a)
+    for char in b:
+        match = masks.get(char, 0)
+        transposed = (((~d0) & match) << 1) & previous_match
+        d0 = ((((match & vp) + vp) ^ vp) | match | vn | transposed) & full
+        hp = vn | (~(d0 | vp) & full)
+        hn = d0 & vp
+        if hp & last:
+            distance += 1
+        elif hn & last:
+            distance -= 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(d0 | hp) & full)
+        vn = hp & d0
+        previous_match = match
+    return distance
+
+
+def drug_key(drug):
+    """The ID a drug is indexed under"""
+    return str(drug.get("_id", drug.get("name")))
+
+
+def drug_revision(drug):
+    """Revision stamp of a drug document: its revision counter, else updated_at"""
+    return drug.get("revision") or drug.get("updated_at")
+
+
+def encode_records(drugs):
+    """{drug id: BSON bytes} for a snapshot file"""
+    return {key: bson.encode(drug) for key, drug in drugs.items()}
+
+
+def newest_update(drugs, since=None):
+    """Newest updated_at among drug documents, and ``since``; None if there is none"""
+    stamps = [drug["updated_at"] for drug in drugs if drug.get("updated_at")]
+    return max(stamps + ([since] if since else []), default=None)
+
+
+def is_banned(drug):
+    """True if the drug is banned or recalled"""
+    return (drug.get("government_status") or {}).get("status") in BANNED_STATUSES
+
+
+def public_drug(drug):
+    """The drug document without Mongo's _id, ready for jsonify"""
+    return {key: value for key, value in drug.items() if key != "_id"}
+
+
+class _Snapshot:
+    """Immutable lookup structures; swapped in whole so readers never lock"""
+
+    def __init__(self, drugs):
+        self.drugs = drugs  # drug id -> document (a dict, or a CatalogSnapshot file)
+        self.names = {}     # normalized name -> [(field priority, drug id)]
+        labels, interactions, banned = {}, {}, set()
+        # One pass over the documents; everything below works from these
+        for drug_id, drug in drugs.items():
+            for field, name in drug_names(drug):
+                key = normalize_name(name)
+                if key:
+                    self.names.setdefault(key, []).append((FIELD_PRIORITY[field], drug_id))
+            labels[drug_id] = drug.get("name") or drug_id
+            if drug.get("interactions"):
+                interactions[drug_id] = drug["interactions"]
+            if is_banned(drug):
+                banned.add(drug_id)
+        for entries in self.names.values():
+            entries.sort()
+
+        # Sorted keys for prefix ranges. Trigram postings point into the
+        # same names ordered by length, so substring and fuzzy searches can
+        # bisect each posting list down to names of a plausible length.
+        self.keys = sorted(self.names)
+        self.by_length = sorted(self.keys, key=len)
+        self.length_starts = [0]
+        for position, key in enumerate(self.by_length):
+            while len(self.length_starts) <= len(key):
+                self.length_starts.append(position)
+        self.grams = {}
+        for position, key in enumerate(self.by_length):
+            for gram in padded_trigrams(key):
+                postings = self.grams.get(gram)
+                if postings is None:
+                    postings = self.grams[gram] = array("I")
+                postings.append(position)
+
+        # Every name plus every interaction term ("Alcohol", "Grapefruit
+        # juice") compiled into one automaton for mention extraction
+        self.terms = {}  # normalized interaction term -> display text
+        self.automaton = TokenAutomaton()
+        for key in self.keys:
+            self.automaton.add(tokenize(key), key)
+        for terms in interactions.values():
+            for term in terms:
+                key = normalize_name(term)
+                if key and key not in self.names and key not in self.terms:
+                    self.terms[key] = term
+                    self.automaton.add(tokenize(key), key)
+        self.automaton.build()
+
+        # Interaction lists compiled into a graph over canonical drug IDs, so
+        # a brand, generic or catalog name all land on the same node
+        self.interactions = InteractionGraph()
+        for drug_id, label in labels.items():
+            self.interactions.node(drug_id, label)
+        for key, term in self.terms.items():
+            self.interactions.node(f"term:{key}", term)
+        for drug_id, terms in interactions.items():
+            source = self.interactions.nodes[drug_id]
+            for term in terms:
+                target = self.interaction_node(normalize_name(term))
+                if target is not None:
+                    self.interactions.add(source, target)
+        self.interactions.build()
+
+        # Banned/recalled registry: the drugs, and every name that reaches one
+        self.banned = sorted(banned, key=lambda drug_id: normalize_name(labels[drug_id]))
+        self.banned_names = {}  # normalized name -> banned drug id
+        for key, entries in self.names.items():
+            drug_id = next((drug_id for _, drug_id in entries if drug_id in banned), None)
+            if drug_id is not None:
+                self.banned_names[key] = drug_id
+
+    def interaction_node(self, key):
+        """Graph node for a normalized name (catalog drug or bare term), or None"""
+        entries = self.names.get(key)
+        if entries:
+            return self.interactions.nodes[entries[0][1]]
+        return self.interactions.nodes.get(f"term:{key}")
+
+    def length_start(self, length):
+        """Position in by_length of the first name at least ``length`` long"""
+        if length >= len(self.length_starts):
+            return len(self.by_length)
+        return self.length_starts[max(0, length)]
+
+    def postings(self, gram, min_length, max_length):
+        """Positions of names containing ``gram`` with a length in range"""
+        found = self.grams.get(gram)
+        if found is None:
+            return found
+        lo = bisect_left(found, self.length_start(min_length))
+        hi = bisect_left(found, self.length_start(max_length + 1), lo)
+        return found[lo:hi]
+
+
+class DrugIndex:
+    """Per-process index of the drug catalog.
+
+    Every drug is indexed by its name, brand names and generic name, and
+    lookups (exact, then prefix, then substring, or fuzzy), mention
+    extraction from free text, interaction checks and the banned/recalled
+    registry are served from memory.
+    ``start()`` loads the whole catalog once and then polls the catalog
+    version stamp (see models/drug.py); when it moves, only documents
+    whose ``updated_at`` changed are re-read, with a full reload if drugs
+    were deleted.
+
+    With ``snapshot_path``, the documents themselves are not held per
+    worker: the catalog is compiled into a memory-mapped snapshot file
+    (utils/catalog_snapshot.py) that every worker opens, and only the
+    lookup structures live in each process. One worker at a time (an
+    flock next to the file) re-reads MongoDB and publishes a new file when
+    the version moves; the others pick it up by its changed inode.
+    Startup only reads MongoDB when no snapshot file exists yet.
+    """
+
+    def __init__(self, collection, meta_collection=None, refresh_interval=10, snapshot_path=None, sync_overlap=60):
+        self.collection = collection
+        self.meta_collection = meta_collection
+        self.refresh_interval = refresh_interval
+        # updated_at comes from the writer's clock: re-read this many seconds
+        # before the watermark so skewed or slow writes are not skipped
+        self.sync_overlap = timedelta(seconds=sync_overlap)
+        self.snapshot_path = snapshot_path
+        self.version = None
+        self.synced_until = None  # newest updated_at loaded; incremental refreshes start here
+        self.loaded_at = None
+        self.source = None  # "mongo", "snapshot" or "documents"
+        self.last_error = None
+        self.counters = {
+            "lookups": 0,
+            "hits": 0,
+            "fuzzy_lookups": 0,
+            "fuzzy_hits": 0,
+            "full_loads": 0,
+            "incremental_loads": 0,
+            "snapshot_opens": 0,
+            "snapshot_publishes": 0
+        }
+        self.listeners = []  # called with {drug id: document} after every (re)load
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._poller = None
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    def start(self):
+        """Load the catalog and start the version poller (idempotent)"""
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._poller = threading.Thread(target=self._poll_loop, name="drug-index", daemon=True)
+        try:
+            if self.snapshot_path and os.path.exists(self.snapshot_path):
+                self._open_snapshot()
+                # The file may predate catalog writes; read only the drugs
+                # changed since its watermark instead of the whole collection
+                self.refresh()
+            else:
+                self.reload()
+            print(f"✅ Drug index loaded from {self.source}: "
+                  f"{len(self._snapshot.drugs)} drugs, {len(self._snapshot.keys)} names")
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Drug index load error (falling back to MongoDB queries): {e}")
+        if self.refresh_interval > 0:
+            self._poller.start()
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Drug index refresh error: {e}")
+
+    def _current_version(self):
+        if self.meta_collection is None:
+            return None
+        meta = self.meta_collection.find_one({"_id": "drugs"})
+        return meta.get("version", 0) if meta else 0
+
+    def reload(self):
+        """Rebuild the index from the whole collection"""
+        version = self._current_version()
+        drugs = {str(drug["_id"]): drug for drug in self.collection.find({})}
+        synced_until = newest_update(drugs.values())
+        self.counters["full_loads"] += 1
+        if self.snapshot_path:
+            try:
+                if self._publish(cpu_bound(encode_records, drugs), version, synced_until):
+                    return self._open_snapshot()
+            except OSError as e:
+                self.last_error = str(e)
+                print(f"Drug snapshot write error (keeping the catalog in this worker): {e}")
+        self._install(drugs, version, "mongo", synced_until)
+
+    def load_documents(self, documents):
+        """Build the index from an iterable of drug documents (no MongoDB)"""
+        drugs = {drug_key(drug): drug for drug in documents}
+        self._install(drugs, self.version, "documents", newest_update(drugs.values()))
+
+    def refresh(self):
+        """Apply catalog changes if the version stamp moved"""
+        if self._snapshot is None:
+            return self.reload()
+        if self._snapshot_changed():
+            # Another worker published a newer catalog
+            return self._open_snapshot()
+        version = self._current_version()
+        if version == self.version:
+            return
+
+        query = {"updated_at": {"$gte": self.synced_until - self.sync_overlap}} if self.synced_until else {}
+        changed = list(self.collection.find(query))
+        synced_until = newest_update(changed, self.synced_until)
+        # Deletions leave nothing to read by updated_at; diff the ids instead
+        ids = {str(drug["_id"]) for drug in self.collection.find({}, {"_id": 1})}
+        current = self._snapshot.drugs
+        if isinstance(current, CatalogSnapshot):
+            # Unchanged drugs are copied into the new file without decoding them
+            records = {drug_id: current.raw(drug_id) for drug_id in current if drug_id in ids}
+            for drug in changed:
+                records[str(drug["_id"])] = bson.encode(drug)
+            if len(records) != len(ids):
+                return self.reload()
+            if self._publish(records, version, synced_until):
+                self._open_snapshot()
+            self.counters["incremental_loads"] += 1
+            return
+
+        drugs = {drug_id: drug for drug_id, drug in current.items() if drug_id in ids}
+        for drug in changed:
+            drugs[str(drug["_id"])] = drug
+        if len(drugs) != len(ids):
+            # A drug appeared without a readable updated_at
+            return self.reload()
+        self._install(drugs, version, "mongo", synced_until)
+        self.counters["incremental_loads"] += 1
+
+    def _snapshot_changed(self):
+        """True if the snapshot file on disk is not the one this index has open"""
+        if not self.snapshot_path:
+            return False
+        try:
+            identity = os.stat(self.snapshot_path).st_ino
+        except FileNotFoundError:
+            return False
+        current = self._snapshot.drugs if self._snapshot else None
+        return not isinstance(current, CatalogSnapshot) or current.identity != identity
+
+    def _publish(self, records, version, synced_until):
+        """Write a new snapshot file unless another worker is already doing so"""
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{self.snapshot_path}.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            published = snapshot_version(self.snapshot_path)
+            if version is not None and published is not None and published >= version:
+                return True  # another worker already published this version (or a newer one)
+            cpu_bound(write_snapshot, self.snapshot_path, records, version, synced_until)
+        self.counters["snapshot_publishes"] += 1
+        return True
+
+    def _open_snapshot(self):
+        snapshot = CatalogSnapshot(self.snapshot_path)
+        # The header's watermark: a worker attaching to the file catches up from there
+        self._install(snapshot, snapshot.version, "snapshot", snapshot.synced_until)
+        self.counters["snapshot_opens"] += 1
+
+    def _install(self, drugs, version, source, synced_until):
+        # Seconds of work at catalog scale; kept off the gevent hub
+        snapshot = cpu_bound(_Snapshot, drugs)
+        with self._lock:
+            self._snapshot = snapshot
+            self.version = version
+            self.synced_until = synced_until
+            self.loaded_at = time.time()
+            self.source = source
+        for listener in self.listeners:
+            listener(drugs)
+
+    def lookup(self, query):
+        """Best drug for ``query``: exact name, else prefix, else substring match"""
+        matches = self.search(query, limit=1)
+        return matches[0] if matches else None
+
+    def search(self, query, limit=10):
+        """Up to ``limit`` drugs matching ``query``, best first"""
+        snapshot = self._snapshot
+        key = normalize_name(query)
+        self.counters["lookups"] += 1
+        if snapshot is None or not key:
+            return []
+
+        exact = snapshot.names.get(key)
+        if exact:
+            drug_ids = [drug_id for _, drug_id in exact]
+        else:
+            keys = self._prefix_keys(snapshot, key) or self._substring_keys(snapshot, key)
+            # Closest names first: field priority, then the shortest name
+            ranked = heapq.nsmallest(
+                limit,
+                ((snapshot.names[name][0][0], len(name), name) for name in keys)
+            )
+            drug_ids = [drug_id for _, _, name in ranked for _, drug_id in snapshot.names[name]]
+
+        results, seen = [], set()
+        for drug_id in drug_ids:
+            if drug_id not in seen:
+                seen.add(drug_id)
+                results.append(snapshot.drugs[drug_id])
+                if len(results) >= limit:
+                    break
+        if results:
+            self.counters["hits"] += 1
+        return results
+
+    def fuzzy_search(self, query, limit=5, max_distance=None, candidates=20):
+        """Drugs named within a few typos of ``query``, best first.
+
+        Returns ``(score, matched name, drug)`` tuples where score is
+        1 - edit distance / name length. Names of a similar length sharing
+        enough trigrams with the query are short-listed from the postings
+        (each typo breaks at most three trigrams), and only the best
+        ``candidates`` get a real edit-distance check. One-typo matches are
+        tried first; ``max_distance`` defaults to 1 for names up to 5
+        letters and 2 otherwise.
+        """
+        snapshot = self._snapshot
+        key = normalize_name(query)
+        self.counters["fuzzy_lookups"] += 1
+        if snapshot is None or len(key) < 3:
+            return []
+        if max_distance is None:
+            max_distance = 1 if len(key) <= 5 else 2
+
+        grams = padded_trigrams(key)
+        masks = pattern_masks(key)
+        scored = []
+        for allowed in range(1, max_distance + 1):
+            postings = sorted((
+                found for found in (
+                    snapshot.postings(gram, len(key) - allowed, len(key) + allowed) for gram in grams
+                ) if found
+            ), key=len)
+            keep = max(3 * allowed + 2, len(grams) // 2)
+            counted = postings[:keep] + [found for found in postings[keep:] if len(found) <= COMMON_GRAM_POSTINGS]
+            needed = max(1, len(grams) - 3 * allowed - (len(postings) - len(counted)))
+            shared = Counter(chain.from_iterable(counted))
+            shortlist = [
+                (count, position) for position, count in shared.most_common(candidates) if count >= needed
+            ]
+            for _, position in shortlist:
+                name = snapshot.by_length[position]
+                distance = edit_distance(key, name, masks)
+                if distance <= allowed:
+                    score = 1 - distance / max(len(key), len(name))
+                    scored.append((-score, snapshot.names[name][0][0], name))
+            if scored:
+                break
+        scored.sort()
+
+        results, seen = [], set()
+        for score, _, name in scored:
+            drug_id = snapshot.names[name][0][1]
+            if drug_id not in seen:
+                seen.add(drug_id)
+                results.append((round(-score, 3), name, snapshot.drugs[drug_id]))
+                if len(results) >= limit:
+                    break
+        if results:
+            self.counters["fuzzy_hits"] += 1
+        return results
+
+    @staticmethod
+    def _prefix_keys(snapshot, key):
+        lo = bisect_left(snapshot.keys, key)
+        hi = bisect_right(snapshot.keys, key + "\uffff", lo)
+        return snapshot.keys[lo:hi]
+
+    @staticmethod
+    def _substring_keys(snapshot, key):
+        if len(key) < 3:
+            return [name for name in snapshot.keys if key in name]
+        postings = []
+        for gram in trigrams(key):
+            found = snapshot.postings(gram, len(key), len(snapshot.length_starts))
+            if not found:
+                return []
+            postings.append(found)
+        candidates = min(postings, key=len)
+        return [snapshot.by_length[i] for i in candidates if key in snapshot.by_length[i]]
+
+    def extract(self, text):
+        """Every drug or interaction term mentioned in ``text``, in order.
+
+        One pass of the catalog automaton over the words of ``text``;
+        overlapping mentions resolve to the leftmost, then longest, phrase
+        ("Atorvastatin Calcium" rather than "Atorvastatin"). Each mention is
+        ``{"name", "text", "start", "end", "drug"}`` with character offsets
+        into ``text``; ``drug`` is None for interaction terms that have no
+        catalog entry.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not text:
+            return []
+        words = list(TOKEN_RE.finditer(text.lower()))
+        spans = sorted(
+            snapshot.automaton.iter_matches([word.group() for word in words]),
+            key=lambda span: (span[0], -span[1])
+        )
+
+        mentions, covered = [], 0
+        for first, end, key in spans:
+            if first < covered:
+                continue
+            covered = end
+            start, stop = words[first].start(), words[end - 1].end()
+            entries = snapshot.names.get(key)
+            drug = snapshot.drugs[entries[0][1]] if entries else None
+            mentions.append({
+                "name": drug.get("name") if drug else snapshot.terms.get(key, key),
+                "text": text[start:stop],
+                "start": start,
+                "end": stop,
+                "drug": drug
+            })
+        return mentions
+
+    def mentioned_drugs(self, text):
+        """Catalog drugs mentioned in ``text``, each once, in order of mention"""
+        drugs, seen = [], set()
+        for mention in self.extract(text):
+            drug = mention["drug"]
+            if drug is not None and drug_key(drug) not in seen:
+                seen.add(drug_key(drug))
+                drugs.append(drug)
+        return drugs
+
+    def banned_drugs(self):
+        """Every banned or recalled drug, by name"""
+        snapshot = self._snapshot
+        return [snapshot.drugs[drug_id] for drug_id in snapshot.banned] if snapshot else []
+
+    def banned_status(self, name):
+        """The banned/recalled drug ``name`` refers to (any name, brand or generic), or None"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        drug_id = snapshot.banned_names.get(normalize_name(name))
+        return snapshot.drugs[drug_id] if drug_id is not None else None
+
+    def mentioned_banned(self, text):
+        """Banned or recalled drugs mentioned in ``text``, each once"""
+        return [drug for drug in self.mentioned_drugs(text) if is_banned(drug)]
+
+    def mentioned_interactions(self, text):
+        """Interacting pairs among everything ``text`` mentions, as name pairs"""
+        mentions = [mention["name"] for mention in self.extract(text)]
+        if len(mentions) < 2:
+            return []
+        return [pair["drugs"] for pair in self.check_interactions(mentions)["interactions"]]
+
+    def check_interactions(self, medications):
+        """Every interacting pair in a list of medication names.
+
+        Names resolve to canonical drugs by exact name, brand or generic
+        name, falling back to prefix/substring lookup; interaction-only
+        terms ("Alcohol") resolve too. Returns ``{"medications": [...],
+        "interactions": [...]}``; unknown names have ``"known": False``.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"medications": [], "interactions": []}
+
+        resolved, numbers = [], []
+        for query in medications:
+            key = normalize_name(query)
+            number = snapshot.interaction_node(key)
+            if number is None:
+                drug = self.lookup(query)
+                if drug is not None:
+                    number = snapshot.interaction_node(normalize_name(drug["name"]))
+            resolved.append({
+                "query": query,
+                "name": snapshot.interactions.labels[number] if number is not None else None,
+                "known": number is not None
+            })
+            if number is not None:
+                numbers.append(number)
+
+        labels = snapshot.interactions.labels
+        return {
+            "medications": resolved,
+            "interactions": [
+                {"drugs": [labels[a], labels[b]]} for a, b in snapshot.interactions.conflicts(numbers)
+            ]
+        }
+
+    def get(self, drug_id):
+        snapshot = self._snapshot
+        return snapshot.drugs.get(str(drug_id)) if snapshot else None
+
+    def documents(self):
+        """Every drug in the current snapshot, as {drug id: document}"""
+        snapshot = self._snapshot
+        return dict(snapshot.drugs) if snapshot else {}
+
+    def iter_documents(self, limit=None):
+        """Up to ``limit`` drugs, banned/recalled ones first, each decoded only when reached"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return iter(())
+        banned = set(snapshot.banned)
+        ids = chain(snapshot.banned, (drug_id for drug_id in snapshot.drugs if drug_id not in banned))
+        return (snapshot.drugs[drug_id] for drug_id in islice(ids, limit))
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            **self.counters,
+            "ready": snapshot is not None,
+            "drugs": len(snapshot.drugs) if snapshot else 0,
+            "names": len(snapshot.keys) if snapshot else 0,
+            "extractor_phrases": snapshot.automaton.phrases if snapshot else 0,
+            "interaction_edges": snapshot.interactions.edges if snapshot else 0,
+            "banned": len(snapshot.banned) if snapshot else 0,
+            "version": self.version,
+            "source": self.source,
+            "snapshot_bytes": snapshot.drugs.size if snapshot and isinstance(snapshot.drugs, CatalogSnapshot) else 0,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,317 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+import numpy as np
+from utils.aho_corasick import tokenize
+from utils.offload import cpu_bound
+from utils.ollama_client import estimate_tokens
+
+
+def drug_monograph(drug):
+    """Plain-text record of a drug, as embedded and as given to the AI"""
+    lines = [drug.get("name", "")]
+    if drug.get("generic_name"):
+        lines[0] += f" ({drug['generic_name']})"
+    for label, field in (("Brands", "brand_names"), ("Category", "category"), ("Uses", "uses"),
+                         ("Dosage", "dosage"), ("When to take", "timing"),
+                         ("Safety alerts", "safety_alerts"), ("Side effects", "adr_alerts"),
+                         ("Withdrawal alerts", "withdrawal_alerts"), ("Interacts with", "interactions")):
+        value = drug.get(field)
+        if value:
+            lines.append(f"{label}: {'; '.join(value) if isinstance(value, list) else value}")
+    status = drug.get("government_status") or {}
+    if status.get("status"):
+        notes = f" ({status['notes']})" if status.get("notes") else ""
+        lines.append(f"Status: {status['status']}{notes}")
+    return "\n".join(lines)
+
+
+def drug_embedding_text(drug):
+    """What a drug is and is for: the part of the record that is embedded.
+
+    Warnings and dosing are left out so they do not dilute the vector; the
+    full monograph is what goes into the AI context.
+    """
+    fields = [drug.get("name"), drug.get("generic_name"), ", ".join(drug.get("brand_names") or []),
+              drug.get("category"), drug.get("uses")]
+    return "\n".join(field for field in fields if field)
+
+
+# Question filler that would otherwise match every record ("for", "with")
+STOPWORDS = frozenset(
+    "a an and are as at be can do does for from have how i in is it me my of on or should "
+    "take taking the to what when which who with you".split()
+)
+
+
+def embedding_texts(drugs, ids, embedder_name):
+    """``(texts, fingerprints)`` for the drugs in ``ids`` order"""
+    texts = [drug_embedding_text(drugs[drug_id]) for drug_id in ids]
+    fingerprints = [hashlib.sha1(f"{embedder_name}\n{text}".encode()).hexdigest()[:16] for text in texts]
+    return texts, fingerprints
+
+
+class HashingEmbedder:
+    """Local stand-in for an embeddings model.
+
+    Words and the character trigrams of each word are hashed (crc32, so
+    every worker agrees) into a fixed number of signed buckets. Similar
+    spellings and shared vocabulary ("stomach acid", "acidity") land close
+    together; there is no semantic knowledge beyond that.
+    """
+
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def _features(self, text):
+        for word in tokenize(text):
+            if word in STOPWORDS:
+                continue
+            yield word, 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.25
+
+    def embed(self, texts):
+        return cpu_bound(self._embed, texts)
+
+    def _embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                code = zlib.crc32(feature.encode())
+                vectors[row, code % self.dimensions] += weight if code & 0x80000000 else -weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class OllamaEmbedder:
+    """Embeddings from Ollama's /api/embed endpoint (e.g. nomic-embed-text)"""
+
+    def __init__(self, client, model):
+        self.client = client
+        self.model = model
+        self.name = f"ollama-{model}"
+
+    def embed(self, texts):
+        with self.client._upstream("POST", "/api/embed", json={"model": self.model, "input": list(texts)}) as response:
+            response.raise_for_status()
+            vectors = np.asarray(response.json()["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class DrugRetriever:
+    """Top-k cosine retrieval over embedded drug records.
+
+    Every catalog drug is embedded into one float32 matrix (rows are unit
+    vectors, so a matrix-vector product gives every cosine score at once).
+    The matrix lives in ``directory`` as ``vectors-<generation>.f32`` next
+    to a ``manifest.json`` naming the current file, and each worker
+    memory-maps it read-only, so the page cache holds one copy for all of
+    them.
+
+    A background job re-embeds the catalog whenever the drug index
+    reloads. Only drugs whose embedded text changed are sent to the
+    embedder; the rest are copied from the previous matrix. One worker at a
+    time does this (an flock on the directory) and publishes the new
+    generation by replacing the manifest; the others notice and re-map.
+    """
+
+    def __init__(self, drug_index, embedder, directory, refresh_interval=30, top_k=3,
+                 min_score=0.15, max_tokens=600, batch_size=32):
+        self.drug_index = drug_index
+        self.embedder = embedder
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_tokens = max_tokens
+        self.batch_size = batch_size
+        self.generation = None
+        self.synced_index = None  # drug_index.loaded_at of the last sync
+        self.last_error = None
+        self.counters = {"queries": 0, "records_served": 0, "embedded": 0, "reused": 0, "syncs": 0}
+        self._ids = []
+        self._matrix = None
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._matrix is not None and len(self._ids) > 0
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def start(self):
+        """Map the current matrix and start the re-embed job (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="drug-retriever", daemon=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self._open()
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self.drug_index.ready and self.drug_index.loaded_at != self.synced_index:
+                    self.sync()
+                self._open()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Drug retriever error: {e}")
+            time.sleep(self.refresh_interval)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path("manifest.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _open(self):
+        """(Re)map the matrix if another generation has been published"""
+        try:
+            mtime = os.stat(self._path("manifest.json")).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+        manifest = self._read_manifest()
+        if manifest["embedder"] != self.embedder.name:
+            return  # written by a worker with other settings; our sync will replace it
+        matrix = np.memmap(self._path(manifest["file"]), dtype=np.float32, mode="r",
+                           shape=(len(manifest["ids"]), manifest["dimensions"])) if manifest["ids"] else None
+        with self._lock:
+            self._matrix, self._ids = matrix, manifest["ids"]
+            self.generation = manifest["generation"]
+            self._manifest_mtime = mtime
+
+    def sync(self):
+        """Incremental re-embed job: embed changed drugs and publish a new matrix"""
+        loaded_at = self.drug_index.loaded_at
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(".lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False  # another worker is publishing; we re-map when it is done
+            self._publish(self.drug_index.documents())
+        self.synced_index = loaded_at
+        return True
+
+    def _publish(self, drugs):
+        manifest = self._read_manifest()
+        version = self.drug_index.version or 0
+        if manifest and manifest.get("catalog_version", 0) > version:
+            return  # a worker with a newer catalog already published
+        old, previous = None, {}
+        if manifest and manifest["embedder"] == self.embedder.name and manifest["ids"]:
+            old = np.memmap(self._path(manifest["file"]), dtype=np.float32, mode="r",
+                            shape=(len(manifest["ids"]), manifest["dimensions"]))
+            previous = {key: row for row, key in enumerate(zip(manifest["ids"], manifest["fingerprints"]))}
+
+        ids = sorted(drugs)
+        texts, fingerprints = cpu_bound(embedding_texts, drugs, ids, self.embedder.name)
+        if manifest and manifest["ids"] == ids and manifest["fingerprints"] == fingerprints \
+                and manifest["embedder"] == self.embedder.name:
+            return  # nothing that is embedded changed
+
+        reused = [(row, previous[key]) for row, key in enumerate(zip(ids, fingerprints)) if key in previous]
+        stale = [row for row, key in enumerate(zip(ids, fingerprints)) if key not in previous]
+        vectors = [self.embedder.embed([texts[row] for row in stale[start:start + self.batch_size]])
+                   for start in range(0, len(stale), self.batch_size)]
+        dimensions = vectors[0].shape[1] if vectors else manifest["dimensions"] if manifest else 0
+
+        generation = (manifest["generation"] + 1) if manifest else 1
+        name = f"vectors-{generation}.f32"
+        if ids:
+            matrix = np.memmap(self._path(name), dtype=np.float32, mode="w+", shape=(len(ids), dimensions))
+            if reused:
+                rows, old_rows = zip(*reused)
+                matrix[list(rows)] = old[list(old_rows)]
+            if stale:
+                matrix[stale] = np.concatenate(vectors)
+            matrix.flush()
+            del matrix
+
+        tmp = self._path("manifest.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "generation": generation,
+                "file": name,
+                "embedder": self.embedder.name,
+                "catalog_version": version,
+                "dimensions": dimensions,
+                "ids": ids,
+                "fingerprints": fingerprints,
+                "created_at": time.time()
+            }, f)
+        os.replace(tmp, self._path("manifest.json"))
+
+        # Workers still mapping the old file keep their pages until they re-map
+        if manifest and manifest["file"] != name and os.path.exists(self._path(manifest["file"])):
+            os.remove(self._path(manifest["file"]))
+
+        self.counters["embedded"] += len(stale)
+        self.counters["reused"] += len(reused)
+        self.counters["syncs"] += 1
+        print(f"✅ Drug retrieval index generation {generation}: {len(stale)} embedded, {len(reused)} reused")
+
+    def search(self, query, k=None):
+        """[(cosine score, drug document)] for the ``k`` best records"""
+        with self._lock:
+            matrix, ids = self._matrix, self._ids
+        if matrix is None or not ids:
+            return []
+        k = min(k or self.top_k, len(ids))
+        scores = matrix @ self.embedder.embed([query])[0]
+        top = np.argpartition(-scores, k - 1)[:k]
+        results = []
+        for row in top[np.argsort(-scores[top])]:
+            drug = self.drug_index.get(ids[row])
+            if drug is not None and scores[row] >= self.min_score:
+                results.append((float(scores[row]), drug))
+        return results
+
+    def context(self, query):
+        """The best drug records for ``query``, within the token budget"""
+        self.counters["queries"] += 1
+        try:
+            matches = self.search(query)
+        except Exception as e:
+            self.last_error = str(e)
+            return ""
+
+        records, used = [], 0
+        for _, drug in matches:
+            record = drug_monograph(drug)
+            tokens = estimate_tokens(record)
+            if used + tokens > self.max_tokens:
+                if records:
+                    break
+                record = record[:self.max_tokens * 4]
+            records.append(record)
+            used += tokens
+        self.counters["records_served"] += len(records)
+        return "\n\n".join(records)
+
+    def stats(self):
+        return {
+            **self.counters,
+            "ready": self.ready,
+            "embedder": self.embedder.name,
+            "generation": self.generation,
+            "records": len(self._ids),
+            "matrix_bytes": self._matrix.nbytes if self._matrix is not None else 0,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,165 @@
+import re
+
+MAX_CACHED_RESULTS = 4096  # distinct keyword combinations remembered per classifier
+SEPARATOR = "\x1e"  # ASCII record separator, between messages in a batch scan
+
+
+def keyword_forms(keyword):
+    """Spellings a keyword matches: itself and its plural (tablet/tablets)"""
+    keyword = " ".join(keyword.lower().split())
+    return {keyword, keyword + "s", keyword + "es"}
+
+
+def trie_pattern(node):
+    """Regex for the words in a character trie, longest match first.
+
+    Factoring shared prefixes ("c(?:apsule|linic|ough)") lets the regex
+    engine pick a branch by its next character instead of trying every
+    keyword in turn at every word.
+    """
+    branches = [re.escape(char) + trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if "" in node:
+        branches.append(node[""])  # the word can end here; tried after every longer one
+    return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+
+def build_trie(forms, stems):
+    """Character trie of ``forms``; stems may end mid-word, the rest need a boundary"""
+    trie = {}
+    for form in forms:
+        node = trie
+        for char in form:
+            node = node.setdefault(char, {})
+        node[""] = "" if form in stems else r"\b"
+    return trie
+
+
+def anchored(alternatives, separator=None):
+    """``{is_ascii: pattern}`` matching ``alternatives`` (or ``separator``) after a non-word character.
+
+    Any non-word character will do, then a word boundary rules out
+    non-ASCII letters. ASCII text needs no boundary check: there every
+    character outside a-z, 0-9 and "_" is a non-word one (the text is
+    lowercased), and the explicit class is faster for the engine to skip.
+    """
+    lead = re.escape(separator) + "|" if separator else ""
+    return {
+        False: re.compile(r"[^a-z0-9_](" + lead + r"\b" + alternatives + ")"),
+        True: re.compile(r"[\x00-\x2f\x3a-\x40\x5b-\x5e\x60\x7b-\x7f](" + lead + alternatives + ")")
+    }
+
+
+class IntentClassifier:
+    """Keyword intent detection compiled into one regular expression.
+
+    Every drug, hospital, condition and specialty keyword (with its
+    plurals) goes into a single word-boundary pattern, factored by shared
+    prefixes, so a message is scanned once by the regex engine and each
+    match is looked up in a dict of the categories it belongs to. Matching
+    whole words means "find" no longer fires inside "findings"; a trailing
+    ``*`` marks a stem ("obstetr*" matches "obstetrics"). Keywords inside a
+    longer match count too ("chest pain" is cardiology and the condition
+    "pain"): they are folded into the longer keyword's hits up front, so
+    the scan never has to backtrack. Intent priority is drug_info, then
+    hospital_search, then medical_advice, else general.
+    """
+
+    INTENTS = ("drug_info", "hospital_search", "medical_advice")
+
+    def __init__(self, drug_keywords, hospital_keywords, condition_keywords, specialty_keywords=None):
+        keywords = [("drug_info", None, keyword) for keyword in drug_keywords]
+        keywords += [("hospital_search", None, keyword) for keyword in hospital_keywords]
+        keywords += [("medical_advice", keyword.rstrip("*"), keyword) for keyword in condition_keywords]
+        for specialty, words in (specialty_keywords or {}).items():
+            keywords += [("specialty", specialty, keyword) for keyword in words]
+
+        own = {}  # keyword form -> ((category, label), ...)
+        stems = set()
+        for category, label, keyword in keywords:
+            if keyword.endswith("*"):
+                forms = {keyword[:-1].lower()}
+                stems.update(forms)
+            else:
+                forms = keyword_forms(keyword)
+            for form in forms:
+                own[form] = own.get(form, ()) + ((category, label),)
+
+        # A keyword that starts inside another and runs past it ("x y" and
+        # "y z") needs the joined form too, or the first match would hide it
+        forms = set(own)
+        pending = list(own)
+        while pending:
+            form = pending.pop()
+            for start in (i + 1 for i, char in enumerate(form) if char == " "):
+                for other in own:
+                    joined = form[:start] + other
+                    if other.startswith(form[start:] + " ") and joined not in forms:
+                        forms.add(joined)
+                        pending.append(joined)
+                        if other in stems:
+                            stems.add(joined)
+
+        # Each form's hits: every keyword an overlapping scan finds inside it
+        overlapping = re.compile(r"\b(?=(" + trie_pattern(build_trie(own, stems)) + "))") if own else None
+        self.hits = {form: tuple(hit for match in overlapping.findall(form) for hit in own[match]) for form in forms}
+        # Anchoring each keyword on the character before it lets the regex
+        # engine skip through words in C instead of trying the whole
+        # pattern at every letter; text is scanned with a leading space so
+        # the first word has one too. Batch scans also match the separator
+        # between messages to tell them apart.
+        self.patterns = self.batch_patterns = None
+        if forms:
+            alternatives = trie_pattern(build_trie(forms, stems))
+            self.patterns = anchored(alternatives)
+            self.batch_patterns = anchored(alternatives, SEPARATOR)
+        self._results = {}  # comma-joined matches -> result
+
+    def classify(self, message):
+        """``{"intent", "specialty", "conditions", "drug_related"}`` for one message"""
+        if self.patterns is None:
+            return self._result("")
+        text = " " + message.lower()
+        matches = ",".join(self.patterns[text.isascii()].findall(text))
+        return dict(self._results[matches]) if matches in self._results else self._result(matches)
+
+    def classify_batch(self, messages):
+        """classify() for many messages at once, in order.
+
+        The messages are joined with a separator no keyword contains and
+        scanned in a single call that returns the keywords and the
+        separators in order; joining those and splitting at the separators
+        gives each message's matches without a Python loop over them.
+        """
+        if not messages:
+            return []
+        text = " " + f" {SEPARATOR} ".join(messages).lower()
+        if self.batch_patterns is None or text.count(SEPARATOR) != len(messages) - 1:
+            return [self.classify(message) for message in messages]  # a message holds the separator
+        found = ",".join(self.batch_patterns[text.isascii()].findall(text)).split(SEPARATOR)
+        cached = self._results
+        return [dict(cached[matches]) if matches in cached else self._result(matches) for matches in found]
+
+    def _result(self, matches):
+        # Few distinct keyword combinations occur; build each result once.
+        # Callers get a copy, and every value in it is immutable, so the
+        # copies are not tracked by the garbage collector either.
+        result = self._results.get(matches)
+        if result is None:
+            result = self._build([match for match in matches.split(",") if match])
+            if len(self._results) < MAX_CACHED_RESULTS:
+                self._results[matches] = result
+        return dict(result)
+
+    def _build(self, matches):
+        hits = [hit for match in matches for hit in self.hits[match]]
+        categories = {category for category, _ in hits}
+        conditions = []
+        for category, label in hits:
+            if category == "medical_advice" and label not in conditions:
+                conditions.append(label)
+        return {
+            "intent": next((intent for intent in self.INTENTS if intent in categories), "general"),
+            "specialty": next((label for category, label in hits if category == "specialty"), None),
+            "conditions": tuple(conditions),
+            "drug_related": "drug_info" in categories
+        }
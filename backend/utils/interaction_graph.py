@@ -0,0 +1,82 @@
+from array import array
+from bisect import bisect_left
+
+
+class InteractionGraph:
+    """Drug interactions as an undirected graph over canonical drug IDs.
+
+    Nodes are catalog drug IDs, or ``term:<name>`` for interaction terms
+    with no catalog entry ("Alcohol", "Grapefruit juice"). Once built, the
+    adjacency lists are packed into two flat arrays (compressed sparse rows:
+    each node's sorted neighbours, and where each node's run starts), so
+    200k edges take under 2 MB and a pair check is one bisect.
+    """
+
+    def __init__(self):
+        self.nodes = {}   # canonical id -> node number
+        self.labels = []  # node number -> display name
+        self.offsets = array("I", [0])
+        self.neighbors = array("I")
+        self._pending = set()
+
+    def node(self, canonical_id, label):
+        number = self.nodes.get(canonical_id)
+        if number is None:
+            number = self.nodes[canonical_id] = len(self.labels)
+            self.labels.append(label)
+        return number
+
+    def add(self, a, b):
+        """Record an interaction; call build() after the last one"""
+        if a != b:
+            self._pending.add((a, b) if a < b else (b, a))
+
+    def build(self):
+        adjacency = [[] for _ in self.labels]
+        for a, b in self._pending:
+            adjacency[a].append(b)
+            adjacency[b].append(a)
+        for row in adjacency:
+            row.sort()
+            self.neighbors.extend(row)
+            self.offsets.append(len(self.neighbors))
+        self._pending = None
+        return self
+
+    @property
+    def edges(self):
+        return len(self.neighbors) // 2
+
+    def interacts(self, a, b):
+        end = self.offsets[a + 1]
+        i = bisect_left(self.neighbors, b, self.offsets[a], end)
+        return i < end and self.neighbors[i] == b
+
+    def conflicts(self, numbers):
+        """Every interacting pair among ``numbers`` (node numbers), in input order"""
+        position = {}
+        for number in numbers:
+            position.setdefault(number, len(position))
+        ordered = list(position)
+
+        pairs = []
+        for i, a in enumerate(ordered):
+            start, end = self.offsets[a], self.offsets[a + 1]
+            if end - start <= len(ordered):
+                # Few neighbours: walk them and keep the ones in the list
+                for b in self.neighbors[start:end]:
+                    j = position.get(b)
+                    if j is not None and j > i:
+                        pairs.append((i, j))
+            else:
+                # "Alcohol" and other hubs: bisect for each later medication
+                pairs.extend((i, j) for j in range(i + 1, len(ordered)) if self.interacts(a, ordered[j]))
+        pairs.sort()
+        return [(ordered[i], ordered[j]) for i, j in pairs]
+
+    def stats(self):
+        return {
+            "nodes": len(self.labels),
+            "edges": self.edges,
+            "bytes": self.offsets.itemsize * len(self.offsets) + self.neighbors.itemsize * len(self.neighbors)
+        }
@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Lower value = served first
+PRIORITY_ADMIN = 0
+PRIORITY_WHATSAPP = 1
+PRIORITY_DEFAULT = 2
+PRIORITY_BACKGROUND = 3  # housekeeping (conversation summaries); runs when users leave a slot free
+
+PRIORITY_NAMES = {
+    PRIORITY_ADMIN: "admin",
+    PRIORITY_WHATSAPP: "whatsapp",
+    PRIORITY_DEFAULT: "default",
+    PRIORITY_BACKGROUND: "background"
+}
+
+
+class QueueFullError(Exception):
+    """Raised when the wait queue is full; carries a Retry-After hint"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes while it is still queued"""
+
+
+class Ticket:
+    """A granted slot; release() is idempotent"""
+
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+        self._released = False
+        self._started = time.monotonic()
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._scheduler._release(time.monotonic() - self._started)
+
+
+class _Waiter:
+    def __init__(self):
+        self.granted = threading.Event()
+        self.cancelled = False
+
+
+class LLMScheduler:
+    """Admission control in front of Ollama.
+
+    At most ``max_concurrency`` generations run at once. Further requests
+    wait in a priority queue of at most ``max_queue`` entries (admins, then
+    WhatsApp, then everyone else, then background work, FIFO within a
+    class) until a slot frees up or their deadline passes. When the queue is full the request is refused
+    immediately with a Retry-After estimate instead of timing out later.
+    """
+
+    def __init__(self, max_concurrency=2, max_queue=50, default_timeout=30):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self._active = 0
+        self._queue = []  # heap of (priority, seq, waiter)
+        self._waiting = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=500)
+        self._service_times = deque(maxlen=100)
+        self.counters = {
+            "admitted": 0,
+            "rejected": 0,
+            "expired": 0
+        }
+        self.admitted_by_priority = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    @property
+    def queued(self):
+        """Requests waiting for a slot right now"""
+        return self._waiting
+
+    def acquire(self, priority=PRIORITY_DEFAULT, deadline=None):
+        """Block until a slot is free and return a Ticket.
+
+        ``deadline`` is a time.monotonic() value; by default the request may
+        wait ``default_timeout`` seconds. Raises QueueFullError or
+        DeadlineExceeded.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.default_timeout
+        queued_at = time.monotonic()
+
+        with self._lock:
+            if self._active < self.max_concurrency and self._waiting == 0:
+                self._active += 1
+                self._admit(priority, 0.0)
+                return Ticket(self)
+
+            if self._waiting >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise QueueFullError(self._retry_after())
+
+            waiter = _Waiter()
+            heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+            self._waiting += 1
+
+        waiter.granted.wait(max(0.0, deadline - time.monotonic()))
+
+        with self._lock:
+            if not waiter.granted.is_set():
+                waiter.cancelled = True
+                self._waiting -= 1
+                self.counters["expired"] += 1
+                raise DeadlineExceeded("Deadline passed while waiting for the AI model")
+            self._admit(priority, time.monotonic() - queued_at)
+        return Ticket(self)
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_DEFAULT, deadline=None):
+        """Context-manager form of acquire()"""
+        ticket = self.acquire(priority, deadline)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _admit(self, priority, waited):
+        # Caller holds self._lock
+        self.counters["admitted"] += 1
+        self.admitted_by_priority[PRIORITY_NAMES.get(priority, "default")] += 1
+        self._waits.append(waited)
+
+    def _release(self, service_time):
+        with self._lock:
+            self._service_times.append(service_time)
+            while self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                # Hand the slot straight to the next waiter
+                self._waiting -= 1
+                waiter.granted.set()
+                return
+            self._active -= 1
+
+    def _retry_after(self):
+        # Caller holds self._lock
+        avg_service = (sum(self._service_times) / len(self._service_times)) if self._service_times else 5.0
+        backlog = (self._waiting + self._active) / max(1, self.max_concurrency)
+        return max(1, math.ceil(avg_service * backlog))
+
+    def stats(self):
+        """Queue depth, wait times and rejections, for monitoring"""
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                **self.counters,
+                "active": self._active,
+                "queued": self._waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "admitted_by_priority": dict(self.admitted_by_priority),
+                "wait_ms_avg": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                "wait_ms_p95": round(1000 * waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0
+            }
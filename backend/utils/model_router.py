@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import deque
+
+
+class Route:
+    """Where one class of question goes: a model and a latency deadline"""
+
+    def __init__(self, name, model, deadline):
+        self.name = name
+        self.model = model
+        self.deadline = deadline
+
+    def start(self):
+        """Absolute time.monotonic() deadline for a request starting now"""
+        return time.monotonic() + self.deadline
+
+
+class ModelRouter:
+    """Pick a model and deadline per chat from its detected intent.
+
+    Explicit per-intent routes (``intent_models``) win. Otherwise short
+    ``general`` / ``medical_advice`` questions go to the fast model and
+    everything else to the main one. Latency and fallback counts are kept
+    per route so the split can be tuned.
+    """
+
+    FAST_INTENTS = ("general", "medical_advice")
+
+    def __init__(self, main_model, fast_model, main_deadline=60, fast_deadline=20,
+                 short_message_words=12, intent_models=None):
+        self.routes = {
+            "main": Route("main", main_model, main_deadline),
+            "fast": Route("fast", fast_model, fast_deadline)
+        }
+        for intent, model in (intent_models or {}).items():
+            deadline = fast_deadline if model == fast_model else main_deadline
+            self.routes[f"intent:{intent}"] = Route(f"intent:{intent}", model, deadline)
+        self.short_message_words = short_message_words
+        self._lock = threading.Lock()
+        self._stats = {
+            name: {"requests": 0, "fallbacks": 0, "latencies": deque(maxlen=500)}
+            for name in self.routes
+        }
+
+    def route(self, intent, message):
+        explicit = self.routes.get(f"intent:{intent}")
+        if explicit:
+            return explicit
+        if intent in self.FAST_INTENTS and len(message.split()) <= self.short_message_words:
+            return self.routes["fast"]
+        return self.routes["main"]
+
+    def models(self):
+        """Every distinct model a request may be routed to"""
+        return sorted({route.model for route in self.routes.values()})
+
+    def record(self, route, latency, fell_back=False):
+        with self._lock:
+            stats = self._stats[route.name]
+            stats["requests"] += 1
+            stats["latencies"].append(latency)
+            if fell_back:
+                stats["fallbacks"] += 1
+
+    def stats(self):
+        """Per-route latency and fallback rate"""
+        report = {}
+        with self._lock:
+            for name, stats in self._stats.items():
+                latencies = sorted(stats["latencies"])
+                route = self.routes[name]
+                report[name] = {
+                    "model": route.model,
+                    "deadline_seconds": route.deadline,
+                    "requests": stats["requests"],
+                    "fallbacks": stats["fallbacks"],
+                    "fallback_rate": round(stats["fallbacks"] / stats["requests"], 4) if stats["requests"] else 0.0,
+                    "latency_ms_p50": round(1000 * latencies[len(latencies) // 2], 1) if latencies else 0.0,
+                    "latency_ms_p95": round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else 0.0
+                }
+        return report
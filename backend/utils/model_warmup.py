@@ -0,0 +1,180 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+
+class ModelWarmingError(Exception):
+    """Raised when a chat arrives before any model is resident"""
+
+    def __init__(self, retry_after):
+        super().__init__("AI model is still loading")
+        self.retry_after = retry_after
+
+
+class ModelWarmer:
+    """Pull, load and keep resident every model the router can pick.
+
+    A background thread walks all Ollama hosts: it pulls models that are
+    missing (if enabled), loads them into memory and then re-pings them
+    every ``ping_interval`` seconds so Ollama's keep_alive never expires.
+    The warmer is ``ready`` once every model is resident on at least one
+    host, and drops back to ``warming`` if a model disappears everywhere.
+
+    With ``state_path``, only one worker per host pulls and pings (the
+    holder of an flock next to the file, like the catalog snapshot's).
+    It writes what is resident to the file; the other workers read their
+    readiness from it and take over the lock if the leader exits.
+    """
+
+    def __init__(self, client, models, ping_interval=240, pull_missing=True, retry_interval=5, state_path=None):
+        self.client = client
+        self.models = list(models)
+        self.ping_interval = ping_interval
+        self.pull_missing = pull_missing
+        self.retry_interval = retry_interval
+        self.state_path = state_path
+        self.leader = state_path is None
+        self._lock_file = None  # held open while this worker leads
+        self.resident = {}  # (host url, model) -> time of last successful ping
+        self.last_error = None
+        self.started_at = None
+        self.ready_at = None
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the warm-up thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="ollama-warmer", daemon=True)
+            self._thread.start()
+        print(f"⏳ Warming up Ollama models: {', '.join(self.models)}")
+
+    def _run(self):
+        while True:
+            try:
+                if self._lead():
+                    self.warm_once()
+                    if self.state_path:
+                        self._save_state()
+                else:
+                    self._load_state()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Model warm-up error: {e}")
+            leading_ready = self.leader and self._ready.is_set()
+            time.sleep(self.ping_interval if leading_ready else self.retry_interval)
+
+    def _lead(self):
+        """True if this worker pulls and pings; takes the lock when it is free"""
+        if self.leader:
+            return True
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        lock = open(f"{self.state_path}.lock", "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return False
+        self._lock_file = lock
+        self.leader = True
+        print(f"Model warm-up: this worker (pid {os.getpid()}) pulls and pings the models")
+        return True
+
+    def _save_state(self):
+        with self._lock:
+            resident = [[url, model, pinged] for (url, model), pinged in self.resident.items()]
+        tmp = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"resident": resident, "last_error": self.last_error}, f)
+        os.replace(tmp, self.state_path)
+
+    def _load_state(self):
+        """Take residency from the leader's file, ignoring pings it has not renewed"""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        oldest = time.time() - 2 * self.ping_interval
+        with self._lock:
+            self.resident = {
+                (url, model): pinged for url, model, pinged in state["resident"] if pinged >= oldest
+            }
+        self.last_error = state.get("last_error")
+        self._update_state()
+
+    def warm_once(self):
+        """One pass over every host and model; also serves as the keep-alive ping"""
+        for host in self.client.pool.hosts:
+            if not self.client.probe_host(host):
+                for model in self.models:
+                    self._mark(host, model, False)
+                continue
+
+            for model in self.models:
+                try:
+                    if not host.has_model(model) and self.pull_missing:
+                        self.client.pull_model(host, model)
+                    if self.client.load_model(host, model):
+                        self._mark(host, model, True)
+                        continue
+                except Exception as e:
+                    self.last_error = f"{host.url} {model}: {e}"
+                self._mark(host, model, False)
+
+        self._update_state()
+
+    def _mark(self, host, model, resident):
+        # stats() reads the map from request threads while this thread writes it
+        with self._lock:
+            if resident:
+                self.resident[(host.url, model)] = time.time()
+            else:
+                self.resident.pop((host.url, model), None)
+
+    def _update_state(self):
+        with self._lock:
+            resident_models = {model for (_, model) in self.resident}
+        if all(model in resident_models for model in self.models):
+            if not self._ready.is_set():
+                self.ready_at = time.time()
+                print(f"✅ Ollama models resident after {self.ready_at - self.started_at:.1f}s")
+            self._ready.set()
+        else:
+            self._ready.clear()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout):
+        return self._ready.wait(timeout)
+
+    def retry_after(self):
+        return max(1, int(self.retry_interval))
+
+    def state(self):
+        return "ready" if self.ready else "warming"
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            resident = dict(self.resident)
+        return {
+            "state": self.state(),
+            "leader": self.leader,
+            "models": {
+                model: sorted(url for (url, m) in resident if m == model)
+                for model in self.models
+            },
+            "last_ping_age_seconds": round(now - max(resident.values()), 1) if resident else None,
+            "warmup_seconds": round(self.ready_at - self.started_at, 1) if self.ready_at and self.started_at else None,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,24 @@
+import sys
+
+
+def gevent_patched():
+    """True when gevent has monkey-patched threading (gunicorn's gevent worker)"""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+def cpu_bound(fn, *args, **kwargs):
+    """Run ``fn(*args, **kwargs)`` where it cannot stall the gevent hub.
+
+    Under the gevent worker every threading.Thread is a greenlet, so seconds
+    of pure-Python work (rebuilding the drug index, hashing embeddings)
+    would freeze every request on the worker, /health included. There the
+    call runs on gevent's pool of native threads while the calling greenlet
+    yields; the GIL is still shared, but the hub gets it back every few
+    milliseconds. ``fn`` must not touch sockets or gevent-patched locks.
+    Without gevent, ``fn`` is simply called.
+    """
+    if not gevent_patched():
+        return fn(*args, **kwargs)
+    import gevent
+    return gevent.get_hub().threadpool.apply(fn, args, kwargs)
@@ -1,53 +1,629 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from config import Config
+from utils.circuit_breaker import CircuitOpenError
+from utils.ollama_pool import HostPool
+from utils.llm_scheduler import LLMScheduler, DeadlineExceeded, PRIORITY_DEFAULT
+from utils.model_warmup import ModelWarmingError
+from utils.response_cache import ResponseCache, make_cache_key
+from utils.single_flight import SingleFlight, SingleFlightError, SingleFlightTimeout, Stream
+
+_transport_lock = threading.Lock()
+_transport = {}
+_END = object()
+
+
+def get_session():
+    """Return this worker's shared keep-alive session.
+
+    Sessions are created lazily and keyed by PID so a forked gunicorn worker
+    never reuses sockets inherited from its parent. Connection errors are
+    retried for every method (the request never reached Ollama); read and
+    status retries only apply to idempotent GETs.
+    """
+    pid = os.getpid()
+    with _transport_lock:
+        if _transport.get("pid") != pid:
+            retry = Retry(
+                total=Config.OLLAMA_MAX_RETRIES,
+                connect=Config.OLLAMA_MAX_RETRIES,
+                read=Config.OLLAMA_MAX_RETRIES,
+                status=Config.OLLAMA_MAX_RETRIES,
+                allowed_methods=frozenset(["GET", "HEAD"]),
+                status_forcelist=[502, 503, 504],
+                backoff_factor=Config.OLLAMA_RETRY_BACKOFF,
+                backoff_jitter=Config.OLLAMA_RETRY_BACKOFF,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=Config.OLLAMA_POOL_SIZE,
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _transport.update(pid=pid, session=session, adapter=adapter)
+        return _transport["session"]
+
+
+def pool_stats():
+    """Connection pool usage for this worker's session"""
+    get_session()
+    pools = []
+    for key in _transport["adapter"].poolmanager.pools.keys():
+        pool = _transport["adapter"].poolmanager.pools.get(key)
+        if pool is None:
+            continue
+        pools.append({
+            "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+            "connections_opened": pool.num_connections,
+            "requests_sent": pool.num_requests,
+            "idle_connections": sum(1 for conn in pool.pool.queue if conn) if pool.pool else 0,
+            "max_size": Config.OLLAMA_POOL_SIZE
+        })
+    return pools
+
+
+def _hedge_executor():
+    """Per-worker thread pool used to race hedged requests"""
+    pid = os.getpid()
+    with _transport_lock:
+        if _transport.get("hedge_pid") != pid:
+            _transport.update(hedge_pid=pid, hedge_executor=ThreadPoolExecutor(
+                max_workers=Config.OLLAMA_POOL_SIZE, thread_name_prefix="ollama-hedge"
+            ))
+        return _transport["hedge_executor"]
+
+
+class StreamError(Exception):
+    """Raised by generate_stream() when the answer cannot be completed.
+
+    The message is user-facing; ``error`` is the same failure code
+    generate_response() reports ("timeout", "unavailable" or "upstream").
+    """
+
+    def __init__(self, message, error="upstream"):
+        super().__init__(message)
+        self.error = error
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for budgeting"""
+    return len(text) // 4 + 1
+
+
+def clip_to_tokens(text, max_tokens):
+    """``text`` cut down to roughly ``max_tokens`` (see estimate_tokens)"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(0, max_tokens - 1) * 4]
+
+
+def trim_history(history, max_tokens):
+    """Keep the most recent turns whose combined size fits ``max_tokens``.
+
+    Turns are dropped oldest-first in user/assistant pairs so the history
+    never starts with an orphaned assistant reply.
+    """
+    kept = []
+    used = 0
+    for turn in reversed(history):
+        used += estimate_tokens(turn["content"])
+        if used > max_tokens:
+            break
+        kept.append(turn)
+    kept.reverse()
+    if kept and kept[0]["role"] == "assistant":
+        kept = kept[1:]
+    return kept
 
 
 class OllamaClient:
     def __init__(self):
-        self.host = Config.OLLAMA_HOST
+        self.hosts = Config.OLLAMA_HOSTS
+        self.host = self.hosts[0]
         self.model = Config.OLLAMA_MODEL  # Respect the config/env file
-        print(f"✅ Ollama initialized: {self.host} with model {self.model}")
+        self.options = {
+            "temperature": 0.7,
+            "top_p": 0.9
+        }
+        self.timeout = (Config.OLLAMA_CONNECT_TIMEOUT, Config.OLLAMA_READ_TIMEOUT)
+        self.pool = HostPool(
+            self.hosts,
+            probe=self.probe_host,
+            failure_threshold=Config.OLLAMA_BREAKER_THRESHOLD,
+            reset_timeout=Config.OLLAMA_BREAKER_RESET,
+            probe_interval=Config.OLLAMA_PROBE_INTERVAL
+        )
+        self.hedge_after = Config.OLLAMA_HEDGE_AFTER
+        self.warmer = None  # set to a ModelWarmer to gate traffic on model residency
+        self.cache = self._build_cache()
+        self.single_flight = self._build_single_flight()
+        self.token_stats = {"requests": 0, "prompt_eval_tokens": 0, "eval_tokens": 0, "hedged": 0, "last": None}
+        self._metrics_lock = threading.Lock()
+        self.scheduler = LLMScheduler(
+            max_concurrency=Config.LLM_MAX_CONCURRENCY,
+            max_queue=Config.LLM_MAX_QUEUE,
+            default_timeout=Config.LLM_QUEUE_TIMEOUT
+        )
+        print(f"✅ Ollama initialized: {', '.join(self.hosts)} with model {self.model}")
+
+    def _build_cache(self):
+        collection = None
+        if Config.LLM_CACHE_PERSIST:
+            from models.database import db
+            collection = db.llm_cache
+        return ResponseCache(
+            max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=Config.LLM_CACHE_MAX_BYTES,
+            ttl=Config.LLM_CACHE_TTL,
+            collection=collection
+        )
+
+    def _build_single_flight(self):
+        collection = None
+        if Config.LLM_SINGLE_FLIGHT_SHARED:
+            from models.database import db
+            collection = db.llm_inflight
+        return SingleFlight(
+            lease_collection=collection,
+            lease_ttl=Config.LLM_SINGLE_FLIGHT_TIMEOUT
+        )
+
+    @contextmanager
+    def _upstream(self, method, path, host=None, **kwargs):
+        """Send a request to the least-loaded healthy host and yield the response.
+
+        The host stays counted as in-flight until the block exits, so
+        streamed responses are accounted for until they are fully read.
+        Raises CircuitOpenError without touching the network when every
+        host is ejected. Connection errors, timeouts and 5xx responses count
+        against the host and eventually eject it; read timeouts only do so
+        when the full OLLAMA_READ_TIMEOUT was allowed.
+        """
+        if host is None:
+            host = self.pool.acquire(kwargs.get("json", {}).get("model", self.model))
+        kwargs.setdefault("timeout", self.timeout)
+        error = None
+        try:
+            response = get_session().request(method, f"{host.url}{path}", **kwargs)
+            if response.status_code >= 500:
+                error = f"HTTP {response.status_code}"
+            with response:
+                yield response
+        except requests.exceptions.ReadTimeout as e:
+            # A read timeout shortened by a caller's deadline says nothing about the host
+            if kwargs["timeout"][1] >= Config.OLLAMA_READ_TIMEOUT:
+                error = e
+            raise
+        except requests.exceptions.RequestException as e:
+            error = e
+            raise
+        finally:
+            self.pool.release(host, error)
+
+    def probe_host(self, host):
+        """Refresh a host's model lists; returns True if it answered"""
+        try:
+            timeout = (Config.OLLAMA_CONNECT_TIMEOUT, 5)
+            tags = get_session().get(f"{host.url}/api/tags", timeout=timeout)
+            if tags.status_code != 200:
+                return False
+            host.available_models = {m["name"] for m in tags.json().get("models", [])}
+            loaded = get_session().get(f"{host.url}/api/ps", timeout=timeout)
+            if loaded.status_code == 200:
+                host.loaded_models = {m["name"] for m in loaded.json().get("models", [])}
+            return True
+        except Exception:
+            return False
+
+    def pull_model(self, host, model):
+        """Download ``model`` onto ``host`` (blocks until the pull finishes)"""
+        print(f"⏳ Pulling {model} on {host.url}...")
+        response = get_session().post(
+            f"{host.url}/api/pull",
+            json={"name": model, "stream": False},
+            timeout=(Config.OLLAMA_CONNECT_TIMEOUT, Config.OLLAMA_PULL_TIMEOUT)
+        )
+        return response.status_code == 200
+
+    def load_model(self, host, model):
+        """Load ``model`` into memory on ``host`` and reset its keep_alive timer.
+
+        An /api/generate call without a prompt makes Ollama load the model
+        and return without generating anything, so this doubles as the
+        periodic keep-alive ping.
+        """
+        response = get_session().post(
+            f"{host.url}/api/generate",
+            json={"model": model, "keep_alive": Config.OLLAMA_KEEP_ALIVE},
+            timeout=(Config.OLLAMA_CONNECT_TIMEOUT, Config.OLLAMA_PULL_TIMEOUT)
+        )
+        return response.status_code == 200
+
+    def build_messages(self, prompt, system_prompt="", context="", history=None):
+        """Assemble the /api/chat message list.
+
+        The system prompt and earlier turns are replayed unchanged, so the
+        prefix Ollama already holds in its KV cache matches from one turn to
+        the next and only the new user message has to be evaluated.
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.extend(history or [])
+        content = f"Context: {context}\n\nUser Query: {prompt}" if context else prompt
+        messages.append({"role": "user", "content": content})
+        return messages
+
+    def _chat_payload(self, messages, stream, model=None):
+        return {
+            "model": model or self.model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": Config.OLLAMA_KEEP_ALIVE,
+            "options": self.options
+        }
+
+    def cache_key(self, prompt, system_prompt="", context="", history=None, model=None):
+        return make_cache_key(prompt, context, system_prompt, model or self.model, self.options, history)
+
+    def lookup_cache(self, prompt, system_prompt="", context="", history=None, model=None):
+        """Return a cached answer for this request, or None"""
+        return self.cache.get(self.cache_key(prompt, system_prompt, context, history, model))
+
+    def ensure_ready(self):
+        """Hold the request briefly while models warm up, then refuse it"""
+        if self.warmer is not None and not self.warmer.wait_until_ready(Config.LLM_WARMUP_WAIT):
+            raise ModelWarmingError(self.warmer.retry_after())
+
+    def timeout_for(self, deadline):
+        """Connect/read timeout that never runs past ``deadline`` (time.monotonic())"""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        return (Config.OLLAMA_CONNECT_TIMEOUT, max(1.0, min(Config.OLLAMA_READ_TIMEOUT, remaining)))
+
+    def generate_response(self, prompt, system_prompt="", context="", history=None,
+                          priority=PRIORITY_DEFAULT, deadline=None, model=None):
+        """Generate a response, serving repeated questions from the cache.
+
+        ``history`` is a list of earlier {"role", "content"} turns, already
+        trimmed with trim_history(). Returns a dict with ``success``,
+        ``response`` (the answer or a user-facing error message), ``source``
+        ("ai" or "ai-cache") and, for fresh answers, Ollama's token
+        ``metrics``. Only successful answers are cached. Identical requests
+        that arrive while one is already running wait for that call instead
+        of starting their own. Upstream calls go through the scheduler,
+        which raises QueueFullError when the wait queue is full, and wait
+        for warm-up, raising ModelWarmingError if no model becomes resident.
 
-    def generate(self, prompt, system_prompt="", context=""):
+        ``model`` overrides the default model and ``deadline`` (a
+        time.monotonic() value) bounds queueing plus generation; failures
+        carry an ``error`` code ("timeout", "busy", "unavailable" or
+        "upstream") so callers can degrade gracefully.
+        """
+        key = self.cache_key(prompt, system_prompt, context, history, model)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return {"success": True, "response": cached, "source": "ai-cache"}
+
+        self.ensure_ready()
+
+        def compute():
+            try:
+                with self.scheduler.slot(priority, deadline):
+                    result = self._generate(self.build_messages(prompt, system_prompt, context, history), model, deadline)
+            except DeadlineExceeded:
+                return self._failure("⚠️ The AI assistant is busy right now. Please try again in a moment.", "busy")
+            if result["success"]:
+                self.cache.set(key, result["response"])
+            return result
+
+        wait_timeout = Config.LLM_SINGLE_FLIGHT_TIMEOUT
+        if deadline is not None:
+            wait_timeout = max(0.0, min(wait_timeout, deadline - time.monotonic()))
+        try:
+            return self.single_flight.do(key, compute, timeout=wait_timeout)
+        except SingleFlightTimeout:
+            return self._failure("⚠️ Request timed out. The AI model is taking longer than expected. Please try again.", "timeout")
+        except StreamError as e:
+            # Shared with a streamed request that failed
+            return self._failure(str(e), e.error)
+        except SingleFlightError as e:
+            return self._failure(f"⚠️ Error: {str(e)}", "upstream")
+
+    def stream_response(self, prompt, system_prompt="", context="", history=None,
+                        priority=PRIORITY_DEFAULT, deadline=None, model=None):
+        """Streaming form of generate_response(); returns a Stream of text chunks.
+
+        Identical requests in flight, streamed or not, share one upstream
+        call: a follower replays the chunks produced so far, then follows
+        live. The leader takes its scheduler slot before this returns, so
+        QueueFullError, DeadlineExceeded and ModelWarmingError reach the
+        caller while it can still answer with a status code; close() gives
+        the slot back even if the stream was never read. Once exhausted,
+        the Stream's ``result`` is what generate_response() would have
+        returned (a copy for followers). Failures raise StreamError; one
+        with error "timeout" once ``deadline`` passes mid-answer.
+        """
+        key = self.cache_key(prompt, system_prompt, context, history, model)
+        self.ensure_ready()
+
+        def start():
+            ticket = self.scheduler.acquire(priority, deadline)
+            return Stream(self._stream_answer(prompt, system_prompt, context, history, model, deadline),
+                          on_close=ticket.release)
+
+        wait_timeout = Config.LLM_SINGLE_FLIGHT_TIMEOUT
+        if deadline is not None:
+            wait_timeout = max(0.0, min(wait_timeout, deadline - time.monotonic()))
+        shared = self.single_flight.stream(key, start, wait_timeout)
+        return Stream(self._relay(shared), on_close=shared.close)
+
+    def _stream_answer(self, prompt, system_prompt, context, history, model, deadline):
+        """generate_stream() with a generate_response()-style result as its return value"""
+        metrics = {}
+        chunks = []
+        stream = self.generate_stream(prompt, system_prompt, context, history, on_done=metrics.update,
+                                      model=model, deadline=deadline)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            # Runs on client disconnect too, cancelling the upstream call
+            stream.close()
+        return {"success": True, "response": "".join(chunks), "source": "ai", "metrics": metrics}
+
+    def _relay(self, shared):
+        """A shared stream's chunks, with its failures as StreamError"""
+        streamed = False
+        try:
+            for chunk in shared:
+                streamed = True
+                yield chunk
+        except SingleFlightTimeout:
+            raise StreamError("⚠️ Request timed out. The AI model is taking longer than expected. Please try again.", "timeout")
+        except SingleFlightError as e:
+            raise StreamError(f"⚠️ Error: {str(e)}")
+        result = shared.result
+        if not result["success"]:
+            raise StreamError(result["response"], result.get("error", "upstream"))
+        if not streamed:
+            # Joined a non-streamed request: its answer arrives in one piece
+            yield result["response"]
+        return result
+
+    def generate(self, prompt, system_prompt="", context="", history=None):
         """Generate response using Ollama"""
+        return self.generate_response(prompt, system_prompt, context, history)["response"]
+
+    def _generate(self, messages, model=None, deadline=None):
+        """Call /api/chat, mapping failures to user-facing messages.
+
+        With OLLAMA_HEDGE_AFTER set and more than one host configured, a
+        request still unanswered after that many seconds is duplicated on a
+        second host and whichever answers first wins.
+        """
         try:
-            full_prompt = f"{system_prompt}\n\nContext: {context}\n\nUser Query: {prompt}\n\nAssistant:"
-            print("DEBUG OLLAMA REQUEST:")
-            print(f"  URL: {self.host}/api/generate")
-            print(f"  Model being sent: {self.model}")
-            print(f"  Prompt starts with: {full_prompt[:150]}...")
-            response = requests.post(
-                f"{self.host}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": full_prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "top_p": 0.9
-                    }
-                },
-                timeout=60
-            )
+            payload = self._chat_payload(messages, stream=False, model=model)
+            timeout = self.timeout_for(deadline)
+            if self.hedge_after > 0 and len(self.hosts) > 1:
+                status_code, body = self._post_hedged(payload, timeout)
+            else:
+                status_code, body = self._post_chat(payload, timeout=timeout)
             
-            if response.status_code == 200:
-                result = response.json().get("response", "")
-                return result if result else "I apologize, but I couldn't generate a response."
+            if status_code == 200:
+                result = body.get("message", {}).get("content", "")
+                metrics = self._record_metrics(body)
+                if result:
+                    return {"success": True, "response": result, "source": "ai", "metrics": metrics}
+                return self._failure("I apologize, but I couldn't generate a response.", "upstream")
             else:
-                return f"⚠️ Error: Unable to generate response (Status: {response.status_code})"
+                return self._failure(f"⚠️ Error: Unable to generate response (Status: {status_code})", "upstream")
                 
         except requests.exceptions.Timeout:
-            return "⚠️ Request timed out. The AI model is taking longer than expected. Please try again."
-        except requests.exceptions.ConnectionError:
-            return "⚠️ Cannot connect to Ollama. Please ensure the service is running."
+            return self._failure("⚠️ Request timed out. The AI model is taking longer than expected. Please try again.", "timeout")
+        except (requests.exceptions.ConnectionError, CircuitOpenError):
+            return self._failure("⚠️ Cannot connect to Ollama. Please ensure the service is running.", "unavailable")
         except Exception as e:
-            return f"⚠️ Error: {str(e)}"
+            return self._failure(f"⚠️ Error: {str(e)}", "upstream")
 
-    def check_health(self):
-        """Check if Ollama is accessible"""
+    def _post_chat(self, payload, host=None, timeout=None):
+        """POST /api/chat; without a fixed host, fail over when a host can't be reached"""
+        tried = []
+        while True:
+            target = host or self.pool.acquire(payload["model"], exclude=tried)
+            try:
+                with self._upstream("POST", "/api/chat", host=target, json=payload,
+                                    timeout=timeout or self.timeout) as response:
+                    body = response.json() if response.status_code == 200 else None
+                    return response.status_code, body
+            except requests.exceptions.ConnectionError:
+                tried.append(target)
+                if host is not None or len(tried) >= len(self.pool.hosts):
+                    raise
+
+    def _post_hedged(self, payload, timeout=None):
+        """Race a primary request against a delayed backup on another host"""
+        primary = self.pool.acquire(payload["model"])
+        futures = [_hedge_executor().submit(self._post_chat, payload, primary, timeout)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            try:
+                backup = self.pool.acquire(payload["model"], exclude=[primary])
+                futures.append(_hedge_executor().submit(self._post_chat, payload, backup, timeout))
+                with self._metrics_lock:
+                    self.token_stats["hedged"] += 1
+            except CircuitOpenError:
+                pass
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    status_code, body = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if status_code == 200 or not pending:
+                    # The losing request finishes in the background and releases its host
+                    return status_code, body
+        raise error
+
+    def _failure(self, message, error="upstream"):
+        return {"success": False, "response": message, "source": "ai", "error": error}
+
+    def _record_metrics(self, body):
+        """Pull token counts out of a final Ollama response and tally them.
+
+        ``prompt_eval_count`` only counts prompt tokens Ollama actually had
+        to evaluate, so it drops when the KV cache prefix is reused.
+        """
+        metrics = {
+            "prompt_eval_count": body.get("prompt_eval_count", 0),
+            "eval_count": body.get("eval_count", 0),
+            "prompt_eval_ms": round(body.get("prompt_eval_duration", 0) / 1e6, 1),
+            "total_ms": round(body.get("total_duration", 0) / 1e6, 1)
+        }
+        with self._metrics_lock:
+            self.token_stats["requests"] += 1
+            self.token_stats["prompt_eval_tokens"] += metrics["prompt_eval_count"]
+            self.token_stats["eval_tokens"] += metrics["eval_count"]
+            self.token_stats["last"] = metrics
+        return metrics
+
+    def generate_stream(self, prompt, system_prompt="", context="", history=None, on_done=None,
+                        model=None, deadline=None):
+        """Stream a response from Ollama, yielding text chunks as they arrive.
+
+        Closing the generator (e.g. when the HTTP client disconnects) closes
+        the upstream connection, which makes Ollama abort the generation.
+        Failures raise StreamError with the messages generate() returns, so
+        an error is never mistaken for part of the answer. ``on_done`` is
+        called with the token metrics once the answer is complete. Reading
+        stops at ``deadline`` (time.monotonic()) with a "timeout" error,
+        however the chunks are spaced.
+        """
+        messages = self.build_messages(prompt, system_prompt, context, history)
+        chunks = []
         try:
-            response = requests.get(f"{self.host}/api/tags", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
-        
\ No newline at end of file
+            with self._upstream(
+                "POST",
+                "/api/chat",
+                json=self._chat_payload(messages, stream=True, model=model),
+                stream=True,
+                timeout=self.timeout_for(deadline)
+            ) as response:
+
+                if response.status_code != 200:
+                    raise StreamError(f"⚠️ Error: Unable to generate response (Status: {response.status_code})")
+
+                lines = response.iter_lines() if deadline is None else self._lines_until(response, deadline)
+                for line in lines:
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise StreamError(f"⚠️ Error: {chunk['error']}")
+                    content = chunk.get("message", {}).get("content", "")
+                    if content:
+                        chunks.append(content)
+                        yield content
+                    if chunk.get("done"):
+                        metrics = self._record_metrics(chunk)
+                        if chunks:
+                            self.cache.set(self.cache_key(prompt, system_prompt, context, history, model), "".join(chunks))
+                        if on_done:
+                            on_done(metrics)
+                        return
+                raise StreamError("⚠️ Error: The AI model stopped before finishing its answer.")
+
+        except StreamError:
+            raise
+        except requests.exceptions.Timeout:
+            raise StreamError("⚠️ Request timed out. The AI model is taking longer than expected. Please try again.", "timeout")
+        except (requests.exceptions.ConnectionError, CircuitOpenError):
+            raise StreamError("⚠️ Cannot connect to Ollama. Please ensure the service is running.", "unavailable")
+        except Exception as e:
+            raise StreamError(f"⚠️ Error: {str(e)}")
+
+    def _lines_until(self, response, deadline):
+        """``response.iter_lines()``, raising ReadTimeout once ``deadline`` passes.
+
+        A socket read timeout only bounds the gap between two chunks, so the
+        lines are read on a helper thread and handed over through a queue
+        that is waited on for the time left. Leaving early shuts the socket
+        down, which wakes the helper (closing the response would wait for
+        its read) and makes Ollama stop generating.
+        """
+        lines = queue.Queue()
+
+        def read():
+            try:
+                for line in response.iter_lines():
+                    lines.put(line)
+            except Exception as e:
+                lines.put(e)  # including the read failing once the socket is shut down
+            lines.put(_END)
+
+        threading.Thread(target=read, name="ollama-stream", daemon=True).start()
+        finished = False
+        try:
+            while True:
+                try:
+                    line = lines.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise requests.exceptions.ReadTimeout("Deadline passed while streaming the answer")
+                if line is _END:
+                    finished = True
+                    return
+                if isinstance(line, Exception):
+                    finished = True
+                    raise line
+                yield line
+        finally:
+            if not finished:
+                sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+                if sock is not None:
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+    def check_health(self):
+        """Check if any Ollama host is accessible"""
+        return any(self.probe_host(host) for host in self.pool.hosts)
+
+    def token_stats_snapshot(self):
+        with self._metrics_lock:
+            requests_seen = self.token_stats["requests"]
+            return {
+                **self.token_stats,
+                "avg_prompt_eval_tokens": round(self.token_stats["prompt_eval_tokens"] / requests_seen, 1) if requests_seen else 0.0
+            }
+
+    def stats(self):
+        """Transport and breaker state for monitoring"""
+        return {
+            "model": self.model,
+            "hosts": self.pool.stats(),
+            "response_cache": self.cache.stats(),
+            "single_flight": self.single_flight.stats(),
+            "scheduler": self.scheduler.stats(),
+            "tokens": self.token_stats_snapshot(),
+            "pool": pool_stats()
+        }
@@ -0,0 +1,124 @@
+import threading
+import time
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def model_tag(name):
+    """Canonical model name; Ollama treats llama3.2 as llama3.2:latest"""
+    return name if ":" in name else f"{name}:latest"
+
+
+class OllamaHost:
+    """One Ollama server and what we know about it"""
+
+    def __init__(self, url, failure_threshold, reset_timeout):
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.available_models = None  # from /api/tags; None = not probed yet
+        self.loaded_models = set()     # from /api/ps
+        self.last_error = None
+        # An open breaker means the host is ejected from rotation
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+
+    def has_model(self, model):
+        if self.available_models is None:
+            return True
+        return model_tag(model) in {model_tag(name) for name in self.available_models}
+
+    def has_loaded(self, model):
+        return model_tag(model) in {model_tag(name) for name in self.loaded_models}
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejected": self.breaker.state == CircuitBreaker.OPEN,
+            "breaker": self.breaker.stats(),
+            "available_models": sorted(self.available_models) if self.available_models is not None else None,
+            "loaded_models": sorted(self.loaded_models),
+            "last_error": self.last_error
+        }
+
+
+class HostPool:
+    """Least-outstanding-requests balancing over several Ollama hosts.
+
+    Each generation goes to the healthy host with the fewest in-flight
+    requests, preferring hosts that already have the model loaded in memory
+    (per /api/ps) over ones that merely have it on disk (per /api/tags).
+    Hosts that error or time out are ejected once their breaker opens, and
+    a background prober reinstates them as soon as /api/tags answers again.
+    """
+
+    def __init__(self, urls, probe, failure_threshold=5, reset_timeout=30, probe_interval=10):
+        self.hosts = [OllamaHost(url, failure_threshold, reset_timeout) for url in urls]
+        self.probe = probe  # callable(host) -> bool, refreshes host model lists
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._prober = None
+
+    def acquire(self, model=None, exclude=()):
+        """Reserve the best host for ``model``; raises CircuitOpenError if none is usable"""
+        self._ensure_prober()
+        with self._lock:
+            candidates = [
+                h for h in self.hosts
+                if h not in exclude and h.breaker.state == CircuitBreaker.CLOSED and (model is None or h.has_model(model))
+            ]
+            if model is not None:
+                loaded = [h for h in candidates if h.has_loaded(model)]
+                candidates = loaded or candidates
+
+            if candidates:
+                host = min(candidates, key=lambda h: h.in_flight)
+            else:
+                # Every host is ejected: let one through as a half-open trial, or fail fast
+                host = next((h for h in self.hosts if h not in exclude and h.breaker.allow_request()), None)
+                if host is None:
+                    raise CircuitOpenError("No Ollama host available")
+
+            host.in_flight += 1
+            host.requests += 1
+            return host
+
+    def release(self, host, error=None):
+        """Return a host after a request; ``error`` marks it as failed"""
+        with self._lock:
+            host.in_flight -= 1
+            if error is not None:
+                host.failures += 1
+                host.last_error = str(error)[:200]
+        if error is not None:
+            host.breaker.record_failure()
+        else:
+            host.breaker.record_success()
+
+    def probe_all(self):
+        """Probe every host once, reinstating ejected ones that answer"""
+        for host in self.hosts:
+            if self.probe(host) and host.breaker.state != CircuitBreaker.CLOSED:
+                print(f"✅ Ollama host {host.url} reinstated")
+                host.breaker.record_success()
+
+    def _ensure_prober(self):
+        if self._prober is not None or self.probe_interval <= 0:
+            return
+        with self._lock:
+            if self._prober is None:
+                self._prober = threading.Thread(target=self._probe_loop, name="ollama-prober", daemon=True)
+                self._prober.start()
+
+    def _probe_loop(self):
+        while True:
+            try:
+                self.probe_all()
+            except Exception as e:
+                print(f"Ollama probe error: {e}")
+            time.sleep(self.probe_interval)
+
+    def stats(self):
+        return [h.stats() for h in self.hosts]
@@ -0,0 +1,27 @@
+import os
+
+
+def _proc_bytes(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_memory():
+    """Resident memory of this process in bytes (Linux; None elsewhere).
+
+    ``rss`` counts every resident page, including pages shared with other
+    workers (a memory-mapped catalog snapshot); ``pss`` divides shared
+    pages by the number of processes mapping them, so summing it over the
+    workers gives their real total.
+    """
+    return {
+        "pid": os.getpid(),
+        "rss": _proc_bytes("/proc/self/status", "VmRSS"),
+        "pss": _proc_bytes("/proc/self/smaps_rollup", "Pss")
+    }
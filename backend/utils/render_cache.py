@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from utils.drug_index import drug_key, drug_revision
+
+
+class RenderCache:
+    """Rendered drug answers (chat markdown, API JSON) keyed by drug revision.
+
+    Each entry belongs to one drug and one output kind and remembers the
+    revision it was rendered from, so a drug that was saved again misses
+    and is re-rendered on its next request, and ``retain()`` drops entries
+    for drugs that changed or were deleted as soon as the catalog reloads.
+    Entries are evicted least-recently-used once ``max_bytes`` is reached.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.renderers = {}            # kind -> render(drug)
+        self._entries = OrderedDict()  # (kind, drug id) -> (revision, rendered, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidated": 0, "prerendered": 0}
+
+    def register(self, kind, render):
+        """Add an output kind; ``render(drug)`` returns str or bytes"""
+        self.renderers[kind] = render
+
+    def get(self, kind, drug):
+        """``drug`` rendered as ``kind``, from cache when its revision matches"""
+        key, revision = (kind, drug_key(drug)), drug_revision(drug)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and revision is not None and entry[0] == revision:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[1]
+            self.counters["stale" if entry is not None else "misses"] += 1
+
+        rendered = self.renderers[kind](drug)
+        if revision is not None:
+            self._store(key, revision, rendered)
+        return rendered
+
+    def _store(self, key, revision, rendered):
+        size = len(rendered.encode("utf-8")) if isinstance(rendered, str) else len(rendered)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (revision, rendered, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.counters["evictions"] += 1
+
+    def retain(self, drugs):
+        """Drop entries whose drug is gone or has a new revision; ``drugs`` is {id: document}"""
+        with self._lock:
+            for key, (revision, _, size) in list(self._entries.items()):
+                drug = drugs.get(key[1])
+                if drug is None or drug_revision(drug) != revision:
+                    del self._entries[key]
+                    self._bytes -= size
+                    self.counters["invalidated"] += 1
+
+    def prerender(self, drugs):
+        """Render every kind for every drug, stopping when the cache is full"""
+        for drug in drugs:
+            revision = drug_revision(drug)
+            if revision is None:
+                continue
+            for kind, render in self.renderers.items():
+                if self._bytes >= self.max_bytes:
+                    return self.counters["prerendered"]
+                self._store((kind, drug_key(drug)), revision, render(drug))
+                self.counters["prerendered"] += 1
+        return self.counters["prerendered"]
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["stale"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None
+        }
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+def normalize_message(message):
+    """Lower-case, collapse whitespace and drop trailing punctuation"""
+    message = re.sub(r"\s+", " ", message.lower()).strip()
+    return message.rstrip("?!. ")
+
+
+def make_cache_key(prompt, context, system_prompt, model, options, history=None):
+    """Build the cache key for one generation request.
+
+    Two requests share a key only when the normalized user message, the
+    assembled context, the system prompt, the model, the sampling options
+    and any earlier conversation turns are all identical.
+    """
+    system_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    material = json.dumps(
+        [normalize_message(prompt), context, system_hash, model, options, history or []],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache for LLM answers, bounded by entry count and bytes.
+
+    When a Mongo ``collection`` is given, stored answers are also written
+    there so every gunicorn worker can reuse them; local misses fall back to
+    the shared collection before counting as a miss.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=16 * 1024 * 1024, ttl=6 * 3600, collection=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.collection = collection
+        self._entries = OrderedDict()  # key -> (response, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._index_ready = False
+        self.counters = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0
+        }
+
+    def get(self, key):
+        """Return the cached answer for ``key`` or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry[0]
+                self._remove(key)
+                self.counters["expired"] += 1
+
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+            except Exception as e:
+                print(f"Response cache lookup error: {e}")
+                doc = None
+            if doc:
+                remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+                self._store_local(key, doc["response"], now + remaining)
+                with self._lock:
+                    self.counters["shared_hits"] += 1
+                return doc["response"]
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def set(self, key, response):
+        """Cache a successful answer locally and, if enabled, in Mongo"""
+        self._store_local(key, response, time.time() + self.ttl)
+        with self._lock:
+            self.counters["stores"] += 1
+
+        if self.collection is not None:
+            try:
+                self._ensure_index()
+                self.collection.replace_one(
+                    {"_id": key},
+                    {"response": response, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"Response cache persist error: {e}")
+
+    def _store_local(self, key, response, expires_at):
+        size = len(key) + len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (response, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.counters["evictions"] += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _ensure_index(self):
+        if not self._index_ready:
+            # Let Mongo drop expired answers on its own
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current size, for tuning"""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["shared_hits"] + self.counters["misses"]
+            hits = self.counters["hits"] + self.counters["shared_hits"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "shared": self.collection is not None
+            }
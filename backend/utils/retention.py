@@ -0,0 +1,234 @@
+"""Retention tiers for chats and logs: hot in MongoDB, cold in gzipped JSONL.
+
+    python -m utils.retention archive                 # archive everything past its hot window
+    python -m utils.retention ttl                     # (re)apply the TTL indexes
+    python -m utils.retention rehydrate chats --from 2024-01-01 --to 2024-01-31
+    python -m utils.retention rehydrate login_logs --from 2024-03-01 --stdout
+
+Each collection keeps RETENTION_<NAME>_DAYS of records (0 keeps them
+forever). The archiver streams older records out in batches, appends them
+to ``<archive dir>/<collection>/<YYYY>/<MM>/<collection>-<YYYY-MM-DD>.jsonl.gz``
+(one file per day of the record's timestamp, Extended JSON so ObjectIds
+and dates survive) and only then deletes that batch. A TTL index a grace
+period past the hot window is the backstop if the archiver stops running.
+
+Archiving is at-least-once: a crash between a write and its delete leaves
+those records in both places, and rehydration skips the duplicates.
+Rehydrated records go to ``archive_<collection>`` by default, which has no
+TTL index, so they are not expired again straight away.
+"""
+import argparse
+import fcntl
+import glob
+import gzip
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from bson import json_util
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+from config import Config
+from models.database import db
+
+TTL_INDEX = "timestamp_ttl"
+
+
+def hot_windows():
+    """{collection: days kept in MongoDB}; 0 keeps a collection forever"""
+    return {
+        "chats": Config.RETENTION_CHATS_DAYS,
+        "whatsapp_logs": Config.RETENTION_WHATSAPP_LOGS_DAYS,
+        "login_logs": Config.RETENTION_LOGIN_LOGS_DAYS,
+    }
+
+
+def ensure_ttl_indexes():
+    """Create, update (collMod) or drop each collection's TTL index to match its window"""
+    for name, days in hot_windows().items():
+        existing = db[name].index_information().get(TTL_INDEX)
+        if not days:
+            if existing:
+                db[name].drop_index(TTL_INDEX)
+            continue
+        seconds = (days + Config.RETENTION_TTL_GRACE_DAYS) * 86400
+        if existing is None:
+            db[name].create_index([("timestamp", ASCENDING)], name=TTL_INDEX, expireAfterSeconds=seconds)
+        elif existing.get("expireAfterSeconds") != seconds:
+            db.command("collMod", name, index={"name": TTL_INDEX, "expireAfterSeconds": seconds})
+
+
+def partition_path(directory, name, day):
+    return os.path.join(directory, name, f"{day:%Y}", f"{day:%m}", f"{name}-{day:%Y-%m-%d}.jsonl.gz")
+
+
+def append_partition(path, documents):
+    """Append one gzip member of JSON lines to ``path`` and fsync it"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for document in documents:
+                f.write(json_util.dumps(document).encode() + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_collection(name, days, directory, batch_size=1000, now=None):
+    """Move records older than ``days`` to the archive; returns how many moved"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    moved = 0
+    while True:
+        batch = list(db[name].find({"timestamp": {"$lt": cutoff}}).sort("timestamp", ASCENDING).limit(batch_size))
+        if not batch:
+            return moved
+        by_day = {}
+        for document in batch:
+            by_day.setdefault(document["timestamp"].date(), []).append(document)
+        for day, documents in by_day.items():
+            append_partition(partition_path(directory, name, day), documents)
+        db[name].delete_many({"_id": {"$in": [document["_id"] for document in batch]}})
+        moved += len(batch)
+
+
+def archive_all(directory=None, batch_size=None):
+    """Run the archiver over every collection with a hot window; {collection: moved}"""
+    directory = directory or Config.RETENTION_ARCHIVE_DIR
+    return {
+        name: archive_collection(name, days, directory, batch_size or Config.RETENTION_BATCH_SIZE)
+        for name, days in hot_windows().items() if days
+    }
+
+
+def archived_partitions(name, start, end, directory=None):
+    """Archive files of ``name`` whose day falls in [start, end], oldest first"""
+    directory = directory or Config.RETENTION_ARCHIVE_DIR
+    paths = []
+    for path in sorted(glob.glob(os.path.join(directory, name, "*", "*", f"{name}-*.jsonl.gz"))):
+        day = date.fromisoformat(os.path.basename(path)[len(name) + 1:-len(".jsonl.gz")])
+        if (start is None or day >= start) and (end is None or day <= end):
+            paths.append(path)
+    return paths
+
+
+def read_partition(path):
+    """Yield the archived documents in one file"""
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            if line.strip():
+                yield json_util.loads(line)
+
+
+def rehydrate(name, start=None, end=None, target=None, directory=None, batch_size=1000):
+    """Load archived records of ``name`` back into ``target``; returns how many were inserted"""
+    collection = db[target or f"archive_{name}"]
+    inserted = 0
+
+    def flush(batch):
+        try:
+            return len(collection.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Already rehydrated, or archived twice by an interrupted run
+            return e.details["nInserted"]
+
+    batch = []
+    for path in archived_partitions(name, start, end, directory):
+        for document in read_partition(path):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                inserted += flush(batch)
+                batch = []
+    if batch:
+        inserted += flush(batch)
+    return inserted
+
+
+class RetentionJob:
+    """Background archiver: runs archive_all() every ``interval`` seconds.
+
+    Workers share the archive directory, so an flock on it makes sure only
+    one of them archives at a time; the others skip that round.
+    """
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self.runs = 0
+        self.archived = {}
+        self.last_run = None
+        self.last_error = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Retention archiver error: {e}")
+            time.sleep(self.interval)
+
+    def run_once(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            moved = archive_all(self.directory)
+        self.runs += 1
+        self.last_run = datetime.utcnow().isoformat()
+        for name, count in moved.items():
+            self.archived[name] = self.archived.get(name, 0) + count
+        if any(moved.values()):
+            print(f"✅ Archived {', '.join(f'{count} {name}' for name, count in moved.items() if count)}")
+        return moved
+
+    def stats(self):
+        return {
+            "hot_days": hot_windows(),
+            "runs": self.runs,
+            "archived": self.archived,
+            "last_run": self.last_run,
+            "last_error": self.last_error
+        }
+
+
+retention_job = RetentionJob(Config.RETENTION_ARCHIVE_DIR, Config.RETENTION_ARCHIVE_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive, expire and rehydrate chats and logs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("archive", help="move records past their hot window to the archive")
+    commands.add_parser("ttl", help="apply the TTL indexes for the configured windows")
+    restore = commands.add_parser("rehydrate", help="load archived records back for an audit")
+    restore.add_argument("collection", choices=sorted(hot_windows()))
+    restore.add_argument("--from", dest="start", type=date.fromisoformat, help="first day (YYYY-MM-DD)")
+    restore.add_argument("--to", dest="end", type=date.fromisoformat, help="last day (YYYY-MM-DD)")
+    restore.add_argument("--into", help="target collection (default archive_<collection>)")
+    restore.add_argument("--stdout", action="store_true", help="print the records as JSON lines instead")
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        moved = archive_all()
+        print(f"✅ Archived {moved}")
+    elif args.command == "ttl":
+        ensure_ttl_indexes()
+        print(f"✅ TTL indexes match the hot windows {hot_windows()}")
+    elif args.stdout:
+        for path in archived_partitions(args.collection, args.start, args.end):
+            for document in read_partition(path):
+                sys.stdout.write(json_util.dumps(document) + "\n")
+    else:
+        count = rehydrate(args.collection, args.start, args.end, args.into)
+        print(f"✅ Rehydrated {count} {args.collection} records into {args.into or 'archive_' + args.collection}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+import copy
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+
+
+class SingleFlightTimeout(Exception):
+    """Raised to a follower whose leader did not finish in time"""
+
+
+class SingleFlightError(Exception):
+    """Raised to a follower when the shared call failed"""
+
+
+_LAPSED = object()
+
+
+class Stream:
+    """An iterator over a generator, plus cleanup that close() always runs.
+
+    The generator's return value is kept in ``result`` once it is
+    exhausted. A generator's own ``finally`` only runs if it was started,
+    which is not enough when the cleanup gives back something taken up
+    front (a scheduler slot, a single-flight call).
+    """
+
+    def __init__(self, chunks, on_close=None):
+        self._chunks = chunks
+        self._on_close = on_close
+        self.result = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration as stop:
+            self.result = stop.value
+            raise
+
+    def close(self):
+        try:
+            self._chunks.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self.chunks = []  # produced so far, for stream() followers
+        self.progress = threading.Condition()
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    Within a worker, the first caller for a key (the leader) runs the
+    function while later callers wait for its result or exception. When a
+    Mongo ``lease_collection`` is given, leaders in different gunicorn
+    workers also coordinate: one takes a lease document for the key and
+    publishes its result there, and the others poll the lease instead of
+    calling Ollama themselves. Results must therefore be BSON-serializable.
+    Followers get a copy of the leader's result, so they can annotate it.
+
+    stream() is the same for a generator: followers replay the chunks the
+    leader has produced so far and then follow it live. do() and stream()
+    callers of one key share a single call either way.
+    """
+
+    def __init__(self, lease_collection=None, lease_ttl=120, poll_interval=0.25):
+        self.lease_collection = lease_collection
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._index_ready = False
+        self.counters = {
+            "leaders": 0,
+            "followers": 0,
+            "remote_followers": 0,
+            "timeouts": 0,
+            "failures": 0
+        }
+
+    def _join(self, key):
+        """``(call, leader)``: the in-flight call for ``key``, started if there is none"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.counters["leaders"] += 1
+                return call, True
+            call.followers += 1
+            self.counters["followers"] += 1
+            return call, False
+
+    def _finish(self, key, call, result=None, error=None):
+        """Hand the outcome to the followers and retire the call (once)"""
+        with self._lock:
+            if call.done.is_set():
+                return
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            if error is not None:
+                self.counters["failures"] += 1
+        with call.progress:
+            call.result = result
+            call.error = error
+            call.done.set()
+            call.progress.notify_all()
+
+    def do(self, key, fn, timeout):
+        """Run ``fn()`` once for all concurrent callers of ``key``"""
+        call, leader = self._join(key)
+
+        if not leader:
+            if not call.done.wait(timeout):
+                self._count("timeouts")
+                raise SingleFlightTimeout(f"Timed out waiting for in-flight request {key[:12]}")
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        result = error = None
+        try:
+            result = self._run_leader(key, fn, timeout)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, call, result, error)
+
+    def stream(self, key, fn, timeout):
+        """Share one streamed call among all concurrent callers of ``key``.
+
+        ``fn()`` runs in the leader only, before this returns (so its
+        exceptions reach the caller directly), and returns an iterator of
+        chunks whose return value is the call's result. Returns a Stream;
+        its ``result`` is that result (a copy for followers). A follower of
+        a do() leader gets no chunks, only the result. If the leader's
+        Stream is closed early, its followers fail with SingleFlightError.
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return Stream(self._follow(key, call, timeout))
+
+        leased = self._acquire_lease(key) if self.lease_collection is not None else None
+        if leased is False:
+            return Stream(self._lead_remote(key, call, fn, timeout),
+                          on_close=lambda: self._abandon(key, call))
+        try:
+            upstream = fn()
+        except Exception as e:
+            self._settle(key, call, leased, error=e)
+            raise
+        return Stream(self._lead(key, call, upstream, leased),
+                      on_close=lambda: self._abandon(key, call, upstream, leased))
+
+    def _lead(self, key, call, upstream, leased):
+        """Yield the leader's chunks, recording them for followers"""
+        result = error = None
+        try:
+            while True:
+                try:
+                    chunk = next(upstream)
+                except StopIteration as stop:
+                    result = stop.value
+                    return result
+                with call.progress:
+                    call.chunks.append(chunk)
+                    call.progress.notify_all()
+                yield chunk
+        except GeneratorExit:
+            error = SingleFlightError("The shared request was cancelled")
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            upstream.close()
+            self._settle(key, call, leased, result, error)
+
+    def _lead_remote(self, key, call, fn, timeout):
+        """Wait for another worker's leader; stream it here if its lease lapses"""
+        try:
+            outcome = self._poll_remote(key, timeout)
+        except Exception as e:
+            self._finish(key, call, error=e)
+            raise
+        if outcome is not _LAPSED:
+            self._finish(key, call, outcome)
+            return outcome
+        try:
+            upstream = fn()
+        except Exception as e:
+            self._finish(key, call, error=e)
+            raise
+        return (yield from self._lead(key, call, upstream, None))
+
+    def _follow(self, key, call, timeout):
+        """Replay the leader's chunks, then follow it until it finishes"""
+        deadline = time.monotonic() + timeout
+        sent = 0
+        while True:
+            with call.progress:
+                while len(call.chunks) == sent and not call.done.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._count("timeouts")
+                        raise SingleFlightTimeout(f"Timed out waiting for in-flight request {key[:12]}")
+                    call.progress.wait(remaining)
+                fresh = call.chunks[sent:]
+                finished = call.done.is_set()
+            for chunk in fresh:
+                yield chunk
+            sent += len(fresh)
+            if finished and sent == len(call.chunks):
+                break
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def _settle(self, key, call, leased, result=None, error=None):
+        if leased:
+            if error is None:
+                self._publish(key, {"state": "done", "result": result})
+            else:
+                self._publish(key, {"state": "failed", "error": str(error)})
+        self._finish(key, call, result, error)
+
+    def _abandon(self, key, call, upstream=None, leased=None):
+        """The leader's Stream was closed; release everything it holds"""
+        if upstream is not None:
+            upstream.close()
+        error = SingleFlightError("The shared request was cancelled")
+        if leased and not call.done.is_set():
+            # Closed before it was iterated: _lead never settled, so tell
+            # other workers polling the lease instead of leaving them to time out
+            self._publish(key, {"state": "failed", "error": str(error)})
+        self._finish(key, call, error=error)
+
+    def _run_leader(self, key, fn, timeout):
+        if self.lease_collection is None:
+            return fn()
+
+        acquired = self._acquire_lease(key)
+        if acquired is None:
+            return fn()
+        if not acquired:
+            return self._wait_for_remote(key, fn, timeout)
+
+        try:
+            result = fn()
+        except Exception as e:
+            self._publish(key, {"state": "failed", "error": str(e)})
+            raise
+        self._publish(key, {"state": "done", "result": result})
+        return result
+
+    def _acquire_lease(self, key):
+        try:
+            self._ensure_index()
+            self.lease_collection.insert_one({
+                "_id": key,
+                "owner": self.owner,
+                "state": "running",
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.lease_ttl)
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            # Coordination is best effort; never block a chat on it
+            print(f"Single-flight lease error: {e}")
+            return None
+
+    def _publish(self, key, fields):
+        try:
+            # Keep the outcome around briefly for followers still polling
+            fields["expires_at"] = datetime.utcnow() + timedelta(seconds=self.poll_interval * 20)
+            self.lease_collection.update_one({"_id": key, "owner": self.owner}, {"$set": fields})
+        except Exception as e:
+            print(f"Single-flight publish error: {e}")
+
+    def _wait_for_remote(self, key, fn, timeout):
+        """Poll another worker's lease until it publishes an outcome"""
+        outcome = self._poll_remote(key, timeout)
+        # The other worker died or the lease lapsed; do the work here
+        return fn() if outcome is _LAPSED else outcome
+
+    def _poll_remote(self, key, timeout):
+        """The result another worker publishes for ``key``, or _LAPSED"""
+        self._count("remote_followers")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            lease = self.lease_collection.find_one({"_id": key})
+            if lease is None or lease["expires_at"] < datetime.utcnow():
+                return _LAPSED
+            if lease["state"] == "done":
+                return lease["result"]
+            if lease["state"] == "failed":
+                raise SingleFlightError(lease.get("error", "In-flight request failed"))
+            time.sleep(self.poll_interval)
+
+        self._count("timeouts")
+        raise SingleFlightTimeout(f"Timed out waiting for in-flight request {key[:12]}")
+
+    def _ensure_index(self):
+        if not self._index_ready:
+            self.lease_collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "in_flight": len(self._calls),
+                "shared": self.lease_collection is not None
+            }
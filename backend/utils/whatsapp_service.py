@@ -1,6 +1,13 @@
 import os
+from requests.adapters import HTTPAdapter
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from config import Config
+from utils.broadcast_engine import BroadcastEngine
+
+# Failed recipients listed in a broadcast summary; the rest are only counted
+MAX_FAILURE_DETAILS = 100
 
 
 class WhatsAppService:
@@ -13,8 +20,25 @@ class WhatsAppService:
             print("⚠️ Twilio credentials not configured. WhatsApp features disabled.")
             self.client = None
         else:
-            self.client = Client(self.account_sid, self.auth_token)
+            http_client = TwilioHttpClient(timeout=Config.TWILIO_TIMEOUT)
+            # One keep-alive connection per broadcast worker
+            adapter = HTTPAdapter(pool_maxsize=Config.TWILIO_SEND_WORKERS)
+            http_client.session.mount("https://", adapter)
+            http_client.session.mount("http://", adapter)
+            self.client = Client(self.account_sid, self.auth_token, http_client=http_client)
+            if Config.TWILIO_API_URL:
+                # A local fake Twilio API (fake_twilio.py) for tests and benchmarks
+                self.client.api.base_url = Config.TWILIO_API_URL
             print("✅ WhatsApp service initialized")
+        self.engine = BroadcastEngine(
+            self.send_message,
+            rate=Config.TWILIO_SEND_RATE,
+            burst=Config.TWILIO_SEND_BURST,
+            workers=Config.TWILIO_SEND_WORKERS,
+            max_retries=Config.TWILIO_SEND_RETRIES,
+            backoff=Config.TWILIO_RETRY_BACKOFF,
+            max_backoff=Config.TWILIO_RETRY_BACKOFF_MAX
+        )
 
     def send_message(self, to_number, message):
         """Send WhatsApp message to a single user"""
@@ -42,18 +66,31 @@ class WhatsAppService:
             }
         
         except TwilioRestException as e:
-            print(f"❌ Twilio error: {e}")
+            if e.status != 429:
+                print(f"❌ Twilio error: {e}")
             return {
                 "success": False,
-                "error": str(e)
+                "error": str(e),
+                "status_code": e.status
             }
         except Exception as e:
             print(f"❌ Error sending WhatsApp: {e}")
             return {
                 "success": False,
-                "error": str(e)
+                "error": str(e),
+                "retryable": True  # no response from Twilio (timeout, connection reset)
             }
 
+    def broadcast_stream(self, users, alert_message):
+        """Send to every user with a phone; yields each user's result as it completes.
+
+        ``users`` may be any iterable (a Mongo cursor); see BroadcastEngine
+        for the rate limit, concurrency and retries.
+        """
+        if not self.client:
+            raise RuntimeError("Twilio not configured")
+        return self.engine.run(users, alert_message)
+
     def broadcast_alert(self, users, alert_message):
         """Send broadcast message to multiple users"""
         if not self.client:
@@ -64,32 +101,23 @@ class WhatsAppService:
                 "failed": 0
             }
         
-        results = []
+        failures = []
         sent_count = 0
         failed_count = 0
         
-        for user in users:
-            phone = user.get("phone")
-            if not phone:
-                continue
-            
-            result = self.send_message(phone, alert_message)
-            results.append({
-                "user": user.get("email", "unknown"),
-                "phone": phone,
-                "result": result
-            })
-            
-            if result["success"]:
+        for outcome in self.broadcast_stream(users, alert_message):
+            if outcome["result"]["success"]:
                 sent_count += 1
             else:
                 failed_count += 1
+                if len(failures) < MAX_FAILURE_DETAILS:
+                    failures.append(outcome)
         
         return {
             "success": True,
             "sent": sent_count,
             "failed": failed_count,
-            "results": results
+            "results": failures
         }
 
     def send_drug_alert(self, to_number, drug_name, alert_type, alert_details):
@@ -107,9 +135,8 @@ This is an automated alert. Please consult your healthcare provider.
         
         return self.send_message(to_number, message)
 
-    def send_safety_broadcast(self, users, drug_name, safety_info):
-        """Broadcast safety alert to all users"""
-        message = f"""
+    def safety_message(self, drug_name, safety_info):
+        return f"""
 🚨 *SAFETY ALERT* 🚨
 
 Drug: {drug_name}
@@ -123,12 +150,13 @@ Drug: {drug_name}
 
 PharmaCare Safety Team
         """.strip()
-        
-        return self.broadcast_alert(users, message)
 
-    def send_recall_notification(self, users, drug_name, reason):
-        """Send drug recall notification"""
-        message = f"""
+    def send_safety_broadcast(self, users, drug_name, safety_info):
+        """Broadcast safety alert to all users"""
+        return self.broadcast_alert(users, self.safety_message(drug_name, safety_info))
+
+    def recall_message(self, drug_name, reason):
+        return f"""
 🔴 *DRUG RECALL NOTICE* 🔴
 
 Drug Recalled: {drug_name}
@@ -144,5 +172,7 @@ For questions: Contact your healthcare provider
 
 Lifexia Alert System
         """.strip()
-        
-        return self.broadcast_alert(users, message)
\ No newline at end of file
+
+    def send_recall_notification(self, users, drug_name, reason):
+        """Send drug recall notification"""
+        return self.broadcast_alert(users, self.recall_message(drug_name, reason))
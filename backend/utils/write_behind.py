@@ -0,0 +1,277 @@
+import atexit
+import glob
+import os
+import threading
+import time
+from collections import deque
+import pymongo
+from bson import ObjectId, json_util
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+
+class FlushError(Exception):
+    """Some collections could not be written; ``failed`` holds just their operations"""
+
+    def __init__(self, failed, cause):
+        super().__init__(str(cause))
+        self.failed = failed
+
+
+def duplicate_id(error):
+    """True for a bulk write error saying the document's _id is already stored"""
+    return error.get("code") == DUPLICATE_KEY and (
+        error.get("keyPattern") == {"_id": 1} or " index: _id_ " in error.get("errmsg", "")
+    )
+
+
+def pid_alive(pid):
+    """True if a process with this PID exists (it may belong to another user)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehind:
+    """Per-worker write-behind queue for log-style MongoDB writes.
+
+    Requests only append an operation (an insert, or an upsert) to an
+    in-memory deque; a background thread flushes it with one unordered
+    ``bulk_write`` per collection once ``batch_size`` operations are
+    waiting or the oldest has waited ``flush_interval`` seconds. Upserts
+    given the same ``key`` within one batch collapse into the last one
+    (a WhatsApp sender's ``last_seen``).
+
+    When the queue holds ``max_queue`` operations the caller writes
+    synchronously instead, so records are never dropped. A batch that
+    MongoDB rejects, and whatever is still queued at exit, is appended to a
+    JSON-lines spill file in ``spill_dir``; the next worker to start
+    replays it once the worker that wrote it has exited. Only the
+    collections that failed are spilled, and inserts carry their ``_id``
+    from the start, so a replayed insert that did reach MongoDB is a
+    duplicate key rather than a second record. The thread is started
+    lazily and per PID, so a forked gunicorn worker gets its own.
+    """
+
+    def __init__(self, db, batch_size=200, flush_interval=0.5, max_queue=10000, spill_dir=None, enabled=True):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_dir = spill_dir
+        self.enabled = enabled
+        self._queue = deque()      # (enqueued_at, operation)
+        self._inflight_since = None
+        self._cond = threading.Condition()
+        self._pid = None
+        self._closing = False
+        self.last_flush_ms = None
+        self.last_error = None
+        self.counters = {"enqueued": 0, "written": 0, "batches": 0, "coalesced": 0,
+                         "sync_writes": 0, "spilled": 0, "replayed": 0, "errors": 0}
+
+    def insert(self, collection, document):
+        document.setdefault("_id", ObjectId())  # as insert_one would; makes a replay idempotent
+        self._submit(("insert", collection, document))
+
+    def upsert(self, collection, filter, update, key=None):
+        self._submit(("upsert", collection, filter, update, key))
+
+    def _submit(self, operation):
+        if not self.enabled:
+            return self._write([operation])
+        self._ensure_started()
+        with self._cond:
+            if len(self._queue) < self.max_queue and not self._closing:
+                self._queue.append((time.monotonic(), operation))
+                self.counters["enqueued"] += 1
+                if len(self._queue) in (1, self.batch_size):
+                    self._cond.notify()  # start the flush timer, or flush a full batch
+                return
+        # Queue full (MongoDB slower than traffic) or shutting down: write now
+        self.counters["sync_writes"] += 1
+        self._write([operation])
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._cond:
+            if self._pid == pid:
+                return
+            self._queue.clear()  # the parent's queue is the parent's to flush
+            self._pid = pid
+            threading.Thread(target=self._run, name="write-behind", daemon=True).start()
+        atexit.register(self.close)
+        self.replay()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closing:
+                    if len(self._queue) >= self.batch_size:
+                        break
+                    if self._queue:
+                        wait = self._queue[0][0] + self.flush_interval - time.monotonic()
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._cond.wait(wait)
+                if self._closing:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._inflight_since = batch[0][0]
+            try:
+                self._flush([operation for _, operation in batch])
+            finally:
+                self._inflight_since = None
+
+    def _flush(self, operations):
+        started = time.perf_counter()
+        try:
+            self._write(operations)
+        except Exception as e:
+            failed = e.failed if isinstance(e, FlushError) else operations
+            self.counters["errors"] += 1
+            self.last_error = str(e)
+            print(f"⚠️ Write-behind flush failed, spilling {len(failed)} of {len(operations)} records: {e}")
+            self.spill(failed)
+            return
+        self.counters["batches"] += 1
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+        if self.spill_dir and not self._closing and os.path.exists(self._spill_path()):
+            self.replay(own=True)  # MongoDB is back: retry what this worker spilled
+
+    def _write(self, operations):
+        """bulk_write ``operations``, grouped by collection.
+
+        Every collection is attempted; if any of them fails, FlushError
+        carries the operations of those that did, and the rest stand.
+        """
+        requests, keyed = {}, {}
+        for operation in operations:
+            kind, collection = operation[0], operation[1]
+            if kind == "insert":
+                request = InsertOne(operation[2])
+            else:
+                request = UpdateOne(operation[2], operation[3], upsert=True)
+                key = operation[4]
+                if key is not None:
+                    previous = keyed.get((collection, key))
+                    if previous is not None:
+                        requests[collection][previous] = None
+                        self.counters["coalesced"] += 1
+                    keyed[(collection, key)] = len(requests.get(collection, ()))
+            requests.setdefault(collection, []).append((request, operation))
+
+        failed, cause = [], None
+        for collection, batch in requests.items():
+            batch = [entry for entry in batch if entry is not None]
+            try:
+                self.db[collection].bulk_write([request for request, _ in batch], ordered=False)
+            except BulkWriteError as e:
+                # A duplicate _id is an insert replayed after it was written;
+                # other per-record rejections would fail again on replay
+                rejected = [error for error in e.details.get("writeErrors", []) if not duplicate_id(error)]
+                if rejected:
+                    self.counters["errors"] += 1
+                    self.last_error = str(rejected[:1])
+                    print(f"⚠️ Write-behind: {len(rejected)} {collection} records rejected")
+            except Exception as e:
+                failed += [operation for _, operation in batch]
+                cause = e
+                continue
+            self.counters["written"] += len(batch)
+        if failed:
+            raise FlushError(failed, cause)
+
+    def _spill_path(self):
+        return os.path.join(self.spill_dir, f"write-behind-{os.getpid()}.jsonl")
+
+    def spill(self, operations):
+        """Append ``operations`` to this worker's spill file"""
+        if not operations:
+            return
+        if not self.spill_dir:
+            print(f"❌ Write-behind: {len(operations)} records lost (no spill directory)")
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(self._spill_path(), "a") as f:
+            for operation in operations:
+                f.write(json_util.dumps(operation) + "\n")
+        self.counters["spilled"] += len(operations)
+
+    def replay(self, own=False):
+        """Queue the operations spilled by exited workers (or, ``own``, by this one).
+
+        A live worker still appends to its own file and replays it itself
+        once MongoDB is back, so its file is left alone.
+        """
+        if not self.spill_dir:
+            return 0
+        replayed = 0
+        if own:
+            paths = [self._spill_path()]
+        else:
+            paths = [path for path in glob.glob(os.path.join(self.spill_dir, "write-behind-*.jsonl"))
+                     if not self._spilled_by_live_worker(path)]
+        for path in paths:
+            claimed = f"{path}.replay-{os.getpid()}"
+            try:
+                os.rename(path, claimed)  # one worker wins each file
+            except OSError:
+                continue
+            with open(claimed) as f:
+                operations = [tuple(json_util.loads(line)) for line in f if line.strip()]
+            with self._cond:
+                self._queue.extend((time.monotonic(), operation) for operation in operations)
+            os.remove(claimed)
+            replayed += len(operations)
+        if replayed:
+            self.counters["replayed"] += replayed
+            print(f"✅ Write-behind: replaying {replayed} spilled records")
+        return replayed
+
+    @staticmethod
+    def _spilled_by_live_worker(path):
+        pid = os.path.basename(path)[len("write-behind-"):-len(".jsonl")]
+        return pid.isdigit() and pid_alive(int(pid))
+
+    def close(self, timeout=5):
+        """Flush what is queued (spilling it if MongoDB is unreachable) and stop"""
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            operations = [operation for _, operation in self._queue]
+            self._queue.clear()
+        deadline = time.monotonic() + timeout
+        while self._inflight_since is not None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if operations:
+            # Bounded, so an unreachable MongoDB means a spill rather than a hung shutdown
+            with pymongo.timeout(max(deadline - time.monotonic(), 1)):
+                self._flush(operations)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            oldest = [since for since in (self._queue[0][0] if self._queue else None, self._inflight_since)
+                      if since is not None]
+            queued = len(self._queue)
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "queued": queued,
+            "lag_seconds": round(now - min(oldest), 3) if oldest else 0.0,
+            "last_flush_ms": self.last_flush_ms,
+            "last_error": self.last_error
+        }
@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Send, User, Bot, Clock, MapPin, RefreshCw } from 'lucide-react';
-import api from '../utils/api';
+import api, { streamChat } from '../utils/api';
 
 const SESSION_STORAGE_KEY = 'lifexia_chat_messages';
 
@@ -154,16 +154,24 @@ const Chat = () => {
                 }
             }
 
-            const res = await api.post('/chat', {
-                message: userMsg,
-                lat,
-                lon
+            // Show tokens as they arrive instead of waiting for the full answer
+            let started = false;
+            const result = await streamChat({ message: userMsg, lat, lon }, (token) => {
+                if (!started) {
+                    started = true;
+                    setLoading(false);
+                    setMessages(prev => [...prev, { text: token, isUser: false }]);
+                } else {
+                    setMessages(prev => {
+                        const last = prev[prev.length - 1];
+                        return [...prev.slice(0, -1), { ...last, text: last.text + token }];
+                    });
+                }
             });
 
-            if (res.data.success) {
-                setMessages(prev => [...prev, { text: res.data.response, isUser: false }]);
-            } else {
-                setMessages(prev => [...prev, { text: "Error: " + res.data.error, isUser: false }]);
+            if (!result.success) {
+                const retry = result.retry_after ? ` (try again in ${result.retry_after}s)` : '';
+                setMessages(prev => [...prev, { text: "Error: " + result.error + retry, isUser: false }]);
             }
         } catch (error) {
             setMessages(prev => [...prev, { text: "Network Error", isUser: false }]);
@@ -12,4 +12,71 @@ const api = axios.create({
     }
 });
 
+// Stream a chat answer over Server-Sent Events.
+// Calls onToken(text) for every chunk and resolves with the final "done" payload,
+// or with { success: false, error, retry_after } when the request is refused or fails.
+export const streamChat = async (payload, onToken) => {
+    const res = await fetch(`${API_URL}/chat/stream`, {
+        method: 'POST',
+        credentials: 'include',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify(payload),
+    });
+
+    if (!res.ok || !res.body) {
+        // 429 (queue full) and 503 (model warming up) carry a JSON body and Retry-After
+        let body = {};
+        try {
+            body = await res.json();
+        } catch (e) {
+            // Not JSON (e.g. a proxy error page)
+        }
+        const retryAfter = body.retry_after ?? (Number(res.headers.get('Retry-After')) || null);
+        return {
+            success: false,
+            error: body.error || `Request failed (Status: ${res.status})`,
+            retry_after: retryAfter,
+            status: res.status,
+        };
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE frames are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (!data) continue;
+
+            const parsed = JSON.parse(data);
+            if (event === 'done' || event === 'error') {
+                result = parsed;
+            } else if (parsed.token) {
+                onToken(parsed.token);
+            }
+        }
+    }
+
+    return result || { success: false, error: 'Stream ended unexpectedly' };
+};
+
 export default api;